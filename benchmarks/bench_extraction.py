@@ -0,0 +1,73 @@
+"""
+Benchmark html field extraction on the saved fixture pages.
+
+Compares the compiled single-pass FieldExtractor against building a full
+BeautifulSoup tree and running one select_one per field.
+
+Usage: python -m benchmarks.bench_extraction [--repeat 200]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from src.config import JOB_DETAIL_SELECTORS, JOB_LINK_SELECTOR
+from src.data_collection.extraction import AttributeExtractor, FieldExtractor
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / 'tests' / 'data_collection' / 'fixtures'
+
+
+def extract_with_beautifulsoup(html_content):
+    soup = BeautifulSoup(html_content, 'lxml')
+    details = {}
+    for field, selector in JOB_DETAIL_SELECTORS.items():
+        element = soup.select_one(selector)
+        details[field] = element.get_text(strip=True) if element else 'N/A'
+    return details
+
+def links_with_beautifulsoup(html_content):
+    soup = BeautifulSoup(html_content, 'lxml')
+    return [link.get('href') for link in soup.select(JOB_LINK_SELECTOR)]
+
+def time_per_page(function, pages, repeat):
+    """
+    Time a parser over every page.
+    :param function: Parser taking the html of a page.
+    :param pages: List of html strings.
+    :param repeat: Number of passes over the pages.
+    :return: Mean milliseconds per page.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html_content in pages:
+            function(html_content)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    detail_pages = [path.read_text() for path in sorted(FIXTURES_DIR.glob('job_*.html'))]
+    listing_pages = [(FIXTURES_DIR / 'search_results.html').read_text()]
+    field_extractor = FieldExtractor(JOB_DETAIL_SELECTORS)
+    link_extractor = AttributeExtractor(JOB_LINK_SELECTOR, 'href')
+    for html_content in detail_pages:
+        assert field_extractor.extract(html_content) == extract_with_beautifulsoup(html_content)
+    for html_content in listing_pages:
+        assert link_extractor.extract(html_content) == links_with_beautifulsoup(html_content)
+
+    for name, baseline, compiled, pages in [
+        ('Job detail pages', extract_with_beautifulsoup, field_extractor.extract, detail_pages),
+        ('Search result pages', links_with_beautifulsoup, link_extractor.extract, listing_pages),
+    ]:
+        baseline_ms = time_per_page(baseline, pages, args.repeat)
+        compiled_ms = time_per_page(compiled, pages, args.repeat)
+        print(f"{name}: BeautifulSoup {baseline_ms:.3f} ms/page, compiled {compiled_ms:.3f} ms/page "
+              f"({baseline_ms / compiled_ms:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark MinHash LSH near-duplicate detection on re-posted job ads.
+
+A share of the descriptions are reposts of earlier ones with a few words
+replaced, as agencies re-post the same ad. Signatures and clustering are
+timed separately, and the share of reposts grouped with their original
+(recall) and the number of unrelated descriptions grouped together are
+reported.
+
+Usage: python -m benchmarks.bench_near_duplicates [--rows 1000000] [--repost-rate 0.05] [--edits 3]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.bench_skill_matcher import generate_descriptions
+from src.config import NEAR_DUPLICATE_THRESHOLD
+from src.data_processing.near_duplicates import MinHasher, cluster_signatures, lsh_parameters
+
+REPOST_WORDS = ['urgent', 'exciting', 'immediate', 'start', 'hybrid', 'remote', 'apply', 'today']
+
+
+def generate_reposts(rows, repost_rate=0.05, edits=3, words_per_description=80, seed=42):
+    """
+    Generate descriptions where some are edited reposts of earlier ones.
+    :param rows: Number of descriptions.
+    :param repost_rate: Share of descriptions that repost an earlier one.
+    :param edits: Number of words replaced in each repost.
+    :param words_per_description: Approximate length of each description in words.
+    :param seed: Random seed.
+    :return: Tuple of the descriptions and, for each, the position of the original
+        it reposts, or its own position.
+    """
+    rng = random.Random(seed)
+    descriptions = generate_descriptions(rows, words_per_description=words_per_description, seed=seed)
+    originals = np.arange(rows)
+    for i in range(1, rows):
+        if rng.random() < repost_rate:
+            original = originals[rng.randrange(i)]
+            words = descriptions[original].split()
+            for _ in range(edits):
+                words[rng.randrange(len(words))] = rng.choice(REPOST_WORDS)
+            descriptions[i] = ' '.join(words)
+            originals[i] = original
+    return descriptions, originals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repost-rate', type=float, default=0.05)
+    parser.add_argument('--edits', type=int, default=3, help="Words replaced in each repost")
+    parser.add_argument('--threshold', type=float, default=NEAR_DUPLICATE_THRESHOLD)
+    args = parser.parse_args()
+
+    descriptions, originals = generate_reposts(args.rows, args.repost_rate, args.edits)
+    reposts = originals != np.arange(args.rows)
+    minhasher = MinHasher()
+    bands, rows = lsh_parameters(args.threshold, minhasher.num_perm)
+    print(f"Corpus: {args.rows} descriptions, {reposts.sum()} reposts with {args.edits} words replaced. "
+          f"LSH: {bands} bands of {rows} rows for a threshold of {args.threshold}.")
+
+    start = time.perf_counter()
+    signatures = minhasher.signatures(descriptions)
+    signature_seconds = time.perf_counter() - start
+    print(f"Signatures: {signature_seconds:.2f}s ({args.rows / signature_seconds:,.0f} descriptions/sec)")
+
+    start = time.perf_counter()
+    groups = cluster_signatures(signatures, args.threshold)
+    cluster_seconds = time.perf_counter() - start
+    print(f"Clustering: {cluster_seconds:.2f}s ({args.rows / cluster_seconds:,.0f} descriptions/sec)")
+
+    recall = (groups[reposts] == groups[originals[reposts]]).mean() if reposts.any() else 1.0
+    # Distinct originals sharing a group were merged without being reposts of each other
+    merged_originals = len(np.unique(originals)) - len(np.unique(groups[np.unique(originals)]))
+    print(f"Reposts grouped with their original: {recall:.2%}. Unrelated descriptions merged: {merged_originals}.")
+
+
+if __name__ == '__main__':
+    main()
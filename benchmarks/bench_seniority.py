@@ -0,0 +1,70 @@
+"""
+Benchmark classify_seniority_series against the row-wise classify_by_seniority apply.
+
+Usage: python -m benchmarks.bench_seniority [--rows 1000000]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_skill_matcher import generate_descriptions
+from src.data_processing.data_cleaning import classify_by_seniority, classify_seniority_series
+
+TITLES = [
+    'DevOps Engineer', 'Senior DevOps Engineer', 'Junior DevOps Engineer', 'Lead DevOps Engineer',
+    'Platform Engineer', 'Graduate Cloud Engineer', 'Head of Platform', 'Site Reliability Engineer',
+    'DevOps Manager', 'Sr. SRE', 'Cloud Engineer - Internship', 'Principal Engineer',
+]
+EXPERIENCE_PHRASES = [
+    '', '', '1+ years', '2 years', '3 years', '4+ years', '5+ years', '10 years', 'strong experience',
+    'extensive experience', 'deep understanding',
+]
+SALARIES = [0, 0, 35000, 40000, 55000, 65000, 70000, 90000, 120000]
+
+
+def generate_jobs(rows, seed=42):
+    """
+    Generate a deterministic frame of jobs covering every seniority rule.
+    :param rows: Number of jobs to generate.
+    :param seed: Random seed.
+    :return: DataFrame with job_title, full_description and salary_numeric columns.
+    """
+    rng = random.Random(seed)
+    descriptions = generate_descriptions(rows, words_per_description=60, seed=seed)
+    return pd.DataFrame({
+        'job_title': rng.choices(TITLES, k=rows),
+        'full_description': [
+            description + ' ' + rng.choice(EXPERIENCE_PHRASES) for description in descriptions
+        ],
+        'salary_numeric': np.array(rng.choices(SALARIES, k=rows), dtype=np.int64),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    jobs = generate_jobs(args.rows)
+    print(f"Corpus: {len(jobs)} jobs, {jobs['full_description'].str.len().mean():.0f} characters on average.")
+
+    start = time.perf_counter()
+    expected = jobs.apply(classify_by_seniority, axis=1)
+    apply_seconds = time.perf_counter() - start
+    print(f"Row-wise apply:            {apply_seconds:.2f}s")
+
+    start = time.perf_counter()
+    result = classify_seniority_series(jobs['job_title'], jobs['full_description'], jobs['salary_numeric'])
+    series_seconds = time.perf_counter() - start
+    print(f"classify_seniority_series: {series_seconds:.2f}s ({apply_seconds / series_seconds:.1f}x faster)")
+
+    mismatches = int((result != expected).sum())
+    print(f"Mismatched rows: {mismatches}")
+    print(result.value_counts().to_string())
+
+
+if __name__ == '__main__':
+    main()
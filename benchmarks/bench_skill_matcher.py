@@ -0,0 +1,66 @@
+"""
+Benchmark the compiled SkillMatcher against the per-keyword regex loop.
+
+Usage: python -m benchmarks.bench_skill_matcher [--rows 100000]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from src.config import SKILL_KEYWORDS
+from src.data_processing.data_cleaning import extract_skills_from_description
+from src.data_processing.skill_matcher import SkillMatcher
+
+FILLER_WORDS = (
+    'we are looking for an experienced engineer to join our growing team and help build '
+    'reliable scalable platforms for our clients you will work closely with stakeholders '
+    'across the business delivering high quality solutions in an agile environment with '
+    'a strong focus on ownership collaboration and continuous improvement'
+).split()
+
+
+def generate_descriptions(rows, words_per_description=350, seed=42):
+    """
+    Generate a deterministic corpus of job descriptions mentioning skills.
+    :param rows: Number of descriptions to generate.
+    :param words_per_description: Approximate length of each description in words.
+    :param seed: Random seed.
+    :return: List of description strings.
+    """
+    rng = random.Random(seed)
+    descriptions = []
+    for _ in range(rows):
+        words = rng.choices(FILLER_WORDS, k=words_per_description)
+        for skill in rng.sample(SKILL_KEYWORDS, k=rng.randint(2, 12)):
+            words.insert(rng.randrange(len(words)), skill + rng.choice(['', ',', '.']))
+        descriptions.append(' '.join(words))
+    return descriptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    descriptions = pd.Series(generate_descriptions(args.rows))
+    print(f"Corpus: {len(descriptions)} descriptions, "
+          f"{descriptions.str.len().mean():.0f} characters on average.")
+
+    start = time.perf_counter()
+    expected = descriptions.apply(lambda x: extract_skills_from_description(x, SKILL_KEYWORDS))
+    loop_seconds = time.perf_counter() - start
+    print(f"Per-keyword loop: {loop_seconds:.2f}s")
+
+    start = time.perf_counter()
+    matcher = SkillMatcher(SKILL_KEYWORDS)
+    result = matcher.extract_series(descriptions)
+    matcher_seconds = time.perf_counter() - start
+    print(f"SkillMatcher:     {matcher_seconds:.2f}s ({loop_seconds / matcher_seconds:.1f}x faster)")
+
+    assert result.tolist() == expected.tolist(), "SkillMatcher output differs from the per-keyword loop"
+
+
+if __name__ == '__main__':
+    main()
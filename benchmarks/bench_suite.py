@@ -0,0 +1,301 @@
+"""
+Time every pipeline stage on synthetic corpora and flag regressions.
+
+Each stage runs on a deterministic jobs_raw corpus (see benchmarks.corpus)
+at every requested size: the parsers of data_cleaning, the DB utilities and
+a full process_raw_data run. Html extraction runs on the saved fixture
+pages. Results are written as JSON. Given a baseline file written by an
+earlier run, every stage that got slower by more than the tolerance is
+timed again, and if it is still slower it is reported and the exit status
+is 1.
+
+Usage: python -m benchmarks.bench_suite [--rows 10000 100000 1000000] [--stages 'parse_*']
+                                        [--output results.json] [--baseline baseline.json]
+"""
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.bench_extraction import FIXTURES_DIR
+from benchmarks.corpus import CORPUS_SIZES, generate_raw_jobs
+from src.config import (
+    JOB_DETAIL_SELECTORS, JOB_LINK_SELECTOR, RAW_DATA_TABLE_NAME, REGION_TO_CITIES_MAP, SKILL_KEYWORDS
+)
+from src.data_collection.extraction import AttributeExtractor, FieldExtractor
+from src.data_processing.data_cleaning import (
+    categorize_employment_type, classify_by_seniority, classify_location_by_city, classify_location_by_region,
+    classify_seniority_series, clean_dataframe, extract_skills_from_description, parse_date, parse_salary,
+    parse_salary_series, process_raw_data
+)
+from src.data_processing.near_duplicates import find_near_duplicates
+from src.utils import deduplicate_table, get_engine, load_data_from_db, save_data_to_db
+
+DEFAULT_TOLERANCE = 0.25
+# Runs per stage; the fastest is kept, as slower runs only add scheduler and cache noise
+DEFAULT_REPEAT = 3
+# Slowdown always tolerated on top of the relative tolerance, which short stages easily exceed through noise
+MIN_SLOWDOWN_SECONDS = 0.05
+# Largest corpus for stages too slow to time on a million rows, e.g. the per-keyword regex loop
+STAGE_MAX_ROWS = {'extract_skills_from_description': 100_000}
+
+
+class _Workspace:
+    """
+    Corpus of one size, with the databases the DB stages start from.
+    """
+
+    def __init__(self, jobs, directory):
+        self.jobs = jobs
+        self.directory = Path(directory)
+        self._databases = 0
+        self._saved_db = None
+
+    def new_db_path(self):
+        self._databases += 1
+        return self.directory / f'bench_{self._databases}.db'
+
+    def saved_db(self):
+        """
+        Get a database holding the corpus in jobs_raw, written once.
+        """
+        if self._saved_db is None:
+            self._saved_db = self.saved_copy()
+        return self._saved_db
+
+    def saved_copy(self):
+        db_path = self.new_db_path()
+        save_data_to_db(self.jobs, RAW_DATA_TABLE_NAME, db_path)
+        return db_path
+
+    def legacy_copy(self):
+        """
+        Get a database holding the corpus, duplicates included, without content hashes.
+        """
+        db_path = self.new_db_path()
+        self.jobs.to_sql(RAW_DATA_TABLE_NAME, get_engine(db_path), index=False)
+        return db_path
+
+    @property
+    def with_salaries(self):
+        return self.jobs.assign(salary_numeric=parse_salary_series(self.jobs['salary_raw']))
+
+
+def _mapped(column, parser):
+    def prepare(workspace):
+        values = workspace.jobs[column]
+        return lambda: values.map(parser)
+    return prepare
+
+def _seniority_apply(workspace):
+    jobs = workspace.with_salaries
+    return lambda: jobs.apply(classify_by_seniority, axis=1)
+
+def _seniority_series(workspace):
+    jobs = workspace.with_salaries
+    return lambda: classify_seniority_series(jobs['job_title'], jobs['full_description'], jobs['salary_numeric'])
+
+def _clean(workspace):
+    jobs = workspace.jobs.assign(raw_id=range(1, len(workspace.jobs) + 1))
+    return lambda: clean_dataframe(jobs)
+
+def _save(workspace):
+    db_path = workspace.new_db_path()
+    return lambda: save_data_to_db(workspace.jobs, RAW_DATA_TABLE_NAME, db_path)
+
+def _load(workspace):
+    db_path = workspace.saved_db()
+    return lambda: load_data_from_db(db_path, RAW_DATA_TABLE_NAME)
+
+def _deduplicate(workspace):
+    db_path = workspace.legacy_copy()
+    return lambda: deduplicate_table(RAW_DATA_TABLE_NAME, db_path)
+
+def _process(workspace):
+    db_path = workspace.saved_copy()
+    return lambda: process_raw_data(db_path)
+
+# Each stage prepares its inputs from the workspace, untimed, and returns the function to time
+CORPUS_STAGES = {
+    'parse_salary': _mapped('salary_raw', parse_salary),
+    'parse_salary_series': lambda workspace: lambda: parse_salary_series(workspace.jobs['salary_raw']),
+    'parse_date': _mapped('date_posted_raw', parse_date),
+    'classify_location_by_city': _mapped('location', classify_location_by_city),
+    'classify_location_by_region': _mapped(
+        'location', lambda location: classify_location_by_region(location, REGION_TO_CITIES_MAP)),
+    'categorize_employment_type': _mapped('employment_type', categorize_employment_type),
+    'extract_skills_from_description': _mapped(
+        'full_description', lambda description: extract_skills_from_description(description, SKILL_KEYWORDS)),
+    'classify_by_seniority': _seniority_apply,
+    'classify_seniority_series': _seniority_series,
+    'clean_dataframe': _clean,
+    'find_near_duplicates': lambda workspace: lambda: find_near_duplicates(workspace.jobs['full_description']),
+    'save_data_to_db': _save,
+    'load_data_from_db': _load,
+    'deduplicate_table': _deduplicate,
+    'process_raw_data': _process,
+}
+
+
+def html_stages():
+    """
+    Get the html extraction stages, run over every fixture page of their kind.
+    :return: Dictionary of stage name to (function, pages).
+    """
+    detail_pages = [path.read_text() for path in sorted(FIXTURES_DIR.glob('job_*.html'))]
+    listing_pages = [(FIXTURES_DIR / 'search_results.html').read_text()]
+    return {
+        'extract_job_details': (FieldExtractor(JOB_DETAIL_SELECTORS).extract, detail_pages),
+        'extract_job_links': (AttributeExtractor(JOB_LINK_SELECTOR, 'href').extract, listing_pages),
+    }
+
+def time_stage(prepare, repeat):
+    """
+    Time a stage, keeping the fastest of several runs.
+    :param prepare: Function returning the function to time, called afresh before every run.
+    :param repeat: Number of runs.
+    :return: Seconds taken by the fastest run.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        # The pipeline reports progress on stdout, which is not what is being measured
+        with contextlib.redirect_stdout(io.StringIO()):
+            function = prepare()
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+def run_suite(sizes, patterns=('*',), repeat=DEFAULT_REPEAT, pages=1000, seed=42):
+    """
+    Run every selected stage at every corpus size.
+    :param sizes: Numbers of corpus rows.
+    :param patterns: Shell-style patterns of the stage names to run.
+    :param repeat: Runs per stage, the fastest is kept.
+    :param pages: Number of fixture pages to extract per html stage.
+    :param seed: Corpus random seed.
+    :return: List of results, each with stage, rows, seconds and rows_per_second.
+    """
+    def selected(stage):
+        return any(fnmatch.fnmatch(stage, pattern) for pattern in patterns)
+
+    results = []
+
+    def record(stage, rows, seconds):
+        results.append({'stage': stage, 'rows': rows, 'seconds': round(seconds, 6),
+                        'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None})
+        print(f"{stage:<32} {rows:>9} rows {seconds:>10.4f}s {rows / seconds if seconds > 0 else 0:>14,.0f} rows/sec",
+              flush=True)
+
+    for stage, (function, stage_pages) in html_stages().items():
+        if selected(stage):
+            batch = [stage_pages[i % len(stage_pages)] for i in range(pages)]
+            seconds = time_stage(lambda: lambda: [function(html_content) for html_content in batch], repeat)
+            record(stage, pages, seconds)
+    for rows in sizes:
+        stages = [stage for stage in CORPUS_STAGES
+                  if selected(stage) and rows <= STAGE_MAX_ROWS.get(stage, rows)]
+        if not stages:
+            continue
+        jobs = generate_raw_jobs(rows, seed=seed)
+        with tempfile.TemporaryDirectory() as directory:
+            workspace = _Workspace(jobs, directory)
+            for stage in stages:
+                record(stage, rows, time_stage(lambda: CORPUS_STAGES[stage](workspace), repeat))
+            get_engine.cache_clear()
+    return results
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE, min_slowdown=MIN_SLOWDOWN_SECONDS):
+    """
+    Compare results against a baseline run.
+    :param results: Results of run_suite.
+    :param baseline: Results of an earlier run_suite, e.g. loaded from its JSON file.
+    :param tolerance: Allowed slowdown as a fraction of the baseline time.
+    :param min_slowdown: Allowed slowdown in seconds on top of the tolerance, so the
+        shortest stages tolerate the most, relative to their time.
+    :return: List of comparisons for stages in both runs, each with stage, rows,
+        baseline, current, ratio and regression.
+    """
+    baseline_seconds = {(result['stage'], result['rows']): result['seconds'] for result in baseline}
+    comparisons = []
+    for result in results:
+        before = baseline_seconds.get((result['stage'], result['rows']))
+        if before is None:
+            continue
+        after = result['seconds']
+        ratio = after / before if before > 0 else float('inf')
+        comparisons.append({
+            'stage': result['stage'],
+            'rows': result['rows'],
+            'baseline': before,
+            'current': after,
+            'ratio': round(ratio, 3),
+            'regression': after > before * (1 + tolerance) + min_slowdown,
+        })
+    return comparisons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=CORPUS_SIZES)
+    parser.add_argument('--stages', nargs='+', default=['*'], help="Shell-style patterns of the stages to run")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Runs per stage, the fastest is kept")
+    parser.add_argument('--pages', type=int, default=1000, help="Fixture pages extracted per html stage")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, help="Write the results to this JSON file")
+    parser.add_argument('--baseline', type=Path, help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown as a fraction of the baseline time")
+    args = parser.parse_args()
+
+    results = run_suite(args.rows, args.stages, repeat=args.repeat, pages=args.pages, seed=args.seed)
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())['results']
+        comparisons = compare_results(results, baseline, args.tolerance)
+        # A slowdown may be a burst of load on the machine, so the stage is timed again and the fastest run kept
+        retimed = {(comparison['stage'], comparison['rows']) for comparison in comparisons if comparison['regression']}
+        if retimed:
+            print(f"\nTiming {len(retimed)} slower stages again:")
+            for result in results:
+                if (result['stage'], result['rows']) in retimed:
+                    again = run_suite([result['rows']], [result['stage']], repeat=args.repeat, pages=args.pages,
+                                      seed=args.seed)
+                    result['seconds'] = min([result['seconds']] + [rerun['seconds'] for rerun in again])
+                    result['rows_per_second'] = round(result['rows'] / result['seconds'], 1)
+            comparisons = compare_results(results, baseline, args.tolerance)
+        print(f"\nCompared with {args.baseline}:")
+        for comparison in comparisons:
+            flag = 'REGRESSION' if comparison['regression'] else ''
+            print(f"{comparison['stage']:<32} {comparison['rows']:>9} rows {comparison['baseline']:>10.4f}s -> "
+                  f"{comparison['current']:>10.4f}s ({comparison['ratio']:.2f}x) {flag}")
+        regressions = [comparison for comparison in comparisons if comparison['regression']]
+        print(f"{len(regressions)} of {len(comparisons)} stages still slower than {1 + args.tolerance:.2f}x "
+              f"the baseline plus {MIN_SLOWDOWN_SECONDS}s.")
+    # Written after any re-timing, so the saved times are the ones compared and can serve as the next baseline
+    if args.output:
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.platform(),
+            'seed': args.seed,
+            'results': results,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}.")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
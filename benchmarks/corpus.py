@@ -0,0 +1,90 @@
+"""
+Deterministic synthetic jobs_raw corpus for benchmarks.
+
+Rows are drawn from the formats the scraper actually sees: the salary
+strings covered by the parser tests, locations built from the places in
+REGION_TO_CITIES_MAP, relative posting dates, and descriptions
+mentioning SKILL_KEYWORDS. The same rows and seed always give the same corpus.
+
+Usage: python -m benchmarks.corpus [--rows 10000] [--db corpus.db]
+"""
+import argparse
+import random
+
+import pandas as pd
+
+from benchmarks.bench_seniority import EXPERIENCE_PHRASES, TITLES
+from benchmarks.bench_skill_matcher import generate_descriptions
+from src.config import RAW_DATA_TABLE_NAME, REGION_TO_CITIES_MAP, SEARCH_CATEGORIES
+from src.utils import save_data_to_db
+
+CORPUS_SIZES = [10_000, 100_000, 1_000_000]
+SALARY_FORMATS = [
+    '£{low},000 - £{high},000', 'From £{low},000 to £{high},000 per annum', '{low}k - {high}.5k',
+    '£{low},000 per annum + Package', '£{low}k per annum', '{low}000', '£{day} a day', '£{day} - £{day_high} per day',
+    '£{hour} per hour', '£{hour} - {hour_high} per hour', 'Competitive', 'Competitive', 'Market rate', 'N/A',
+]
+LOCATION_FORMATS = ['{place}', '{place}', '{place}, {area}', 'Hybrid - {place}', 'Remote', '{place} (Hybrid)']
+EMPLOYMENT_TYPES = ['Permanent'] * 6 + ['Contract'] * 3 + ['Temporary', 'Not Assigned']
+DATE_FORMATS = ['Published: {n} hours ago', 'Posted {n} days ago', 'Published: {n} weeks ago', '{n} month ago',
+                'Recently']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Hooli', 'Umbrella', 'Stark Industries', 'Wayne Enterprises']
+
+
+def generate_raw_jobs(rows, seed=42, duplicate_rate=0.05, words_per_description=80):
+    """
+    Generate a deterministic frame of raw job postings.
+    :param rows: Number of postings to generate.
+    :param seed: Random seed.
+    :param duplicate_rate: Share of postings that re-use an earlier description, as re-scraped postings do.
+    :param words_per_description: Approximate length of each description in words.
+    :return: DataFrame with the jobs_raw columns, including search_category.
+    """
+    rng = random.Random(seed)
+    places = [place for cities in REGION_TO_CITIES_MAP.values() for place in cities]
+    areas = REGION_TO_CITIES_MAP['South'][:25]
+    descriptions = generate_descriptions(rows, words_per_description=words_per_description, seed=seed)
+    for i in range(1, rows):
+        if rng.random() < duplicate_rate:
+            descriptions[i] = descriptions[rng.randrange(i)]
+        else:
+            descriptions[i] += ' ' + rng.choice(EXPERIENCE_PHRASES)
+    return pd.DataFrame({
+        'job_title': rng.choices(TITLES, k=rows),
+        'company_name': rng.choices(COMPANIES, k=rows),
+        'location': [
+            rng.choice(LOCATION_FORMATS).format(place=rng.choice(places), area=rng.choice(areas))
+            for _ in range(rows)
+        ],
+        'employment_type': rng.choices(EMPLOYMENT_TYPES, k=rows),
+        'date_posted_raw': [rng.choice(DATE_FORMATS).format(n=rng.randint(1, 4)) for _ in range(rows)],
+        'salary_raw': [_salary(rng) for _ in range(rows)],
+        'full_description': descriptions,
+        'search_category': rng.choices(list(SEARCH_CATEGORIES), k=rows),
+    })
+
+def _salary(rng):
+    low = rng.randint(25, 110)
+    day = rng.randrange(250, 800, 25)
+    hour = rng.randint(20, 90)
+    return rng.choice(SALARY_FORMATS).format(low=low, high=low + rng.randint(5, 20), day=day,
+                                             day_high=day + rng.randrange(25, 150, 25), hour=hour,
+                                             hour_high=hour + rng.randint(5, 20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=CORPUS_SIZES[0])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help="Write the corpus to the jobs_raw table of this database instead of printing it")
+    args = parser.parse_args()
+
+    jobs = generate_raw_jobs(args.rows, seed=args.seed)
+    if args.db:
+        save_data_to_db(jobs, RAW_DATA_TABLE_NAME, args.db)
+    else:
+        print(jobs.head(20).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -4,15 +4,100 @@ BASE_URL = "https://www.cwjobs.co.uk/jobs/"
 JOB_POST_BASE_URL = "https://www.cwjobs.co.uk"
 URL_TAIL = "?page={page_number}&searchOrigin=jobad"
 ARTICLE_CLASS = "a.res-30nsen"
+JOB_LINK_SELECTOR = 'a[data-testid="job-item-title"]'
+# Raw field name to the CSS selector of its element on a job post page
+JOB_DETAIL_SELECTORS = {
+    'job_title': '.job-ad-display-1sxnrxf',
+    'company_name': '.at-listing__list-icons_company-name.job-ad-display-h9xo01',
+    'location': '.at-listing__list-icons_location.map-trigger.job-ad-display-h9xo01',
+    'employment_type': '.at-listing__list-icons_work-type.job-ad-display-h9xo01',
+    'date_posted_raw': '.at-listing__list-icons_date.job-ad-display-h9xo01',
+    'salary_raw': '.at-listing__list-icons_salary.job-ad-display-7usr2j',
+    'full_description': '.job-ad-display-nnx1yw',
+}
 JOB_TITLE = "DevOps Engineer"
 PAGES_TO_SCRAPE = 11
+# Search categories scraped together by the scheduler, with the number of result pages for each
+SEARCH_CATEGORIES = {
+    JOB_TITLE: PAGES_TO_SCRAPE,
+    'Data Engineer': 11,
+    'Software Engineer': 11,
+    'Data Scientist': 11,
+}
+# A posting is only visited if its listing title contains one of its category's keywords
+CATEGORY_TITLE_KEYWORDS = {
+    'DevOps Engineer': ['DevOps'],
+    'Data Engineer': ['Data Engineer'],
+    'Software Engineer': ['Software Engineer', 'Software Developer'],
+    'Data Scientist': ['Data Scientist'],
+}
+# Stop paging through search results once a page has fewer relevant postings than this
+MIN_PAGE_RELEVANCE = 0.2
+# Detail pages are fetched concurrently, within one shared politeness budget
+DETAIL_PAGE_CONCURRENCY = 4
+REQUESTS_PER_SECOND = 0.5
+MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 2
+# Failed urls are retried by later runs until they have failed this many times
+FRONTIER_MAX_ATTEMPTS = 3
+# Scraped postings are saved in batches of this size as the scrape goes
+FLUSH_BATCH_SIZE = 10
+# The streaming pipeline stores postings in batches of at most this size, queued once full or this old,
+# and holds back the scraper while this many batches are waiting
+PIPELINE_BATCH_SIZE = 5
+PIPELINE_FLUSH_SECONDS = 5
+PIPELINE_QUEUE_SIZE = 4
+# How job detail pages are fetched:
+#   'render' - full render in a visible browser
+#   'lite'   - headless, with images, fonts, media and analytics blocked
+#   'http'   - plain HTTP sharing the browser's cookies, rendering only when the job markup is missing
+DETAIL_FETCH_MODE = 'render'
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'media'}
+BLOCKED_URL_KEYWORDS = [
+    'google-analytics', 'googletagmanager', 'doubleclick', 'hotjar', 'facebook.net',
+    'optimizely', 'newrelic', 'nr-data', 'segment.io', 'bing.com', 'adservice'
+]
 
 current_file_path = Path(__file__).resolve()
 BASE_DIR = current_file_path.parent.parent
 DB_PATH = BASE_DIR / 'jobs.db'
+# A write waits this long for another connection's transaction to finish before failing as locked
+SQLITE_BUSY_TIMEOUT_MS = 60000
 
 RAW_DATA_TABLE_NAME = 'jobs_raw'
 PROCESSED_DATA_TABLE_NAME = 'jobs_processed'
+PIPELINE_STATE_TABLE_NAME = 'pipeline_state'
+HTML_ARCHIVE_TABLE_NAME = 'html_archive'
+# Re-parsed archive pages are staged here before they replace their raw rows
+REEXTRACTED_TABLE_NAME = 'jobs_raw_reextracted'
+FRONTIER_TABLE_NAME = 'url_frontier'
+URL_CATEGORIES_TABLE_NAME = 'url_categories'
+SKILLS_TABLE_NAME = 'skills'
+JOB_SKILLS_TABLE_NAME = 'job_skills'
+SUMMARY_TABLE_NAME = 'summary_jobs'
+SKILL_SUMMARY_TABLE_NAME = 'summary_skills'
+# Salary quantiles in the summary tables are accurate to within this relative error
+SALARY_SKETCH_ACCURACY = 0.01
+# Number of summary query results kept in memory
+SUMMARY_CACHE_SIZE = 256
+NEAR_DUPLICATE_SIGNATURES_TABLE_NAME = 'near_duplicate_signatures'
+NEAR_DUPLICATE_BANDS_TABLE_NAME = 'near_duplicate_bands'
+# Postings whose descriptions share at least this Jaccard similarity of word shingles are reposts
+NEAR_DUPLICATE_THRESHOLD = 0.7
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 128
+# Record timings and counters of each run and write them to METRICS_DIR at its end
+METRICS_ENABLED = False
+METRICS_DIR = BASE_DIR / 'metrics'
+# Keep a compressed copy of every fetched job page for offline re-extraction. Off by default, as the
+# archive keeps every fetch and grows with each run; set to True to re-parse pages after a selector change
+ARCHIVE_HTML = False
+PROCESSING_CHUNK_SIZE = 10000
+
+TARGET_CITIES = [
+    'London', 'Manchester', 'Birmingham', 'Bristol', 'Leeds',
+    'Glasgow', 'Edinburgh', 'Cambridge', 'Oxford', 'Cardiff', 'Belfast'
+]
 
 REGION_TO_CITIES_MAP = {
         'North': [
@@ -0,0 +1,168 @@
+import re
+
+from lxml import etree
+
+_SIMPLE_SELECTOR_PATTERN = re.compile(
+    r'^(?P<tag>[a-zA-Z][\w-]*|\*)?'
+    r'(?P<rest>(?:\.[\w-]+|\[[\w-]+=(?:"[^"]*"|\'[^\']*\')\])*)$'
+)
+_SELECTOR_PART_PATTERN = re.compile(r'\.([\w-]+)|\[([\w-]+)=(?:"([^"]*)"|\'([^\']*)\')\]')
+# Strings inside these tags are not part of get_text() in BeautifulSoup
+_TEXT_NODES = etree.XPath('.//text()[not(ancestor::script or ancestor::style or ancestor::template)]')
+_HTML_PARSER = etree.HTMLParser()
+
+
+class CompiledSelector:
+    """
+    A simple CSS selector compiled to an XPath condition.
+
+    Supports an optional tag name followed by any number of `.class` and
+    `[attribute="value"]` parts, which covers every selector the scraper
+    uses. Classes are matched as whitespace-separated words, as in CSS.
+
+    Parameters
+    ----------
+    css : str
+        CSS selector, e.g. '.at-listing__list-icons_salary.job-ad-display-7usr2j'.
+    """
+
+    def __init__(self, css):
+        match = _SIMPLE_SELECTOR_PATTERN.match(css.strip())
+        if not match or not css.strip():
+            raise ValueError(f"Unsupported selector: '{css}'")
+        self.css = css
+        self.tag = match.group('tag') if match.group('tag') not in (None, '*') else None
+        self.classes = []
+        self.attributes = []
+        for class_name, attribute, double_quoted, single_quoted in _SELECTOR_PART_PATTERN.findall(match.group('rest')):
+            if class_name:
+                self.classes.append(class_name)
+            else:
+                self.attributes.append((attribute, double_quoted or single_quoted))
+        conditions = [f"local-name()='{self.tag.lower()}'"] if self.tag else []
+        conditions += [f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')" for c in self.classes]
+        conditions += [f"@{attribute}='{value}'" for attribute, value in self.attributes]
+        self.condition = ' and '.join(conditions) or 'true()'
+        self._class_set = set(self.classes)
+
+    def matches(self, element):
+        """
+        Check whether an element matched by the combined XPath is matched by this selector.
+        :param element: lxml element.
+        :return: True if the element matches.
+        """
+        if self.tag and element.tag.lower() != self.tag.lower():
+            return False
+        if not self._class_set.issubset((element.get('class') or '').split()):
+            return False
+        return all(element.get(attribute) == value for attribute, value in self.attributes)
+
+
+class FieldExtractor:
+    """
+    Extract several text fields from a page in a single pass.
+
+    The field selectors are compiled once into one XPath expression, so
+    each page is parsed once with lxml and its tree walked once, in C, to
+    find the candidates for every field. Each field takes the first
+    matching element in document order, like BeautifulSoup's select_one,
+    and its text is joined the same way as get_text(strip=True).
+
+    Parameters
+    ----------
+    field_selectors : dict
+        Field name to CSS selector.
+    missing : str
+        Value for fields whose element is not on the page.
+    """
+
+    def __init__(self, field_selectors, missing='N/A'):
+        self.fields = {field: CompiledSelector(css) for field, css in field_selectors.items()}
+        self.missing = missing
+        self._candidates = etree.XPath(
+            '//*[' + ' or '.join(f'({selector.condition})' for selector in self.fields.values()) + ']'
+        )
+
+    def extract(self, html_content):
+        """
+        Extract every field from a page.
+        :param html_content: Html of the page.
+        :return: Dictionary of field name to cleaned text, or `missing` if not found.
+        """
+        results = dict.fromkeys(self.fields, self.missing)
+        root = parse_html(html_content)
+        if root is None:
+            return results
+        remaining = dict(self.fields)
+        for element in self._candidates(root):
+            for field, selector in list(remaining.items()):
+                if selector.matches(element):
+                    results[field] = element_text(element)
+                    del remaining[field]
+            if not remaining:
+                break
+        return results
+
+
+class AttributeExtractor:
+    """
+    Extract an attribute from every element matching a selector.
+
+    Parameters
+    ----------
+    selector : str
+        CSS selector of the elements, e.g. 'a[data-testid="job-item-title"]'.
+    attribute : str
+        Attribute to read, e.g. 'href'.
+    """
+
+    def __init__(self, selector, attribute):
+        self.selector = CompiledSelector(selector)
+        self.attribute = attribute
+        self._values = etree.XPath(f'//*[{self.selector.condition}]/@{attribute}')
+        self._elements = etree.XPath(f'//*[{self.selector.condition}]')
+
+    def extract(self, html_content):
+        """
+        Extract the attribute values from a page, in document order.
+        :param html_content: Html of the page.
+        :return: List of attribute values.
+        """
+        root = parse_html(html_content)
+        if root is None:
+            return []
+        return [str(value) for value in self._values(root)]
+
+    def extract_with_text(self, html_content):
+        """
+        Extract the attribute value and text of every matching element, in document order.
+        :param html_content: Html of the page.
+        :return: List of (attribute value, text) tuples, skipping elements without the attribute.
+        """
+        root = parse_html(html_content)
+        if root is None:
+            return []
+        return [
+            (element.get(self.attribute), element_text(element))
+            for element in self._elements(root)
+            if element.get(self.attribute) is not None
+        ]
+
+
+def parse_html(html_content):
+    """
+    Parse html with lxml's HTML parser.
+    :param html_content: Html of the page.
+    :return: Root element, or None for an empty document.
+    """
+    if not html_content or not html_content.strip():
+        return None
+    return etree.fromstring(html_content, _HTML_PARSER)
+
+def element_text(element):
+    """
+    Get the text of an element the way BeautifulSoup's get_text(strip=True) does.
+    :param element: lxml element.
+    :return: Stripped text fragments joined without separators.
+    """
+    return ''.join(text.strip() for text in _TEXT_NODES(element) if text.strip())
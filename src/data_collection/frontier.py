@@ -0,0 +1,188 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+from src.config import FRONTIER_MAX_ATTEMPTS, FRONTIER_TABLE_NAME, RAW_DATA_TABLE_NAME, URL_CATEGORIES_TABLE_NAME
+from src.utils import get_engine, get_watermark, set_watermark
+
+
+class UrlFrontier:
+    """
+    Persistent queue of job urls to scrape, with a status for each url.
+
+    Urls start as 'pending', become 'done' once their posting is saved, or
+    'failed' with an attempt count. The table's primary key doubles as the
+    indexed set of every url ever discovered, so a url is only scraped
+    once across runs, and an interrupted run resumes with whatever is
+    still pending.
+
+    A url belongs to the first search category that discovered it, which
+    is the one that scrapes it. Every category a url was found under is
+    recorded in a separate categories table. That table is for lookups
+    only: the raw, processed and summary tables attribute each posting to
+    the first category alone, so per-category counts leave out postings
+    also listed under another category.
+
+    Parameters
+    ----------
+    db_path : str or Path
+        Path to the SQLite database.
+    table_name : str
+        Name of the frontier table.
+    max_attempts : int
+        Number of failed runs after which a url is no longer retried.
+    categories_table_name : str
+        Name of the table of (url, search_category) pairs.
+    """
+
+    def __init__(self, db_path, table_name=FRONTIER_TABLE_NAME, max_attempts=FRONTIER_MAX_ATTEMPTS,
+                 categories_table_name=URL_CATEGORIES_TABLE_NAME):
+        self.db_path = db_path
+        self.table_name = table_name
+        self.max_attempts = max_attempts
+        self.categories_table_name = categories_table_name
+        backfilled = get_watermark(db_path, table_name)
+        with get_engine(db_path).begin() as conn:
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{table_name}" ('
+                'url TEXT PRIMARY KEY, search_category TEXT, status TEXT NOT NULL DEFAULT \'pending\', '
+                'attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, updated_at TEXT)'
+            ))
+            conn.execute(text(
+                f'CREATE INDEX IF NOT EXISTS "ix_{table_name}_status" ON "{table_name}" (status, search_category)'
+            ))
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{categories_table_name}" ('
+                'url TEXT NOT NULL, search_category TEXT NOT NULL, PRIMARY KEY (url, search_category))'
+            ))
+            # Postings saved without the frontier, e.g. before it existed, count as done. Only raw rows
+            # added since the last backfill are read, so startup does not grow with the table
+            inspector = inspect(conn)
+            if inspector.has_table(RAW_DATA_TABLE_NAME) and 'url' in [
+                    column['name'] for column in inspector.get_columns(RAW_DATA_TABLE_NAME)]:
+                last_rowid = conn.execute(text(f'SELECT MAX(rowid) FROM "{RAW_DATA_TABLE_NAME}"')).scalar() or 0
+                if last_rowid > backfilled:
+                    new_rows = 'rowid > :after_rowid AND rowid <= :last_rowid AND url IS NOT NULL'
+                    window = {'after_rowid': backfilled, 'last_rowid': last_rowid}
+                    conn.execute(text(
+                        f'INSERT OR IGNORE INTO "{table_name}" (url, search_category, status, attempts) '
+                        f'SELECT url, search_category, \'done\', 1 FROM "{RAW_DATA_TABLE_NAME}" WHERE {new_rows}'
+                    ), window)
+                    conn.execute(text(
+                        f'INSERT OR IGNORE INTO "{categories_table_name}" (url, search_category) '
+                        f'SELECT url, search_category FROM "{RAW_DATA_TABLE_NAME}" '
+                        f'WHERE {new_rows} AND search_category IS NOT NULL'
+                    ), window)
+                    set_watermark(conn, table_name, last_rowid)
+
+    def add(self, urls, search_category=None):
+        """
+        Queue newly discovered urls, ignoring any that are already known.
+
+        Known urls are not queued again, but the search category is still
+        recorded for them.
+        :param urls: Iterable of job urls.
+        :param search_category: Name of the searched job role.
+        :return: Number of urls that were new.
+        """
+        rows = [{'url': url, 'search_category': search_category, 'updated_at': _now()} for url in urls]
+        if not rows:
+            return 0
+        with get_engine(self.db_path).begin() as conn:
+            if search_category is not None:
+                conn.execute(
+                    text(f'INSERT OR IGNORE INTO "{self.categories_table_name}" (url, search_category) '
+                         'VALUES (:url, :search_category)'),
+                    rows,
+                )
+            return conn.execute(
+                text(f'INSERT OR IGNORE INTO "{self.table_name}" (url, search_category, updated_at) '
+                     'VALUES (:url, :search_category, :updated_at)'),
+                rows,
+            ).rowcount
+
+    def pending(self, search_category=None, batch_size=100):
+        """
+        Stream the urls still to scrape, in discovery order.
+
+        Failed urls are included until they reach max_attempts. Urls are read
+        in small batches, so memory does not grow with the frontier.
+        :param search_category: Only return urls of this job role, if given.
+        :param batch_size: Number of urls read from the database at a time.
+        :return: Generator of urls.
+        """
+        category_filter = 'AND search_category = :search_category' if search_category is not None else ''
+        query = text(
+            f'SELECT rowid, url FROM "{self.table_name}" WHERE rowid > :after_rowid '
+            f"AND (status = 'pending' OR (status = 'failed' AND attempts < :max_attempts)) {category_filter} "
+            'ORDER BY rowid LIMIT :batch_size'
+        )
+        after_rowid = 0
+        while True:
+            with get_engine(self.db_path).connect() as conn:
+                rows = conn.execute(query, {
+                    'after_rowid': after_rowid,
+                    'max_attempts': self.max_attempts,
+                    'search_category': search_category,
+                    'batch_size': batch_size,
+                }).fetchall()
+            if not rows:
+                return
+            for _, url in rows:
+                yield url
+            after_rowid = rows[-1][0]
+
+    def mark_done(self, urls):
+        """
+        Record that the postings at these urls have been saved.
+        :param urls: Iterable of job urls.
+        """
+        rows = [{'url': url, 'updated_at': _now()} for url in urls]
+        if not rows:
+            return
+        with get_engine(self.db_path).begin() as conn:
+            conn.execute(
+                text(f'UPDATE "{self.table_name}" SET status = \'done\', attempts = attempts + 1, '
+                     'last_error = NULL, updated_at = :updated_at WHERE url = :url'),
+                rows,
+            )
+
+    def mark_failed(self, url, error):
+        """
+        Record a failed attempt at scraping a url.
+        :param url: Job url.
+        :param error: Description of the error.
+        """
+        with get_engine(self.db_path).begin() as conn:
+            conn.execute(
+                text(f'UPDATE "{self.table_name}" SET status = \'failed\', attempts = attempts + 1, '
+                     'last_error = :error, updated_at = :updated_at WHERE url = :url'),
+                {'url': url, 'error': str(error), 'updated_at': _now()},
+            )
+
+    def categories(self, url):
+        """
+        Get every search category a url was found under.
+        :param url: Job url.
+        :return: Sorted list of search categories.
+        """
+        with get_engine(self.db_path).connect() as conn:
+            rows = conn.execute(
+                text(f'SELECT search_category FROM "{self.categories_table_name}" '
+                     'WHERE url = :url ORDER BY search_category'),
+                {'url': url},
+            ).fetchall()
+        return [search_category for search_category, in rows]
+
+    def counts(self):
+        """
+        Count urls by status.
+        :return: Dictionary of status to number of urls.
+        """
+        with get_engine(self.db_path).connect() as conn:
+            rows = conn.execute(text(f'SELECT status, COUNT(*) FROM "{self.table_name}" GROUP BY status')).fetchall()
+        return dict(rows)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,92 @@
+import zlib
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from src.config import HTML_ARCHIVE_TABLE_NAME
+from src.utils import get_engine
+
+
+class HtmlArchive:
+    """
+    Append-only archive of fetched pages, stored zlib-compressed in SQLite.
+
+    Every fetch of a url is kept under (url, fetched_at), so pages can be
+    re-parsed offline when the site's markup changes instead of being
+    scraped again.
+
+    Parameters
+    ----------
+    db_path : str or Path
+        Path to the SQLite database.
+    table_name : str
+        Name of the archive table.
+    compression_level : int
+        zlib compression level, from 1 (fastest) to 9 (smallest).
+    """
+
+    def __init__(self, db_path, table_name=HTML_ARCHIVE_TABLE_NAME, compression_level=6):
+        self.db_path = db_path
+        self.table_name = table_name
+        self.compression_level = compression_level
+        with get_engine(db_path).begin() as conn:
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{table_name}" ('
+                'url TEXT NOT NULL, fetched_at TEXT NOT NULL, search_category TEXT, html BLOB NOT NULL, '
+                'PRIMARY KEY (url, fetched_at))'
+            ))
+
+    def store(self, url, html_content, search_category=None, fetched_at=None):
+        """
+        Compress and store the html of a fetched page.
+        :param url: Url the page was fetched from.
+        :param html_content: Html of the page.
+        :param search_category: Name of the searched job role.
+        :param fetched_at: Fetch time, defaults to now (UTC).
+        """
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        with get_engine(self.db_path).begin() as conn:
+            conn.execute(
+                text(f'INSERT OR REPLACE INTO "{self.table_name}" (url, fetched_at, search_category, html) '
+                     'VALUES (:url, :fetched_at, :search_category, :html)'),
+                {
+                    'url': url,
+                    'fetched_at': fetched_at.isoformat(),
+                    'search_category': search_category,
+                    'html': zlib.compress(html_content.encode('utf-8'), self.compression_level),
+                },
+            )
+
+    def iter_latest(self, batch_size=500):
+        """
+        Stream the most recent fetch of every url, in archive order.
+        :param batch_size: Number of pages per batch.
+        :return: Generator of lists of (url, search_category, compressed html) tuples.
+        """
+        query = text(
+            f'SELECT rowid, url, search_category, html FROM "{self.table_name}" AS a '
+            f'WHERE rowid > :after_rowid AND fetched_at = '
+            f'(SELECT MAX(fetched_at) FROM "{self.table_name}" AS b WHERE b.url = a.url) '
+            'ORDER BY rowid LIMIT :batch_size'
+        )
+        after_rowid = 0
+        while True:
+            with get_engine(self.db_path).connect() as conn:
+                rows = conn.execute(query, {'after_rowid': after_rowid, 'batch_size': batch_size}).fetchall()
+            if not rows:
+                return
+            yield [(url, search_category, html) for _, url, search_category, html in rows]
+            after_rowid = rows[-1][0]
+
+    def __len__(self):
+        with get_engine(self.db_path).connect() as conn:
+            return conn.execute(text(f'SELECT COUNT(*) FROM "{self.table_name}"')).scalar()
+
+
+def decompress_html(compressed_html):
+    """
+    Restore the html of an archived page.
+    :param compressed_html: zlib-compressed html bytes.
+    :return: Html string.
+    """
+    return zlib.decompress(compressed_html).decode('utf-8')
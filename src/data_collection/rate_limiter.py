@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Asynchronous token-bucket rate limiter shared by concurrent tasks.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Each
+    request takes one token, waiting until one is available, so the whole
+    pool of tasks together never exceeds the rate over time.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    capacity : int
+        Maximum number of tokens that can be saved up for a burst.
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.total_wait = 0.0
+
+    async def acquire(self):
+        """
+        Wait until a token is available and take it.
+        :return: Seconds spent waiting.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            wait = 0.0
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+                self._tokens = 1
+                self._updated_at = time.monotonic()
+            self._tokens -= 1
+        self.total_wait += wait
+        return wait
@@ -0,0 +1,94 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import (
+    DB_PATH, JOB_DETAIL_SELECTORS, PROCESSED_DATA_TABLE_NAME, RAW_DATA_TABLE_NAME, REEXTRACTED_TABLE_NAME
+)
+from src.data_collection.extraction import FieldExtractor
+from src.data_collection.html_archive import HtmlArchive, decompress_html
+from src.data_processing.data_cleaning import reset_processed_tables
+from src.utils import drop_table, replace_rows_from_table, save_data_to_db
+
+_extractor = None
+
+
+def _extract_batch(pages):
+    """
+    Parse a batch of archived pages into raw job records, in a worker process.
+    :param pages: List of (url, search_category, compressed html) tuples.
+    :return: List of raw job detail dictionaries.
+    """
+    global _extractor
+    if _extractor is None:
+        _extractor = FieldExtractor(JOB_DETAIL_SELECTORS)
+    records = []
+    for url, search_category, compressed_html in pages:
+        job_data_raw = _extractor.extract(decompress_html(compressed_html))
+        job_data_raw['url'] = url
+        job_data_raw['search_category'] = search_category
+        records.append(job_data_raw)
+    return records
+
+def reextract_archive(db_path, workers=None, batch_size=500):
+    """
+    Replace the raw rows of archived pages by re-parsing the latest archived copy of every page.
+
+    Raw rows whose url has no archived page, such as those scraped before
+    archiving was switched on, are kept. Batches are parsed on a process
+    pool while the parent writes finished batches, in archive order, to a
+    staging table. The raw rows are only swapped for the staged ones once
+    every page is parsed, in one transaction, so a failed or interrupted run
+    leaves the raw table as it was. The re-extracted rows get new raw_ids,
+    so the processed table and the tables keyed on its raw_ids are dropped,
+    to be rebuilt by the next cleaning run.
+    :param db_path: Path to the SQLite database.
+    :param workers: Number of worker processes, defaults to the number of CPUs.
+    :param batch_size: Number of pages parsed per task.
+    :raises RuntimeError: If a batch cannot be written to the staging table.
+    """
+    workers = workers or os.cpu_count() or 1
+    archive = HtmlArchive(db_path)
+    # Left over by an interrupted run
+    drop_table(db_path, REEXTRACTED_TABLE_NAME)
+    start = time.perf_counter()
+    pages_parsed = 0
+
+    def stage(records):
+        if save_data_to_db(records, REEXTRACTED_TABLE_NAME, db_path) is None:
+            raise RuntimeError(f"Could not stage re-extracted pages in '{REEXTRACTED_TABLE_NAME}', "
+                               f"'{RAW_DATA_TABLE_NAME}' is unchanged.")
+        return len(records)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a bounded number of batches in flight so memory stays flat
+            in_flight = deque()
+            for pages in archive.iter_latest(batch_size):
+                in_flight.append(pool.submit(_extract_batch, pages))
+                if len(in_flight) >= workers * 2:
+                    pages_parsed += stage(in_flight.popleft().result())
+            while in_flight:
+                pages_parsed += stage(in_flight.popleft().result())
+    except Exception:
+        drop_table(db_path, REEXTRACTED_TABLE_NAME)
+        raise
+    elapsed = time.perf_counter() - start
+    print(f"Re-extracted {pages_parsed} archived pages in {elapsed:.1f}s "
+          f"({pages_parsed / max(elapsed, 1e-9):.0f} pages/sec).")
+    if not pages_parsed:
+        return
+    # Dropped first, so an interruption before the swap leaves the untouched raw rows to be processed from scratch
+    reset_processed_tables(db_path)
+    replaced, inserted = replace_rows_from_table(db_path, RAW_DATA_TABLE_NAME, REEXTRACTED_TABLE_NAME, 'url')
+    print(f"Replaced {replaced} raw rows with {inserted} rows parsed from archived pages.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild the raw jobs table from the html archive.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes.")
+    parser.add_argument('--batch-size', type=int, default=500, help="Pages parsed per task.")
+    args = parser.parse_args()
+    reextract_archive(DB_PATH, workers=args.workers, batch_size=args.batch_size)
+    print(f"Run the cleaning script to rebuild '{PROCESSED_DATA_TABLE_NAME}'.")
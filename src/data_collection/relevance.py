@@ -0,0 +1,35 @@
+import re
+
+from src.config import CATEGORY_TITLE_KEYWORDS
+
+
+class TitleMatcher:
+    """
+    Decide whether a job title is relevant to a search category.
+
+    Parameters
+    ----------
+    keywords : list of str
+        A title is relevant if it contains any of these, ignoring case.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._pattern = re.compile('|'.join(re.escape(keyword) for keyword in self.keywords), re.IGNORECASE)
+
+    def matches(self, job_title):
+        """
+        Check a job title against the keywords.
+        :param job_title: Job title from a listing or job post.
+        :return: True if the title is relevant.
+        """
+        return isinstance(job_title, str) and self._pattern.search(job_title) is not None
+
+
+def title_matcher_for(search_category):
+    """
+    Build the title matcher for a search category.
+    :param search_category: Name of the searched job role.
+    :return: TitleMatcher using the category's configured keywords, or the category name itself.
+    """
+    return TitleMatcher(CATEGORY_TITLE_KEYWORDS.get(search_category, [search_category]))
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+
+from playwright.async_api import async_playwright
+
+from src.config import (ARCHIVE_HTML, BASE_URL, DB_PATH, DETAIL_FETCH_MODE, REQUESTS_PER_SECOND,
+                        SEARCH_CATEGORIES, URL_TAIL)
+from src.data_collection.frontier import UrlFrontier
+from src.data_collection.html_archive import HtmlArchive
+from src.data_collection.rate_limiter import TokenBucket
+from src.data_collection.scraper import JobScraper
+from src.metrics import metrics
+
+
+def scrape_categories(search_categories, frontier, archive=None, **scraper_options):
+    """
+    Scrape several search categories at once, sharing one browser.
+    :param search_categories: Dictionary of job title to number of search result pages.
+    :param frontier: UrlFrontier the postings are queued in and saved through.
+    :param archive: HtmlArchive to store fetched pages in, optional.
+    :param scraper_options: Extra keyword arguments for each JobScraper.
+    :return: Dictionary of job title to the error that stopped it, for categories that failed.
+    """
+    return asyncio.run(scrape_categories_async(search_categories, frontier, archive, **scraper_options))
+
+async def scrape_categories_async(search_categories, frontier, archive=None,
+                                  requests_per_second=REQUESTS_PER_SECOND, fetch_mode=DETAIL_FETCH_MODE,
+                                  sink_factory=None, browser=None, **scraper_options):
+    """
+    Asynchronous version of scrape_categories, for use inside a running event loop.
+
+    Every category runs in its own context of a single browser, so they
+    are scraped in parallel without separate cookies getting mixed up,
+    while one token bucket keeps the combined request rate at
+    `requests_per_second`. The frontier decides which category owns a
+    posting found under several of them: it is fetched once, by the
+    first category to discover it, and all of its categories are
+    recorded in the frontier's categories table.
+    :param search_categories: Dictionary of job title to number of search result pages.
+    :param frontier: UrlFrontier the postings are queued in and saved through.
+    :param archive: HtmlArchive to store fetched pages in, optional.
+    :param requests_per_second: Maximum request rate across all categories.
+    :param fetch_mode: How job pages are fetched, see JobScraper.
+    :param sink_factory: Function of a job title returning the sink its postings go to,
+        by default they are saved through the frontier.
+    :param browser: Already running Playwright browser to use, by default one is launched.
+    :param scraper_options: Extra keyword arguments for each JobScraper.
+    :return: Dictionary of job title to the error that stopped it, for categories that failed.
+    """
+    rate_limiter = TokenBucket(requests_per_second)
+    scrapers = {
+        job_title: JobScraper(BASE_URL, URL_TAIL, fetch_mode=fetch_mode, archive=archive, frontier=frontier,
+                              rate_limiter=rate_limiter, **scraper_options)
+        for job_title in search_categories
+    }
+    start = time.perf_counter()
+
+    async def scrape_all(browser):
+        return await asyncio.gather(
+            *(scraper.scrape_category(browser, job_title, search_categories[job_title],
+                                      sink=sink_factory(job_title) if sink_factory else None)
+              for job_title, scraper in scrapers.items()),
+            return_exceptions=True,
+        )
+
+    if browser is not None:
+        results = await scrape_all(browser)
+    else:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=fetch_mode != 'render')
+            try:
+                results = await scrape_all(browser)
+            finally:
+                await browser.close()
+    errors = {}
+    for job_title, result in zip(scrapers, results):
+        if isinstance(result, Exception):
+            print(f"Scraping '{job_title}' failed: {result!r}")
+            errors[job_title] = result
+    elapsed = time.perf_counter() - start
+    print(f"Scraped {len(scrapers) - len(errors)} of {len(scrapers)} categories in {elapsed:.1f}s, "
+          f"with {rate_limiter.total_wait:.1f}s spent waiting on the shared rate limit.")
+    metrics.write_report('scrape')
+    return errors
+
+if __name__ == '__main__':
+    if metrics.enabled:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    frontier = UrlFrontier(DB_PATH)
+    scrape_categories(SEARCH_CATEGORIES, frontier, archive=HtmlArchive(DB_PATH) if ARCHIVE_HTML else None)
+    print(f"Frontier status: {frontier.counts()}")
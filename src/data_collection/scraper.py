@@ -1,28 +1,84 @@
+import asyncio
+import logging
+import re
 import time
 import random
-import traceback
 
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 
 from src.config import *
+from src.data_collection.extraction import AttributeExtractor, FieldExtractor
+from src.data_collection.frontier import UrlFrontier
+from src.data_collection.html_archive import HtmlArchive
+from src.data_collection.relevance import title_matcher_for
+from src.data_collection.rate_limiter import TokenBucket
+from src.metrics import metrics
 from src.utils import save_data_to_db
 
+FETCH_MODES = ('render', 'lite', 'http')
+JOB_AD_WRAPPER_PATTERN = re.compile(r'class="[^"]*\bjob-ad-wrapper\b')
+
 
 class JobScraper:
     """
     This class is responsible for scraping job posting websites.
 
+    Job detail pages are fetched by a pool of browser pages working in
+    parallel. A shared token bucket keeps the requests of the whole pool
+    within one politeness budget, and failed pages are retried with
+    exponential backoff.
+
     Parameters
     ----------
     base_url : str
         User supplied base url of the website to be scraped.
+    concurrency : int
+        Number of browser pages fetching job details at the same time.
+    requests_per_second : float
+        Maximum request rate across all pages.
+    max_retries : int
+        Number of attempts per job url before giving up on it.
+    fetch_mode : str
+        How job pages are fetched: 'render' fully renders them in a visible
+        browser, 'lite' runs headless and blocks images, fonts, media and
+        analytics requests, and 'http' downloads them over the browser
+        context's keep-alive HTTP client, sharing its cookies, and only
+        renders pages whose job markup is missing.
+    archive : HtmlArchive, optional
+        If given, the html of every fetched job page is stored in it.
+    frontier : UrlFrontier, optional
+        If given, discovered urls are queued in it, urls already scraped are
+        skipped, and postings are saved to its database in small batches as
+        they are scraped, so an interrupted run can resume where it stopped.
+    min_page_relevance : float
+        Paging through search results stops after a page on which fewer than
+        this fraction of postings have a title relevant to the search.
+    rate_limiter : TokenBucket, optional
+        Rate limiter to share with other scrapers. By default each run gets
+        its own, allowing `requests_per_second`.
     """
 
-    def __init__(self, base_url, url_tail=None):
+    def __init__(self, base_url, url_tail=None, concurrency=DETAIL_PAGE_CONCURRENCY,
+                 requests_per_second=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES,
+                 fetch_mode=DETAIL_FETCH_MODE, archive=None, frontier=None,
+                 min_page_relevance=MIN_PAGE_RELEVANCE, rate_limiter=None):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"fetch_mode must be one of {FETCH_MODES}, got '{fetch_mode}'")
         self.base_url = base_url
         self.url_tail = url_tail
         self.headers = {'User-Agent': 'My Job Scraper Project'}
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.fetch_mode = fetch_mode
+        self.archive = archive
+        self.frontier = frontier
+        self.min_page_relevance = min_page_relevance
+        self.search_category = None
+        self.title_matcher = None
+        self.rate_limiter = rate_limiter
+        self.detail_extractor = FieldExtractor(JOB_DETAIL_SELECTORS)
+        self.link_extractor = AttributeExtractor(JOB_LINK_SELECTOR, 'href')
 
     def run(self, job_title, pages_to_scrape=1):
         """
@@ -34,18 +90,60 @@ class JobScraper:
         :param job_title: The job title to search for (e.g., 'Data Engineer').
         :param pages_to_scrape: The number of search result pages to scrape.
         :return: A list of dictionaries, where each dictionary contains the
-             detailed data for one job posting.
-        """
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-            page_urls = self._generate_page_urls(job_title, pages_to_scrape)
-            first_page_url = page_urls[0]
-            #job_urls = self._get_job_urls(page, page_urls)
-            job_urls = self._get_job_urls(page, first_page_url, pages_to_scrape)
-            all_job_details = self._scrape_job_details(page, job_urls)
-            browser.close()
-            return all_job_details
+             detailed data for one job posting. With a frontier the postings
+             are saved as they are scraped and the list is empty.
+        """
+        return asyncio.run(self.run_async(job_title, pages_to_scrape))
+
+    async def run_async(self, job_title, pages_to_scrape=1):
+        """
+        Asynchronous version of run, for use inside a running event loop.
+        :param job_title: The job title to search for (e.g., 'Data Engineer').
+        :param pages_to_scrape: The number of search result pages to scrape.
+        :return: A list of dictionaries with the detailed data for each job posting.
+        """
+        try:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=self.fetch_mode != 'render')
+                try:
+                    return await self.scrape_category(browser, job_title, pages_to_scrape)
+                finally:
+                    await browser.close()
+        finally:
+            metrics.write_report('scrape')
+
+    async def scrape_category(self, browser, job_title, pages_to_scrape=1, sink=None):
+        """
+        Scrape one search category in a new context of an already running browser.
+        :param browser: The Playwright browser to open the context in.
+        :param job_title: The job title to search for (e.g., 'Data Engineer').
+        :param pages_to_scrape: The number of search result pages to scrape.
+        :param sink: Receiver of the scraped postings, see _RecordSink. By default
+            they are saved through the frontier, or collected without one.
+        :return: A list of dictionaries with the detailed data for each job posting.
+        """
+        if self.rate_limiter is None:
+            self.rate_limiter = TokenBucket(self.requests_per_second)
+        self.search_category = job_title
+        self.title_matcher = title_matcher_for(job_title)
+        context = await browser.new_context()
+        try:
+            with metrics.timer('scraper_run_seconds', category=job_title):
+                if self.fetch_mode != 'render':
+                    await context.route('**/*', _block_heavy_resources)
+                page = await context.new_page()
+                page_urls = self._generate_page_urls(job_title, pages_to_scrape)
+                first_page_url = page_urls[0]
+                job_urls = await self._get_job_urls(page, first_page_url, pages_to_scrape)
+                if self.frontier is not None:
+                    new_urls = self.frontier.add(job_urls, job_title)
+                    print(f"Queued {new_urls} new {job_title} job urls, "
+                          f"skipping {len(job_urls) - new_urls} already known.")
+                    job_urls = self.frontier.pending(job_title)
+                sink = sink or _RecordSink(self.frontier, job_title)
+                return await self._scrape_job_details(context, job_urls, sink)
+        finally:
+            await context.close()
 
     def _generate_page_urls(self, job_title, pages_to_scrape):
         """
@@ -62,88 +160,285 @@ class JobScraper:
             page_urls.append(page_url)
         return page_urls
 
-    @staticmethod
-    def _get_job_urls(page, first_page_url, pages_to_scrape):
-        page.goto(first_page_url, timeout=60000)
+    async def _get_job_urls(self, page, first_page_url, pages_to_scrape):
+        """
+        Collect the urls of relevant postings from the search result pages.
+
+        Postings whose listing title does not match the search category are
+        skipped without visiting their detail page. Results are sorted by
+        relevance, so paging stops at the first page whose share of relevant
+        postings falls below `min_page_relevance`.
+        :param page: The Playwright page to browse the results in.
+        :param first_page_url: Url of the first search result page.
+        :param pages_to_scrape: Maximum number of search result pages to read.
+        :return: List of relevant job urls.
+        """
+        await self._acquire()
+        with metrics.timer('scraper_step_seconds', step='navigate', page='search'):
+            await page.goto(first_page_url, timeout=60000)
         cookie_button = page.get_by_role("button", name="Just Necessary")
-        cookie_button.wait_for(timeout=5000)
-        cookie_button.click()
+        await cookie_button.wait_for(timeout=5000)
+        await cookie_button.click()
         job_urls = []
+        skipped = 0
         for i in range(pages_to_scrape):
-            page.wait_for_selector('.row-rl.job-results-row')
-            soup = BeautifulSoup(page.content(), 'lxml')
-            links = soup.select('a[data-testid="job-item-title"]')
-            for link in links:
-                job_url = link.get('href')
-                job_urls.append(JOB_POST_BASE_URL + job_url)
-            print(f"Collected {len(job_urls)} job postings from page {i+1} of {pages_to_scrape}")
+            with metrics.timer('scraper_step_seconds', step='wait_for_selector', page='search'):
+                await page.wait_for_selector('.row-rl.job-results-row')
+            html_content = await page.content()
+            with metrics.timer('scraper_step_seconds', step='parse', page='search'):
+                relevant_urls, listed = self._select_relevant_jobs(html_content)
+            metrics.count('scraper_search_pages_total', category=self.search_category)
+            metrics.count('scraper_postings_skipped_total', listed - len(relevant_urls), category=self.search_category)
+            job_urls.extend(relevant_urls)
+            skipped += listed - len(relevant_urls)
+            relevance = len(relevant_urls) / listed if listed else 0.0
+            print(f"Collected {len(relevant_urls)} of {listed} job postings from page {i+1} of {pages_to_scrape} "
+                  f"({relevance:.0%} relevant)")
+            if relevance < self.min_page_relevance:
+                print(f"Fewer than {self.min_page_relevance:.0%} of the postings on page {i+1} are relevant. "
+                      f"Ending scrape.")
+                break
             if i < pages_to_scrape - 1:
                 try:
-                    page.get_by_role("link", name="Next", exact=True).click()
-                    time.sleep(random.uniform(2, 4))
+                    await self._acquire()
+                    with metrics.timer('scraper_step_seconds', step='navigate', page='search'):
+                        await page.get_by_role("link", name="Next", exact=True).click()
                 except Exception as e:
                     print(f"Could not find the 'Next Page' button. Ending scrape. Error: {e}")
                     break
+        print(f"Skipped {skipped} irrelevant postings and kept {len(job_urls)} to visit "
+              f"({skipped / max(len(job_urls), 1):.2f} skipped per visited).")
         return job_urls
 
-    def _scrape_job_details(self, page, job_urls):
+    def _select_relevant_jobs(self, html_content):
+        """
+        Pick the postings on a search result page whose title matches the search category.
+        :param html_content: Html of the search result page.
+        :return: Tuple of (list of relevant job urls, number of postings on the page).
+        """
+        links = self.link_extractor.extract_with_text(html_content)
+        relevant_urls = [JOB_POST_BASE_URL + href for href, title in links if self.title_matcher.matches(title)]
+        return relevant_urls, len(links)
+
+    async def _scrape_job_details(self, context, job_urls, sink=None):
         """
         Visit each individual job post url and extract the detailed content.
-        :param page: The active Playwright object.
-        :param job_urls: List of individual job urls.
-        :return: List of job details for each individual job post.
+
+        Urls are shared out to a pool of pages. Results are handed to the
+        sink in the order of `job_urls`, and a page only moves on to its next
+        url once the sink has drained, so a slow sink holds back the scrape.
+        :param context: The active Playwright browser context.
+        :param job_urls: Iterable of individual job urls, consumed lazily.
+        :param sink: _RecordSink receiving the results, defaults to collecting them.
+        :return: List of job details for each individual job post not yet saved by the sink.
         """
-        irrelevant_count = 0
-        all_job_details = []
-        for url in job_urls:
+        sink = sink or _RecordSink()
+        pending = enumerate(job_urls)
+        ordered = _OrderedResults(sink)
+        start = time.perf_counter()
+
+        async def worker():
+            page = await context.new_page()
             try:
-                page.goto(url, timeout=60000)
-                page.wait_for_selector('.job-ad-wrapper', timeout=10000)
-                html_content = page.content()
-                soup = BeautifulSoup(html_content, 'lxml')
-                job_title = self._extract_job_content(soup, '.job-ad-display-1sxnrxf')
-                company_name = self._extract_job_content(soup, '.at-listing__list-icons_company-name.job-ad-display-h9xo01')
-                location_raw = self._extract_job_content(soup, '.at-listing__list-icons_location.map-trigger.job-ad-display-h9xo01')
-                employment_type = self._extract_job_content(soup, '.at-listing__list-icons_work-type.job-ad-display-h9xo01')
-                date_posted_raw = self._extract_job_content(soup, '.at-listing__list-icons_date.job-ad-display-h9xo01')
-                salary_raw = self._extract_job_content(soup, '.at-listing__list-icons_salary.job-ad-display-7usr2j')
-                full_description = self._extract_job_content(soup, '.job-ad-display-nnx1yw')
-                job_data_raw = {
-                    'job_title': job_title,
-                    'company_name': company_name,
-                    'location': location_raw,
-                    'employment_type': employment_type,
-                    'date_posted_raw': date_posted_raw,
-                    'salary_raw': salary_raw,
-                    'full_description': full_description
-                }
-                if 'DevOps' not in job_title:
-                    irrelevant_count += 1
-                else:
-                    irrelevant_count = 0
-                if irrelevant_count >= 5:
-                    break
-                all_job_details.append(job_data_raw)
-                print(f"Successfully scraped: {job_title} at {company_name}")
+                while True:
+                    try:
+                        index, url = next(pending)
+                    except StopIteration:
+                        return
+                    try:
+                        job_data_raw = await self._fetch_job_details(page, url)
+                    except Exception as e:
+                        ordered.add(index, url, None, e)
+                    else:
+                        print(f"Successfully scraped: {job_data_raw['job_title']} at {job_data_raw['company_name']}")
+                        ordered.add(index, url, job_data_raw)
+                    await sink.drain()
+            finally:
+                await page.close()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+        sink.flush()
+        await sink.drain()
+        elapsed = time.perf_counter() - start
+        print(f"Fetched {ordered.fetched} job pages in {elapsed:.1f}s "
+              f"({ordered.fetched / max(elapsed, 1e-9):.2f} pages/sec).")
+        return sink.records
+
+    async def _fetch_job_details(self, page, url):
+        """
+        Fetch and parse one job post, retrying with exponential backoff.
+        :param page: The Playwright page to load the post in.
+        :param url: Job post url.
+        :return: Dictionary of raw job details.
+        :raises Exception: The last error, once every attempt has failed.
+        """
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                html_content = await self._load_job_page(page, url)
+                if self.archive is not None:
+                    # Compression and the SQLite write run on a thread, so other pages keep fetching meanwhile
+                    with metrics.timer('scraper_step_seconds', step='archive', page='job'):
+                        await asyncio.to_thread(self.archive.store, url, html_content, self.search_category)
+                with metrics.timer('scraper_step_seconds', step='parse', page='job'):
+                    job_data_raw = self._parse_job_details(html_content)
+                job_data_raw['url'] = url
+                metrics.count('scraper_pages_fetched_total', category=self.search_category)
+                return job_data_raw
             except Exception as e:
-                print(f"Could not process page {url}")
-                traceback.print_exc()
-            time.sleep(random.uniform(2,4))
-        return all_job_details
+                metrics.count('scraper_fetch_errors_total', error=type(e).__name__)
+                if attempt == self.max_retries:
+                    print(f"Could not process page {url} after {attempt} attempts: {e!r}")
+                    metrics.count('scraper_pages_failed_total', error=type(e).__name__)
+                    raise
+                with metrics.timer('scraper_sleep_seconds', reason='backoff'):
+                    await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    async def _load_job_page(self, page, url):
+        """
+        Get the html of a job post according to the fetch mode.
+        :param page: The Playwright page to render the post in, if needed.
+        :param url: Job post url.
+        :return: Html of the job post page.
+        """
+        if self.fetch_mode == 'http':
+            await self._acquire()
+            with metrics.timer('scraper_step_seconds', step='http_get', page='job'):
+                response = await page.context.request.get(url, timeout=60000)
+                html_content = await response.text() if response.ok else None
+            await self._count_downloaded(response)
+            if html_content is not None and JOB_AD_WRAPPER_PATTERN.search(html_content):
+                return html_content
+            metrics.count('scraper_render_fallbacks_total')
+        await self._acquire()
+        with metrics.timer('scraper_step_seconds', step='navigate', page='job'):
+            response = await page.goto(url, timeout=60000)
+        await self._count_downloaded(response)
+        with metrics.timer('scraper_step_seconds', step='wait_for_selector', page='job'):
+            await page.wait_for_selector('.job-ad-wrapper', timeout=10000)
+        with metrics.timer('scraper_step_seconds', step='content', page='job'):
+            return await page.content()
+
+    async def _count_downloaded(self, response):
+        """
+        Count the body of a job page response as downloaded bytes.
+
+        Only the document itself is counted, as received over the network
+        after decompression, not the resources the browser loads with it.
+        :param response: Playwright response of the HTTP request or navigation, or None.
+        """
+        if metrics.enabled and response is not None:
+            metrics.count('scraper_bytes_downloaded_total', len(await response.body()),
+                          category=self.search_category)
+
+    async def _acquire(self):
+        """
+        Wait for the rate limiter, counting the wait as politeness sleep.
+        """
+        with metrics.timer('scraper_sleep_seconds', reason='rate_limit'):
+            await self.rate_limiter.acquire()
+
+    def _parse_job_details(self, html_content):
+        """
+        Extract the raw job details from the html of a job post.
+        :param html_content: Html of the job post page.
+        :return: Dictionary of raw job details, with 'N/A' for missing fields.
+        """
+        return self.detail_extractor.extract(html_content)
+
+
+def is_blocked_request(resource_type, url):
+    """
+    Decide whether a request is unnecessary for extracting job details.
+    :param resource_type: Playwright resource type of the request.
+    :param url: Requested url.
+    :return: True for images, fonts, media and known analytics or ad requests.
+    """
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    return any(keyword in url for keyword in BLOCKED_URL_KEYWORDS)
+
+async def _block_heavy_resources(route):
+    if is_blocked_request(route.request.resource_type, route.request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class _OrderedResults:
+    """
+    Hands results arriving out of order to a sink in url order.
+
+    Results are released as soon as they are contiguous, so only the
+    window of in-flight urls is held in memory and batches are saved in
+    the same order as a sequential scrape would save them.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.next_index = 0
+        self.fetched = 0
+        self._results = {}
+
+    def add(self, index, url, job_data_raw, error=None):
+        self.fetched += 1
+        self._results[index] = (url, job_data_raw, error)
+        while self.next_index in self._results:
+            url, job_data_raw, error = self._results.pop(self.next_index)
+            if job_data_raw is None:
+                self.sink.failed(url, error)
+            else:
+                self.sink.add(url, job_data_raw)
+            self.next_index += 1
+
+
+class _RecordSink:
+    """
+    Receives scraped postings in url order.
 
-    @staticmethod
-    def _extract_job_content(soup, content_selector):
+    Without a frontier the postings are collected in memory. With one they
+    are saved in batches of `flush_size` and their urls marked done, so an
+    interrupted run loses at most one batch and memory stays constant.
+    """
+
+    def __init__(self, frontier=None, search_category=None, flush_size=FLUSH_BATCH_SIZE):
+        self.frontier = frontier
+        self.search_category = search_category
+        self.flush_size = flush_size
+        self.records = []
+        self._urls = []
+
+    def add(self, url, job_data_raw):
+        self.records.append(job_data_raw)
+        self._urls.append(url)
+        if self.frontier is not None and len(self.records) >= self.flush_size:
+            self.flush()
+
+    def failed(self, url, error):
+        if self.frontier is not None:
+            self.frontier.mark_failed(url, repr(error))
+
+    async def drain(self):
         """
-        Extract specified content from a job post.
-        :param soup: The BeautifulSoup object of the page to parse.
-        :param content_selector: The CSS selector for the specific element to find.
-        :return: String containing the cleaned text, or 'N/A' if the element is not found.
+        Wait until the sink can take more postings.
+
+        Batches are saved as soon as they are full, so there is nothing to wait for.
         """
-        element = soup.select_one(content_selector)
-        content = element.get_text(strip=True) if element else 'N/A'
-        return content
+
+    def flush(self):
+        if self.frontier is None or not self.records:
+            return
+        written = save_data_to_db(self.records, RAW_DATA_TABLE_NAME, self.frontier.db_path, self.search_category)
+        if written is not None:
+            self.frontier.mark_done(self._urls)
+            self.records = []
+            self._urls = []
 
 if __name__ == '__main__':
-    scraper = JobScraper(BASE_URL, URL_TAIL)
-    data = scraper.run(job_title=JOB_TITLE, pages_to_scrape=PAGES_TO_SCRAPE)
-    save_data_to_db(data, RAW_DATA_TABLE_NAME, DB_PATH, JOB_TITLE)
\ No newline at end of file
+    if metrics.enabled:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    frontier = UrlFrontier(DB_PATH)
+    scraper = JobScraper(BASE_URL, URL_TAIL, archive=HtmlArchive(DB_PATH) if ARCHIVE_HTML else None,
+                         frontier=frontier)
+    scraper.run(job_title=JOB_TITLE, pages_to_scrape=PAGES_TO_SCRAPE)
+    print(f"Frontier status: {frontier.counts()}")
+
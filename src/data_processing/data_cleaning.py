@@ -1,7 +1,32 @@
+import argparse
+import logging
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from src.config import DB_PATH, RAW_DATA_TABLE_NAME, PROCESSED_DATA_TABLE_NAME, REGION_TO_CITIES_MAP, SKILL_KEYWORDS
-from src.utils import save_data_to_db, load_data_from_db
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.config import (
+    DB_PATH, JOB_SKILLS_TABLE_NAME, NEAR_DUPLICATE_BANDS_TABLE_NAME, NEAR_DUPLICATE_SIGNATURES_TABLE_NAME,
+    RAW_DATA_TABLE_NAME, PROCESSED_DATA_TABLE_NAME, PROCESSING_CHUNK_SIZE, REGION_TO_CITIES_MAP, SKILL_KEYWORDS,
+    TARGET_CITIES
+)
+from src.data_processing.location_index import LocationIndex
+from src.data_processing.near_duplicates import assign_duplicate_groups
+from src.data_processing.skill_matcher import SkillMatcher
+from src.data_processing.skill_tables import save_job_skills, split_skills
+from src.data_processing.summaries import reset_summaries, update_summaries
+from src.metrics import metrics
+from src.utils import drop_table, get_watermark, iter_data_from_db, reset_watermark, upsert_data_to_db
+
+SENIOR_TITLE_KEYWORDS = ['senior', 'sr', 'manager', 'head of']
+JUNIOR_TITLE_KEYWORDS = ['junior', 'jr', 'entry', 'graduate', 'trainee', 'intern']
+SENIOR_DESCRIPTION_KEYWORDS = ['strong experience', 'extensive experience', 'deep understanding']
+_SENIOR_TITLE_PATTERN = re.compile('|'.join(map(re.escape, SENIOR_TITLE_KEYWORDS)))
+_JUNIOR_TITLE_PATTERN = re.compile('|'.join(map(re.escape, JUNIOR_TITLE_KEYWORDS)))
+_EXPERIENCE_PATTERN = re.compile(r'(\d+)\+?\s*years?')
 
 
 def classify_location_by_city(location_string):
@@ -13,11 +38,7 @@ def classify_location_by_city(location_string):
     if not isinstance(location_string, str):
         return "N/A"
     location_lower = location_string.lower()
-    target_cities = [
-        'London', 'Manchester', 'Birmingham', 'Bristol', 'Leeds',
-        'Glasgow', 'Edinburgh', 'Cambridge', 'Oxford', 'Cardiff', 'Belfast'
-    ]
-    for city in target_cities:
+    for city in TARGET_CITIES:
         if city.lower() in location_lower:
             return city
     return "Other UK"
@@ -112,6 +133,64 @@ def parse_salary(salary_string):
         int(avg_rate * 8 * 250)
     return int(avg_rate)
 
+def parse_salary_series(salary_strings):
+    """
+    Parse a whole column of raw salary strings into numerical values.
+
+    Column-level equivalent of parse_salary, giving identical results. Each
+    distinct salary string is parsed once and the result broadcast back.
+    :param salary_strings: Series of raw salary strings.
+    :return: Series of yearly salaries as integers, aligned with the input index.
+    """
+    codes, uniques = pd.factorize(salary_strings)
+    salary_lower = pd.Series(uniques, dtype=object).str.lower()
+    numbers = (
+        salary_lower.str.replace(',', '', regex=False)
+        .str.findall(r'(\d+\.?\d*)')
+        .explode()
+        .dropna()
+        .astype(float)
+    )
+    numbers.index = pd.MultiIndex.from_arrays([numbers.index, numbers.groupby(level=0).cumcount()])
+    numbers = numbers.unstack().reindex(salary_lower.index)
+    numbers = numbers.where(~salary_lower.str.contains(r'\d+k', na=False), numbers * 1000)
+    # Add the numbers left to right so the float result matches sum() exactly
+    total = np.zeros(len(salary_lower))
+    for column in numbers.columns:
+        total = total + numbers[column].fillna(0).to_numpy()
+    count = numbers.notna().sum(axis=1).to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_rate = total / count
+    no_salary = (
+        salary_lower.isna()
+        | salary_lower.str.contains('competitive|market rate', na=False)
+        | (count == 0)
+    ).to_numpy()
+    has_hour = salary_lower.str.contains('hour', regex=False, na=False).to_numpy()
+    has_day = salary_lower.str.contains('day', regex=False, na=False).to_numpy()
+    salary = np.select(
+        [
+            no_salary,
+            has_hour & (avg_rate > 200),
+            has_hour,
+            has_day & (avg_rate > 2000),
+            has_day,
+            (100 < avg_rate) & (avg_rate < 1000),
+        ],
+        [0, avg_rate, avg_rate * 8 * 250, avg_rate, avg_rate * 250, avg_rate * 250],
+        default=avg_rate,
+    )
+    salary = np.where(no_salary, 0, np.trunc(salary))
+    overflow = salary >= 2 ** 63
+    salary = np.where(overflow, 0, salary).astype(np.int64)
+    if overflow.any():
+        # Python ints don't overflow, so fall back to the scalar parser
+        salary = salary.astype(object)
+        salary[overflow] = [parse_salary(value) for value in uniques[overflow]]
+    # Missing values get code -1, which maps onto the appended 0
+    salary = np.append(salary, 0)[codes]
+    return pd.Series(salary, index=salary_strings.index)
+
 def extract_skills_from_description(job_description, skill_keywords):
     """
     Extract skills from job description.
@@ -142,24 +221,22 @@ def _classify_seniority(title, description, salary=0):
     :param salary: Salary for the role.
     :return: 'Senior', 'Mid-Level', or 'Junior' strings.
     """
-    title_lower = str(title).lower()
-    description_lower = str(description).lower()
-    senior_keywords = ['senior', 'sr', 'manager', 'head of']
-    junior_keywords = ['junior', 'jr', 'entry', 'graduate', 'trainee', 'intern']
-    if any(keyword in title_lower for keyword in senior_keywords):
+    return _classify_seniority_lowered(str(title).lower(), str(description).lower(), salary)
+
+def _classify_seniority_lowered(title_lower, description_lower, salary=0):
+    if any(keyword in title_lower for keyword in SENIOR_TITLE_KEYWORDS):
         return 'Senior'
-    if any(keyword in title_lower for keyword in junior_keywords):
+    if any(keyword in title_lower for keyword in JUNIOR_TITLE_KEYWORDS):
         return 'Junior'
     # Check for quantitative experience (e.g., "5+ years")
-    experience_match = re.search(r'(\d+)\+?\s*years?', description_lower)
+    experience_match = _EXPERIENCE_PATTERN.search(description_lower)
     if experience_match:
         years = int(experience_match.group(1))
         if years >= 5:
             return 'Senior'
         if years <= 2:
             return 'Junior'
-    senior_desc_keywords = ['strong experience', 'extensive experience', 'deep understanding']
-    if any(keyword in description_lower for keyword in senior_desc_keywords):
+    if any(keyword in description_lower for keyword in SENIOR_DESCRIPTION_KEYWORDS):
         return 'Senior'
     if salary >= 70000:
         return 'Senior'
@@ -167,22 +244,230 @@ def _classify_seniority(title, description, salary=0):
         return 'Junior'
     return 'Mid-Level'
 
-if __name__ == '__main__':
-    df = load_data_from_db(DB_PATH, RAW_DATA_TABLE_NAME)
-    df['salary_numeric'] = df['salary_raw'].apply(parse_salary)
-    df['seniority'] = df.apply(classify_by_seniority, axis=1)
-    df['city'] = df['location'].apply(classify_location_by_city)
-    df['region'] = df['location'].apply(lambda x: classify_location_by_region(x, REGION_TO_CITIES_MAP))
-    df['employment_type_clean'] = df['employment_type'].apply(categorize_employment_type)
-    df['date_posted'] = df['date_posted_raw'].apply(parse_date)
-    df['skills'] = df['full_description'].apply(lambda x: extract_skills_from_description(x, SKILL_KEYWORDS))
-    df['skills'] = df['skills'].apply(lambda x: ','.join(x) if isinstance(x, list) else '')
+def classify_seniority_series(titles, descriptions, salaries):
+    """
+    Classify the seniority of a whole column of jobs.
+
+    Column-level equivalent of _classify_seniority, giving identical results.
+    :param titles: Series of job titles.
+    :param descriptions: Series of job descriptions.
+    :param salaries: Series of yearly salaries, aligned with the titles.
+    :return: Series of 'Senior', 'Mid-Level' or 'Junior' strings, aligned with the titles.
+    """
+    return _classify_seniority_lowered_series(
+        titles.astype(str).str.lower(), descriptions.astype(str).str.lower(), salaries
+    )
+
+def _classify_seniority_lowered_series(titles_lower, descriptions_lower, salaries):
+    # Titles repeat a lot, so match each distinct one once
+    title_codes, title_uniques = pd.factorize(titles_lower)
+    title_uniques = pd.Series(title_uniques, dtype=object)
+    title_senior = title_uniques.str.contains(_SENIOR_TITLE_PATTERN).to_numpy()[title_codes]
+    title_junior = title_uniques.str.contains(_JUNIOR_TITLE_PATTERN).to_numpy()[title_codes]
+    # Descriptions are only scanned for the rows the earlier rules leave open. The
+    # experience regex is slow to scan with, but can only match where 'year' occurs.
+    open_rows = ~(title_senior | title_junior)
+    open_rows[open_rows] = descriptions_lower[open_rows].str.contains('year', regex=False).to_numpy()
+    years_found = descriptions_lower[open_rows].str.extract(_EXPERIENCE_PATTERN, expand=False)
+    # int() rather than a numeric cast, so any digits the pattern accepts are read the same
+    # way. Descriptions without a match get 3 years, which is neither junior nor senior.
+    years = np.full(len(descriptions_lower), 3, dtype=object)
+    years[open_rows] = [int(found) if isinstance(found, str) else 3 for found in years_found]
+    experienced = (years >= 5).astype(bool)
+    inexperienced = (years <= 2).astype(bool)
+    open_rows = ~(title_senior | title_junior | experienced | inexperienced)
+    description_senior = np.zeros(len(descriptions_lower), dtype=bool)
+    open_descriptions = descriptions_lower[open_rows]
+    for keyword in SENIOR_DESCRIPTION_KEYWORDS:
+        description_senior[open_rows] |= open_descriptions.str.contains(keyword, regex=False).to_numpy()
+    salaries = salaries.to_numpy()
+    seniority = np.select(
+        [
+            title_senior,
+            title_junior,
+            experienced,
+            inexperienced,
+            description_senior,
+            salaries >= 70000,
+            (0 < salaries) & (salaries <= 40000),
+        ],
+        ['Senior', 'Junior', 'Senior', 'Junior', 'Senior', 'Senior', 'Junior'],
+        default='Mid-Level',
+    )
+    return pd.Series(seniority, index=titles_lower.index, dtype=object)
+
+@lru_cache(maxsize=None)
+def _location_index():
+    return LocationIndex(REGION_TO_CITIES_MAP, TARGET_CITIES)
+
+@lru_cache(maxsize=None)
+def _skill_matcher():
+    return SkillMatcher(SKILL_KEYWORDS)
+
+def _map_distinct(values, function):
+    """
+    Apply a function to each distinct value of a column and broadcast the results back.
+    :param values: Series of values.
+    :param function: Function of one value.
+    :return: Series of results aligned with the input index.
+    """
+    codes, uniques = pd.factorize(values)
+    results = np.empty(len(uniques), dtype=object)
+    results[:] = [function(value) for value in uniques]
+    results = results[codes]
+    # factorize turns every missing value into NaN, so pass the originals through as they are
+    missing = codes == -1
+    results[missing] = [function(value) for value in values[missing]]
+    return pd.Series(results, index=values.index, dtype=object)
+
+def clean_dataframe(df, workers=None):
+    """
+    Derive the processed columns from a DataFrame of raw job postings.
+
+    With several workers the rows are split into chunks that are cleaned on
+    a process pool and put back together in their original order, giving
+    the same result as cleaning them in one go.
+    :param df: Raw job postings, as stored in the raw table.
+    :param workers: Number of worker processes, cleans in this process if not more than 1.
+    :return: DataFrame with the columns of the processed table.
+    """
+    if not workers or workers <= 1 or len(df) < 2:
+        return _clean_chunk(df)
+    chunk_count = min(len(df), workers * 4)
+    bounds = np.linspace(0, len(df), chunk_count + 1).astype(int)
+    chunks = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    # Stage timings of the worker processes stay in those processes, so the pool is timed as a whole
+    with metrics.timer('cleaning_stage_seconds', rows=len(df), stage='process_pool'):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return pd.concat(pool.map(_clean_chunk, chunks))
+
+def _clean_chunk(df):
+    """
+    Clean one chunk of raw job postings.
+
+    Columns parsed from short, repetitive strings (salary, location,
+    employment type, date) are parsed once per distinct value. The title
+    and description are lowercased once and shared by the seniority and
+    skill derivations.
+    :param df: Raw job postings.
+    :return: DataFrame with the columns of the processed table.
+    """
+    df = df.copy()
+    rows = len(df)
+    with metrics.timer('cleaning_stage_seconds', rows=rows, stage='salary'):
+        df['salary_numeric'] = parse_salary_series(df['salary_raw'])
+    with metrics.timer('cleaning_stage_seconds', rows=rows, stage='location'):
+        df[['city', 'region']] = _location_index().classify_series(df['location'])
+    with metrics.timer('cleaning_stage_seconds', rows=rows, stage='employment_type'):
+        df['employment_type_clean'] = _map_distinct(df['employment_type'], categorize_employment_type)
+    with metrics.timer('cleaning_stage_seconds', rows=rows, stage='date'):
+        df['date_posted'] = _map_distinct(df['date_posted_raw'], parse_date)
+    with metrics.timer('cleaning_stage_seconds', rows=rows, stage='lowercase'):
+        descriptions_lower = df['full_description'].astype(str).str.lower()
+        titles_lower = df['job_title'].astype(str).str.lower()
+    with metrics.timer('cleaning_stage_seconds', rows=rows, stage='seniority'):
+        df['seniority'] = _classify_seniority_lowered_series(titles_lower, descriptions_lower, df['salary_numeric'])
+    skill_matcher = _skill_matcher()
+    with metrics.timer('cleaning_stage_seconds', rows=rows, stage='skills'):
+        df['skills'] = pd.Series(
+            [','.join(skill_matcher.extract_lowered(description)) for description in descriptions_lower],
+            index=df.index, dtype=object,
+        )
     columns_to_keep = [
-        'search_category', 'job_title', 'company_name', 'seniority', 'salary_numeric', 'employment_type_clean',
-        'city', 'region', 'date_posted','skills'
+        'raw_id', 'search_category', 'job_title', 'company_name', 'seniority', 'salary_numeric',
+        'employment_type_clean', 'city', 'region', 'date_posted', 'skills'
     ]
     final_columns = [col for col in columns_to_keep if col in df.columns]
-    final_df = df[final_columns]
-    save_data_to_db(final_df, PROCESSED_DATA_TABLE_NAME, DB_PATH)
+    return df[final_columns]
 
+def process_raw_data(db_path, full=False, chunksize=PROCESSING_CHUNK_SIZE, workers=None):
+    """
+    Clean the raw rows added since the last run and upsert them into the processed table.
 
+    The rowid of the last processed raw row is kept as a high-water mark, so
+    each run only reads and transforms postings scraped since the previous one.
+    :param db_path: Path to the SQLite database.
+    :param full: Rebuild the processed table from every raw row.
+    :param chunksize: Number of raw rows cleaned and written at a time.
+    :param workers: Number of processes cleaning each chunk, see clean_dataframe.
+    """
+    if full:
+        reset_processed_tables(db_path)
+    total_rows = process_new_raw_rows(db_path, chunksize, workers)
+    if total_rows == 0:
+        print("No new raw rows to process.")
+    else:
+        print(f"Processed {total_rows} new raw rows.")
+    metrics.write_report('processing')
+
+def reset_processed_tables(db_path):
+    """
+    Drop the processed table and the tables keyed on its raw_ids, so the next run rebuilds them from every raw row.
+    :param db_path: Path to the SQLite database.
+    """
+    drop_table(db_path, PROCESSED_DATA_TABLE_NAME)
+    drop_table(db_path, JOB_SKILLS_TABLE_NAME)
+    drop_table(db_path, NEAR_DUPLICATE_SIGNATURES_TABLE_NAME)
+    drop_table(db_path, NEAR_DUPLICATE_BANDS_TABLE_NAME)
+    reset_summaries(db_path)
+    reset_watermark(db_path, PROCESSED_DATA_TABLE_NAME)
+
+def process_new_raw_rows(db_path, chunksize=PROCESSING_CHUNK_SIZE, workers=None):
+    """
+    Clean and store the raw rows after the high-water mark.
+
+    The skills of each posting are also written to the job_skills bridge table,
+    the postings are added to the summary tables, and each posting gets the
+    duplicate_group_id of the earlier posting it is a near-duplicate repost of,
+    or its own raw_id, see assign_duplicate_groups.
+    Rows are streamed in chunks, and each chunk is written together with the
+    new high-water mark in one transaction, so memory stays bounded and an
+    interrupted run resumes after the last written chunk. The run stops at
+    the first chunk that cannot be written.
+    :param db_path: Path to the SQLite database.
+    :param chunksize: Number of raw rows cleaned and written at a time.
+    :param workers: Number of processes cleaning each chunk, see clean_dataframe.
+    :return: Number of raw rows processed.
+    :raises RuntimeError: If a chunk could not be written to the processed table.
+    """
+    watermark = get_watermark(db_path, PROCESSED_DATA_TABLE_NAME)
+    if watermark == 0:
+        # Every raw row is about to be processed again, so the summaries start over too
+        reset_summaries(db_path)
+    total_rows = 0
+    for chunk in iter_data_from_db(db_path, RAW_DATA_TABLE_NAME, chunksize, after_rowid=watermark):
+        cleaned = clean_dataframe(chunk, workers=workers)
+        # These are safe to repeat for a chunk, so they go before the upsert that moves the watermark
+        with metrics.timer('db_operation_seconds', rows=len(chunk), operation='assign_duplicate_groups'):
+            cleaned['duplicate_group_id'] = pd.Series(
+                assign_duplicate_groups(db_path, chunk['raw_id'], chunk['full_description']), index=chunk.index
+            )
+        with metrics.timer('db_operation_seconds', rows=len(cleaned), operation='save_job_skills'):
+            save_job_skills(db_path, cleaned['raw_id'], cleaned['skills'].map(split_skills))
+        with metrics.timer('db_operation_seconds', rows=len(cleaned), operation='update_summaries'):
+            update_summaries(db_path, cleaned)
+        written = upsert_data_to_db(
+            cleaned,
+            PROCESSED_DATA_TABLE_NAME,
+            db_path,
+            key_column='raw_id',
+            watermark=(PROCESSED_DATA_TABLE_NAME, chunk['raw_id'].max()),
+        )
+        if written is None:
+            # A later chunk would move the watermark past this one, so its rows would never be processed
+            raise RuntimeError(f"Could not store raw rows {chunk['raw_id'].min()} to {chunk['raw_id'].max()} in "
+                               f"'{PROCESSED_DATA_TABLE_NAME}', the next run starts again from them.")
+        total_rows += len(chunk)
+    return total_rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Clean raw job postings into the processed table.")
+    parser.add_argument('--full', action='store_true', help="Reprocess every raw row instead of only new ones.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of cleaning processes.")
+    parser.add_argument('--metrics', action='store_true', help="Record stage timings and write them at the end.")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+    if metrics.enabled:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    process_raw_data(DB_PATH, full=args.full, workers=args.workers)
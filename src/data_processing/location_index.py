@@ -0,0 +1,86 @@
+import re
+
+import pandas as pd
+
+from src.data_processing.skill_matcher import trie_pattern
+
+
+class LocationIndex:
+    """
+    Classify location strings into a city and a region in one pass.
+
+    All place names from the region map and the target city list are
+    compiled once into a single case-insensitive substring matcher. Every
+    name found in a location is ranked by its position in the original
+    lists, so the result is the same first-match priority as
+    classify_location_by_city and classify_location_by_region.
+
+    Parameters
+    ----------
+    region_to_cities_map : dict
+        Region name to list of place names, in priority order.
+    target_cities : list of str
+        Primary cities to report, in priority order.
+    """
+
+    def __init__(self, region_to_cities_map, target_cities):
+        self.regions = list(region_to_cities_map)
+        self.cities = list(target_cities)
+        region_ranks = {}
+        for region_rank, (region, places) in enumerate(region_to_cities_map.items()):
+            for place_rank, place in enumerate(places):
+                region_ranks.setdefault(place.lower(), (region_rank, place_rank))
+        city_ranks = {}
+        for city_rank, city in enumerate(self.cities):
+            city_ranks.setdefault(city.lower(), city_rank)
+        names = set(region_ranks) | set(city_ranks)
+        self._pattern = re.compile('(?=(' + trie_pattern(names) + '))')
+        # The matcher reports the longest name at each position, and every
+        # name it starts with is also present there, so fold their ranks in.
+        self._ranks = {}
+        for name in names:
+            prefixes = [other for other in names if name.startswith(other)]
+            self._ranks[name] = (
+                min((region_ranks[p] for p in prefixes if p in region_ranks), default=None),
+                min((city_ranks[p] for p in prefixes if p in city_ranks), default=None),
+            )
+
+    def classify(self, location_string):
+        """
+        Standardize a messy location string into a city and a region.
+        :param location_string: Raw location string.
+        :return: Tuple of (city, region). The city is "Other UK" and the region
+        "Other" when nothing matches, and ("N/A", "Other") for missing values.
+        """
+        if not isinstance(location_string, str):
+            return "N/A", "Other"
+        best_region = None
+        best_city = None
+        for match in self._pattern.finditer(location_string.lower()):
+            region_rank, city_rank = self._ranks[match.group(1)]
+            if region_rank is not None and (best_region is None or region_rank < best_region):
+                best_region = region_rank
+            if city_rank is not None and (best_city is None or city_rank < best_city):
+                best_city = city_rank
+        city = self.cities[best_city] if best_city is not None else "Other UK"
+        region = self.regions[best_region[0]] if best_region is not None else "Other"
+        return city, region
+
+    def classify_series(self, locations):
+        """
+        Classify a whole column of location strings.
+
+        Each distinct location is classified once and the result broadcast
+        back to every row through its factorized code.
+        :param locations: Series of raw location strings.
+        :return: DataFrame with 'city' and 'region' columns, aligned with the input index.
+        """
+        codes, uniques = pd.factorize(locations)
+        classified = [self.classify(location) for location in uniques]
+        classified.append(self.classify(None))
+        cities, regions = (pd.Series(values, dtype=object) for values in zip(*classified))
+        # Missing values get code -1, which picks the appended (None) result
+        return pd.DataFrame(
+            {'city': cities.take(codes).to_numpy(), 'region': regions.take(codes).to_numpy()},
+            index=locations.index,
+        )
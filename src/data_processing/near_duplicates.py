@@ -0,0 +1,347 @@
+import hashlib
+import itertools
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from src.config import (
+    MINHASH_PERMUTATIONS, NEAR_DUPLICATE_BANDS_TABLE_NAME, NEAR_DUPLICATE_SIGNATURES_TABLE_NAME,
+    NEAR_DUPLICATE_THRESHOLD, SHINGLE_SIZE
+)
+from src.utils import get_engine
+
+_WORD_PATTERN = re.compile(r'\w+')
+_EMPTY = np.uint32(np.iinfo(np.uint32).max)
+# Missing a repost costs more than verifying a candidate pair, so banding leans towards recall
+_FALSE_POSITIVE_WEIGHT = 0.2
+_FALSE_NEGATIVE_WEIGHT = 0.8
+# Each bucket member is compared with up to this many members before it, so buckets up to one larger
+# have every pair compared, and larger ones, e.g. of boilerplate ads, stay linear in their size
+_BUCKET_WINDOW = 32
+
+
+class MinHasher:
+    """
+    MinHash signatures of descriptions over word shingles.
+
+    A description is lowercased, split into words and turned into the set of
+    its `shingle_size`-word windows. Each permutation is a multiply-shift
+    hash of the shingle hashes, and the signature keeps its minimum, so the
+    share of positions two signatures agree on estimates the Jaccard
+    similarity of their shingle sets. Words are hashed with blake2b, so
+    signatures are stable across runs and can be stored.
+
+    Parameters
+    ----------
+    num_perm : int
+        Number of permutations, the length of each signature.
+    shingle_size : int
+        Number of words per shingle.
+    seed : int
+        Seed of the permutations; signatures are only comparable with the same seed.
+    """
+
+    def __init__(self, num_perm=MINHASH_PERMUTATIONS, shingle_size=SHINGLE_SIZE, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._increments = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self._word_hashes = {}
+
+    def signatures(self, descriptions, block_size=256):
+        """
+        Compute the signature of every description.
+        :param descriptions: Iterable of description strings; missing values have no words.
+        :param block_size: Number of descriptions hashed at a time, bounding memory.
+        :return: uint32 array of shape (number of descriptions, num_perm). Rows of
+            descriptions without words are all 2**32 - 1, see has_words.
+        """
+        descriptions = list(descriptions)
+        signatures = np.full((len(descriptions), self.num_perm), _EMPTY, dtype=np.uint32)
+        for start in range(0, len(descriptions), block_size):
+            shingles, counts = self._shingle_hashes(descriptions[start:start + block_size])
+            if not len(shingles):
+                continue
+            nonempty = np.flatnonzero(counts)
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+            # One row per permutation, so each minimum is taken over contiguous memory. The top
+            # 32 bits are the permuted value, and shifting after the minimum gives the same result
+            permuted = np.multiply(self._multipliers[:, None], shingles)
+            np.add(permuted, self._increments[:, None], out=permuted)
+            minimums = np.minimum.reduceat(permuted, offsets, axis=1) >> np.uint64(32)
+            signatures[start + nonempty] = minimums.T
+        return signatures
+
+    def _shingle_hashes(self, descriptions):
+        """
+        Hash the shingles of some descriptions.
+        :return: Tuple of the uint64 shingle hashes, grouped by description, and the
+            number of shingles of each description.
+        """
+        token_lists = [_WORD_PATTERN.findall(description.lower()) if isinstance(description, str) else []
+                       for description in descriptions]
+        counts = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(token_lists))
+        codes, words = pd.factorize(np.array(list(itertools.chain.from_iterable(token_lists)), dtype=object))
+        token_hashes = np.fromiter((self._word_hash(word) for word in words), dtype=np.uint64,
+                                   count=len(words))[codes]
+        # A shingle hash is a polynomial of its word hashes, ending at the description's last word
+        ends = np.repeat(np.cumsum(counts), counts)
+        positions = np.arange(len(token_hashes))
+        hashes = np.zeros(len(token_hashes), dtype=np.uint64)
+        for offset in range(self.shingle_size):
+            inside = positions + offset < ends
+            terms = token_hashes[np.minimum(positions + offset, max(len(token_hashes) - 1, 0))]
+            hashes = hashes * np.uint64(0x100000001B3) + np.where(inside, terms, np.uint64(0))
+        # Every full window is a shingle, and a description shorter than a shingle is one
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        lengths = np.repeat(counts, counts)
+        keep = (positions - starts <= lengths - self.shingle_size) | (
+            (positions == starts) & (lengths < self.shingle_size))
+        shingle_counts = np.where(counts >= self.shingle_size, counts - self.shingle_size + 1, counts > 0)
+        return _mix(hashes[keep]), shingle_counts
+
+    def _word_hash(self, word):
+        word_hash = self._word_hashes.get(word)
+        if word_hash is None:
+            word_hash = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little')
+            self._word_hashes[word] = word_hash
+        return word_hash
+
+
+def has_words(signatures):
+    """
+    Tell which signatures belong to descriptions with at least one word.
+    :param signatures: Signatures from MinHasher.signatures.
+    :return: Boolean array, one value per signature.
+    """
+    return (signatures != _EMPTY).any(axis=1)
+
+@lru_cache(maxsize=None)
+def lsh_parameters(threshold, num_perm):
+    """
+    Choose the LSH bands and rows per band for a Jaccard threshold.
+
+    Two signatures become candidates when they agree on every row of at
+    least one band, which happens with probability 1 - (1 - s**rows)**bands
+    at similarity s. The split minimising the weighted area of that curve
+    below the threshold (false positives) and above it (false negatives)
+    is chosen.
+    :param threshold: Jaccard similarity from which descriptions are near duplicates.
+    :param num_perm: Signature length.
+    :return: Tuple of bands and rows per band, with bands * rows <= num_perm.
+    """
+    similarities = np.linspace(0, 1, 1001)
+    below = similarities < threshold
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            candidate = 1 - (1 - similarities ** rows) ** bands
+            false_positives = np.trapezoid(np.where(below, candidate, 0), similarities)
+            false_negatives = np.trapezoid(np.where(below, 0, 1 - candidate), similarities)
+            error = _FALSE_POSITIVE_WEIGHT * false_positives + _FALSE_NEGATIVE_WEIGHT * false_negatives
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+def band_hashes(signatures, bands, rows):
+    """
+    Hash each band of the signatures into a bucket.
+    :param signatures: Signatures from MinHasher.signatures.
+    :param bands: Number of bands.
+    :param rows: Signature positions per band.
+    :return: int64 array of shape (number of signatures, bands).
+    """
+    buckets = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for row in range(rows):
+        buckets = buckets * np.uint64(0x100000001B3) + signatures[:, row:bands * rows:rows].astype(np.uint64)
+    return _mix(buckets).view(np.int64)
+
+def cluster_signatures(signatures, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Group signatures whose estimated Jaccard similarity reaches the threshold.
+
+    Within every LSH bucket, each member is compared with the
+    `_BUCKET_WINDOW` members before it and with the bucket's first member,
+    and the pairs at or above the threshold are joined into connected
+    components. Every candidate pair of a bucket of up to `_BUCKET_WINDOW`
+    + 1 members is compared, so recall matches the banding of
+    lsh_parameters. In larger buckets, a member is linked to a similar
+    member further back only through the first member or through a chain
+    of similar members, which trades some recall for work that grows with
+    the number of bucket members rather than with the number of pairs, so
+    a million descriptions cluster in one pass.
+    :param signatures: Signatures from MinHasher.signatures.
+    :param threshold: Jaccard similarity from which descriptions are near duplicates.
+    :return: int64 array with, for each signature, the position of the first signature of its group.
+    """
+    bands, rows = lsh_parameters(threshold, signatures.shape[1])
+    indexed = np.flatnonzero(has_words(signatures))
+    if len(indexed) < 2:
+        return np.arange(len(signatures), dtype=np.int64)
+    buckets = band_hashes(signatures[indexed], bands, rows)
+    pairs = []
+    for band in range(bands):
+        order = np.argsort(buckets[:, band], kind='stable')
+        keys = buckets[order, band]
+        run_starts = np.concatenate(([True], keys[1:] != keys[:-1]))
+        leaders = order[np.maximum.accumulate(np.where(run_starts, np.arange(len(order)), 0))]
+        pairs.append(np.stack([leaders, order], axis=1)[leaders != order])
+        # The sort is stable, so earlier members have lower positions and each pair is listed one way round
+        for offset in range(1, min(_BUCKET_WINDOW, len(order) - 1) + 1):
+            same_bucket = keys[offset:] == keys[:-offset]
+            if not same_bucket.any():
+                break
+            pairs.append(np.stack([order[:-offset], order[offset:]], axis=1)[same_bucket])
+    pairs = indexed[np.unique(np.concatenate(pairs), axis=0)]
+    # Compared in blocks, as every pair copies two signatures
+    similar = np.zeros(len(pairs), dtype=bool)
+    for start in range(0, len(pairs), 100_000):
+        block = pairs[start:start + 100_000]
+        agreement = (signatures[block[:, 0]] == signatures[block[:, 1]]).mean(axis=1)
+        similar[start:start + len(block)] = agreement >= threshold
+    return _connected_components(len(signatures), pairs[similar])
+
+def find_near_duplicates(descriptions, threshold=NEAR_DUPLICATE_THRESHOLD, minhasher=None):
+    """
+    Group near-duplicate descriptions.
+    :param descriptions: Iterable of description strings.
+    :param threshold: Jaccard similarity of word shingles from which descriptions are near duplicates.
+    :param minhasher: MinHasher to use, one with the configured settings by default.
+    :return: int64 array with, for each description, the position of the first description of its group.
+    """
+    return cluster_signatures((minhasher or _minhasher()).signatures(descriptions), threshold)
+
+def assign_duplicate_groups(db_path, job_ids, descriptions, threshold=NEAR_DUPLICATE_THRESHOLD, minhasher=None):
+    """
+    Find the near-duplicate group of new postings and store their signatures.
+
+    The signature of every processed posting is stored with its group id,
+    and its LSH buckets in an indexed bands table, so new postings are only
+    compared with the earlier postings sharing a bucket with them, and with
+    each other. A posting joins the group of the earliest posting it is
+    connected to; a posting without one starts a group with its own id, so
+    `duplicate_group_id = raw_id` selects one posting per group. Groups of
+    earlier postings are never rewritten. Safe to repeat for the same postings.
+    :param db_path: Path to the SQLite database.
+    :param job_ids: Ids of the postings, matching raw_id in the processed table.
+    :param descriptions: Descriptions of the postings.
+    :param threshold: Jaccard similarity of word shingles from which descriptions are near duplicates.
+    :param minhasher: MinHasher to use, one with the configured settings by default.
+    :return: int64 array of group ids, one per posting.
+    """
+    job_ids = np.asarray(job_ids, dtype=np.int64)
+    if not len(job_ids):
+        return job_ids
+    minhasher = minhasher or _minhasher()
+    signatures = minhasher.signatures(descriptions)
+    bands, rows = lsh_parameters(threshold, minhasher.num_perm)
+    indexed = np.flatnonzero(has_words(signatures))
+    buckets = band_hashes(signatures[indexed], bands, rows)
+    with get_engine(db_path).begin() as conn:
+        create_near_duplicate_tables(conn)
+        earlier_ids, earlier_signatures, earlier_groups = _earlier_candidates(
+            conn, buckets, int(job_ids.min()), minhasher.num_perm)
+        # Earlier postings go first, so the first position of a group is its earliest posting
+        order = np.argsort(job_ids, kind='stable')
+        labels = cluster_signatures(np.concatenate([earlier_signatures, signatures[order]]), threshold)
+        group_ids = np.empty(len(job_ids), dtype=np.int64)
+        group_ids[order] = np.concatenate([earlier_groups, job_ids[order]])[labels][len(earlier_ids):]
+        if len(indexed):
+            conn.execute(
+                text(f'INSERT OR REPLACE INTO "{NEAR_DUPLICATE_SIGNATURES_TABLE_NAME}" (job_id, signature, group_id) '
+                     'VALUES (:job_id, :signature, :group_id)'),
+                [{'job_id': int(job_ids[i]), 'signature': signatures[i].tobytes(), 'group_id': int(group_ids[i])}
+                 for i in indexed],
+            )
+            conn.execute(
+                text(f'INSERT OR IGNORE INTO "{NEAR_DUPLICATE_BANDS_TABLE_NAME}" (band, bucket, job_id) '
+                     'VALUES (:band, :bucket, :job_id)'),
+                [{'band': band, 'bucket': int(bucket), 'job_id': int(job_ids[i])}
+                 for i, row in zip(indexed, buckets) for band, bucket in enumerate(row)],
+            )
+    return group_ids
+
+def create_near_duplicate_tables(conn):
+    """
+    Create the signatures and LSH bands tables if they are missing.
+    :param conn: Open SQLAlchemy connection.
+    """
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{NEAR_DUPLICATE_SIGNATURES_TABLE_NAME}" ('
+        'job_id INTEGER PRIMARY KEY, signature BLOB NOT NULL, group_id INTEGER NOT NULL)'
+    ))
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{NEAR_DUPLICATE_BANDS_TABLE_NAME}" ('
+        'band INTEGER NOT NULL, bucket INTEGER NOT NULL, job_id INTEGER NOT NULL, '
+        'PRIMARY KEY (band, bucket, job_id)) WITHOUT ROWID'
+    ))
+
+def _earlier_candidates(conn, buckets, before_job_id, num_perm):
+    """
+    Load the stored postings sharing a bucket with the new ones.
+    :return: Tuple of their ids, signatures and group ids, in id order.
+    """
+    job_ids = set()
+    lookups = [(band, int(bucket)) for band in range(buckets.shape[1]) for bucket in np.unique(buckets[:, band])]
+    statement = text(
+        f'SELECT job_id FROM "{NEAR_DUPLICATE_BANDS_TABLE_NAME}" '
+        'WHERE band = :band AND bucket IN :buckets AND job_id < :before'
+    ).bindparams(bindparam('buckets', expanding=True))
+    # SQLite allows a limited number of parameters per statement
+    for band, group in itertools.groupby(lookups, key=lambda lookup: lookup[0]):
+        band_buckets = [bucket for _, bucket in group]
+        for start in range(0, len(band_buckets), 500):
+            job_ids.update(conn.execute(statement, {
+                'band': band, 'buckets': band_buckets[start:start + 500], 'before': before_job_id,
+            }).scalars())
+    if not job_ids:
+        return (np.empty(0, dtype=np.int64), np.empty((0, num_perm), dtype=np.uint32),
+                np.empty(0, dtype=np.int64))
+    rows = []
+    ordered = sorted(job_ids)
+    statement = text(
+        f'SELECT job_id, signature, group_id FROM "{NEAR_DUPLICATE_SIGNATURES_TABLE_NAME}" '
+        'WHERE job_id IN :job_ids ORDER BY job_id'
+    ).bindparams(bindparam('job_ids', expanding=True))
+    for start in range(0, len(ordered), 500):
+        rows.extend(conn.execute(statement, {'job_ids': ordered[start:start + 500]}).fetchall())
+    return (np.array([row[0] for row in rows], dtype=np.int64),
+            np.frombuffer(b''.join(row[1] for row in rows), dtype=np.uint32).reshape(len(rows), num_perm),
+            np.array([row[2] for row in rows], dtype=np.int64))
+
+def _connected_components(size, pairs):
+    """
+    Label connected components by their smallest member.
+    :param size: Number of nodes.
+    :param pairs: int64 array of shape (edges, 2).
+    :return: int64 array with the smallest node of each node's component.
+    """
+    labels = np.arange(size, dtype=np.int64)
+    if not len(pairs):
+        return labels
+    first, second = pairs[:, 0], pairs[:, 1]
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, first, labels[second])
+        np.minimum.at(labels, second, labels[first])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+def _mix(hashes):
+    """
+    Scramble uint64 hashes with the splitmix64 finaliser, so every output bit depends on every input bit.
+    """
+    hashes = hashes ^ (hashes >> np.uint64(30))
+    hashes = hashes * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = hashes ^ (hashes >> np.uint64(27))
+    hashes = hashes * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+@lru_cache(maxsize=None)
+def _minhasher():
+    return MinHasher()
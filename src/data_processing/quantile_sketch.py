@@ -0,0 +1,105 @@
+import json
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a guaranteed relative error.
+
+    Positive values are counted in logarithmically sized buckets, so any
+    quantile is answered to within `relative_accuracy` of the true value
+    (the DDSketch scheme). Sketches with the same accuracy merge exactly by
+    adding bucket counts, which lets partial aggregates be combined in any
+    order. Salaries span a few orders of magnitude, so a sketch holds at
+    most a few hundred buckets.
+
+    Parameters
+    ----------
+    relative_accuracy : float
+        Maximum relative error of the quantiles, between 0 and 1.
+    counts : dict, optional
+        Bucket index to number of values, e.g. from a stored sketch.
+    """
+
+    def __init__(self, relative_accuracy, counts=None):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be between 0 and 1, got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.counts = dict(counts or {})
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def bucket_indices(self, values):
+        """
+        Get the bucket of each value.
+        :param values: Array of positive values.
+        :return: Array of bucket indices.
+        """
+        return np.ceil(np.log(np.asarray(values, dtype=np.float64)) / self._log_gamma).astype(np.int64)
+
+    def add(self, values):
+        """
+        Add values to the sketch; values that are not positive are ignored.
+        :param values: Array of values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        indices, counts = np.unique(self.bucket_indices(values[values > 0]), return_counts=True)
+        self.add_counts(dict(zip(indices.tolist(), counts.tolist())))
+
+    def add_counts(self, counts):
+        """
+        Add precomputed bucket counts to the sketch.
+        :param counts: Dictionary of bucket index to number of values.
+        """
+        for index, count in counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+
+    def merge(self, other):
+        """
+        Add the values of another sketch with the same accuracy.
+        :param other: QuantileSketch.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        self.add_counts(other.counts)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile of the values added so far.
+        :param q: Quantile, between 0 and 1.
+        :return: Estimated value, or NaN for an empty sketch.
+        """
+        total = self.count
+        if total == 0:
+            return math.nan
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.counts) / (self.gamma + 1)
+
+    def to_json(self):
+        """
+        Serialize the bucket counts for storage.
+        :return: JSON string.
+        """
+        return json.dumps({str(index): count for index, count in sorted(self.counts.items())})
+
+    @classmethod
+    def from_json(cls, payload, relative_accuracy):
+        """
+        Restore a sketch stored with to_json.
+        :param payload: JSON string, or None for an empty sketch.
+        :param relative_accuracy: Accuracy the sketch was built with.
+        :return: QuantileSketch.
+        """
+        counts = {int(index): count for index, count in json.loads(payload).items()} if payload else {}
+        return cls(relative_accuracy, counts)
@@ -0,0 +1,102 @@
+import re
+
+import pandas as pd
+
+
+def trie_pattern(words):
+    """
+    Build a regex alternation for the words with shared prefixes factored out.
+
+    Optional suffixes are greedy, so the longest word is tried first and
+    shorter ones are reached by backtracking.
+    :param words: Words to match.
+    :return: Regex pattern string.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+class SkillMatcher:
+    """
+    Find every skill keyword in a text with a single compiled regex.
+
+    The keywords are compiled once into one prefix-trie alternation wrapped
+    in a lookahead, so the scan visits each position of the text exactly
+    once and still reports overlapping matches (e.g. 'CI/CD' and a skill starting
+    inside it). Results are identical to running
+    ``re.search(r'\\b' + re.escape(skill.lower()) + r'\\b', text.lower())``
+    for each keyword in turn, including the word-boundary behaviour of
+    'C#', 'C++', 'CI/CD' and 'R'.
+
+    Parameters
+    ----------
+    skill_keywords : list of str
+        Skills to look for. Output lists keep this order.
+    """
+
+    def __init__(self, skill_keywords):
+        self.skill_keywords = list(skill_keywords)
+        self._positions = {}
+        for position, skill in enumerate(self.skill_keywords):
+            self._positions.setdefault(skill.lower(), []).append(position)
+        alternatives = list(self._positions)
+        # Each position reports the longest skill that matches there; shorter
+        # skills it starts with are checked separately below.
+        self._pattern = re.compile(r'(?=\b(' + trie_pattern(alternatives) + r')\b)')
+        self._prefix_patterns = {
+            skill: [
+                (other, re.compile(r'\b' + re.escape(other) + r'\b'))
+                for other in alternatives
+                if other != skill and skill.startswith(other)
+            ]
+            for skill in alternatives
+        }
+
+    def extract(self, job_description):
+        """
+        Extract skills from a single job description.
+        :param job_description: Full job description.
+        :return: List of skills found, in keyword order.
+        """
+        return self.extract_lowered(str(job_description).lower())
+
+    def extract_lowered(self, description_lower):
+        """
+        Extract skills from a job description that is already lowercased.
+        :param description_lower: Lowercased job description.
+        :return: List of skills found, in keyword order.
+        """
+        found = set()
+        for match in self._pattern.finditer(description_lower):
+            skill = match.group(1)
+            found.add(skill)
+            for prefix, prefix_pattern in self._prefix_patterns[skill]:
+                if prefix not in found and prefix_pattern.match(description_lower, match.start()):
+                    found.add(prefix)
+        positions = sorted(position for skill in found for position in self._positions[skill])
+        return [self.skill_keywords[position] for position in positions]
+
+    def extract_series(self, descriptions):
+        """
+        Extract skills from a whole column of job descriptions.
+
+        Each distinct description is scanned only once.
+        :param descriptions: Series of job descriptions.
+        :return: Series of skill lists aligned with the input index.
+        """
+        codes, uniques = pd.factorize(descriptions, use_na_sentinel=False)
+        skills = [self.extract(description) for description in uniques]
+        return pd.Series([list(skills[code]) for code in codes], index=descriptions.index, dtype=object)
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from src.config import JOB_SKILLS_TABLE_NAME, PROCESSED_DATA_TABLE_NAME, SKILLS_TABLE_NAME
+from src.utils import get_engine
+
+
+class SkillMatrix:
+    """
+    In-memory job x skill matrix, bit-packed for fast skill analytics.
+
+    Each skill is stored as a bitset over the jobs, 64 jobs per uint64 word,
+    so a million postings take 16 KB per skill. Filters are bitsets too:
+    counting, intersecting and filtering are bitwise ANDs and popcounts
+    over whole rows, with no per-job Python work.
+
+    Parameters
+    ----------
+    skills : list of str
+        Skill names, one per row of `bits`.
+    bits : numpy.ndarray
+        uint64 array of shape (number of skills, number of words); bit j of a
+        row is set if job j has the skill.
+    jobs : pandas.DataFrame
+        One row per job, in bit order, e.g. raw_id, salary_numeric and the
+        columns used to build filters.
+    """
+
+    def __init__(self, skills, bits, jobs):
+        self.skills = list(skills)
+        self.bits = bits
+        self.jobs = jobs.reset_index(drop=True)
+        self._salary_indexes = {}
+
+    @classmethod
+    def from_skill_lists(cls, skill_lists, skills, jobs=None):
+        """
+        Build the matrix from a list of skills per job.
+        :param skill_lists: Iterable of skill name lists, one per job.
+        :param skills: Every skill name, in the order of the matrix rows.
+        :param jobs: DataFrame with one row per job, defaults to an empty frame.
+        :return: SkillMatrix.
+        """
+        positions = {skill: position for position, skill in enumerate(skills)}
+        job_index = []
+        skill_index = []
+        n_jobs = 0
+        for n_jobs, job_skills in enumerate(skill_lists, start=1):
+            for skill in job_skills:
+                job_index.append(n_jobs - 1)
+                skill_index.append(positions[skill])
+        if jobs is None:
+            jobs = pd.DataFrame(index=range(n_jobs))
+        return cls._from_pairs(np.array(job_index, dtype=np.int64), np.array(skill_index, dtype=np.int64),
+                               skills, jobs)
+
+    @classmethod
+    def from_db(cls, db_path, columns=('raw_id', 'salary_numeric', 'seniority', 'city', 'region', 'search_category')):
+        """
+        Load the matrix from the job_skills bridge and processed tables.
+        :param db_path: Path to the SQLite database.
+        :param columns: Processed table columns to keep in `jobs`, including raw_id.
+        :return: SkillMatrix with a row per processed job, in raw_id order.
+        """
+        engine = get_engine(db_path)
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        with engine.connect() as conn:
+            jobs = pd.read_sql_query(
+                text(f'SELECT {column_list} FROM "{PROCESSED_DATA_TABLE_NAME}" ORDER BY raw_id'), conn
+            )
+            skill_rows = conn.execute(
+                text(f'SELECT skill_id, skill FROM "{SKILLS_TABLE_NAME}" ORDER BY skill_id')
+            ).fetchall()
+            pairs = np.array(
+                conn.execute(text(f'SELECT job_id, skill_id FROM "{JOB_SKILLS_TABLE_NAME}"')).fetchall(),
+                dtype=np.int64,
+            ).reshape(-1, 2)
+        skill_ids = np.array([skill_id for skill_id, _ in skill_rows], dtype=np.int64)
+        raw_ids = jobs['raw_id'].to_numpy(dtype=np.int64)
+        job_index = np.searchsorted(raw_ids, pairs[:, 0])
+        # Bridge rows of jobs missing from the processed table are left out
+        known = (job_index < len(raw_ids)) & (raw_ids[np.minimum(job_index, len(raw_ids) - 1)] == pairs[:, 0])
+        return cls._from_pairs(job_index[known], np.searchsorted(skill_ids, pairs[known, 1]),
+                               [skill for _, skill in skill_rows], jobs)
+
+    @classmethod
+    def _from_pairs(cls, job_index, skill_index, skills, jobs):
+        bits = np.zeros((len(skills), _word_count(len(jobs))), dtype=np.uint64)
+        np.bitwise_or.at(
+            bits,
+            (skill_index, job_index >> 6),
+            np.left_shift(np.uint64(1), (job_index & 63).astype(np.uint64)),
+        )
+        return cls(skills, bits, jobs)
+
+    def job_mask(self, selected):
+        """
+        Pack a per-job boolean filter into a bitset.
+        :param selected: Boolean array or Series with one value per job.
+        :return: uint64 bitset usable as `where`.
+        """
+        selected = np.asarray(selected, dtype=bool)
+        if len(selected) != len(self.jobs):
+            raise ValueError(f"Expected {len(self.jobs)} values, got {len(selected)}")
+        return _pack(selected, self.bits.shape[1])
+
+    def counts(self, where=None):
+        """
+        Count the jobs having each skill.
+        :param where: Optional filter, a boolean array per job or a job_mask bitset.
+        :return: Series of job counts indexed by skill, in matrix order.
+        """
+        bits = self._filtered(where)
+        return pd.Series(np.bitwise_count(bits).sum(axis=1, dtype=np.int64), index=self.skills, name='jobs')
+
+    def cooccurrence(self, where=None):
+        """
+        Count the jobs having each pair of skills.
+        :param where: Optional filter, a boolean array per job or a job_mask bitset.
+        :return: Square DataFrame of job counts; the diagonal holds the per-skill counts.
+        """
+        bits = self._filtered(where)
+        counts = np.zeros((len(self.skills), len(self.skills)), dtype=np.int64)
+        for row, skill_bits in enumerate(bits):
+            counts[row, row:] = np.bitwise_count(bits[row:] & skill_bits).sum(axis=1, dtype=np.int64)
+        counts = counts + np.triu(counts, 1).T
+        return pd.DataFrame(counts, index=self.skills, columns=self.skills)
+
+    def salary_stats(self, where=None, salary_column='salary_numeric'):
+        """
+        Summarize the salaries of the jobs having each skill.
+
+        Jobs without a salary (0) are left out. The bitsets are kept in a
+        second copy with the jobs sorted by salary, where every distinct
+        salary covers a contiguous range of bits. Counting the set bits up
+        to each range boundary gives how many of a skill's jobs earn each
+        salary, from which the count, mean, median, min and max follow
+        without visiting individual jobs.
+        :param where: Optional filter, a boolean array per job or a job_mask bitset.
+        :param salary_column: Column of `jobs` holding the yearly salary.
+        :return: DataFrame indexed by skill with jobs, mean, median, min and max columns.
+        """
+        index = self._salary_index(salary_column)
+        bits = index['bits']
+        if where is not None:
+            selected = self._unpack(np.asarray(where)) if np.asarray(where).dtype == np.uint64 else where
+            selected = np.asarray(selected, dtype=bool)[index['order']]
+            bits = bits & _pack(selected, bits.shape[1])
+        prefix = np.zeros((bits.shape[0], bits.shape[1] + 1), dtype=np.int64)
+        np.cumsum(np.bitwise_count(bits), axis=1, out=prefix[:, 1:])
+        values = index['values']
+        stats = []
+        for skill_prefix, skill_bits in zip(prefix, bits):
+            # Number of the skill's jobs in the bits before each boundary
+            below = skill_prefix[index['words']] + np.bitwise_count(
+                np.append(skill_bits, np.uint64(0))[index['words']] & index['low_bits'])
+            jobs = int(below[-1])
+            if jobs == 0:
+                stats.append((0, np.nan, np.nan, np.nan, np.nan))
+                continue
+            per_value = np.diff(below)
+            present = np.flatnonzero(per_value)
+            middle = np.searchsorted(below[1:], [(jobs - 1) // 2, jobs // 2], side='right')
+            stats.append((jobs, per_value @ values / jobs, values[middle].mean(),
+                          values[present[0]], values[present[-1]]))
+        return pd.DataFrame(stats, index=self.skills, columns=['jobs', 'mean', 'median', 'min', 'max'])
+
+    def _salary_index(self, salary_column):
+        if self._salary_indexes.get(salary_column) is None:
+            salaries = self.jobs[salary_column].to_numpy(dtype=np.float64)
+            paid = np.flatnonzero(salaries > 0)
+            order = paid[np.argsort(salaries[paid], kind='stable')]
+            sorted_salaries = salaries[order]
+            values, starts = np.unique(sorted_salaries, return_index=True)
+            boundaries = np.append(starts, len(order)).astype(np.int64)
+            unpacked = np.unpackbits(self.bits.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+            self._salary_indexes[salary_column] = {
+                'order': order,
+                'values': values,
+                'bits': _pack(unpacked[:, order], _word_count(len(order))),
+                'words': boundaries >> 6,
+                'low_bits': np.left_shift(np.uint64(1), (boundaries & 63).astype(np.uint64)) - np.uint64(1),
+            }
+        return self._salary_indexes[salary_column]
+
+    def _filtered(self, where):
+        if where is None:
+            return self.bits
+        if np.asarray(where).dtype != np.uint64:
+            where = self.job_mask(where)
+        return self.bits & where
+
+    def _unpack(self, skill_bits):
+        return np.unpackbits(skill_bits.astype('<u8').view(np.uint8), bitorder='little')[:len(self.jobs)].view(bool)
+
+
+def _word_count(n_jobs):
+    return (n_jobs + 63) // 64
+
+def _pack(selected, words):
+    """
+    Pack booleans along the last axis into little-endian uint64 words.
+    :param selected: Boolean array, its last axis at most 64 * words long.
+    :param words: Number of words per row.
+    :return: uint64 array with `words` words per row.
+    """
+    padded = np.zeros(selected.shape[:-1] + (words * 64,), dtype=bool)
+    padded[..., :selected.shape[-1]] = selected
+    return np.packbits(padded, axis=-1, bitorder='little').view('<u8').astype(np.uint64)
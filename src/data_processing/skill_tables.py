@@ -0,0 +1,78 @@
+from sqlalchemy import text
+
+from src.config import JOB_SKILLS_TABLE_NAME, SKILL_KEYWORDS, SKILLS_TABLE_NAME
+from src.utils import get_engine
+
+
+def save_job_skills(db_path, job_ids, skill_lists, skill_keywords=SKILL_KEYWORDS):
+    """
+    Replace the skills recorded for some jobs in the job_skills bridge table.
+
+    Skills are stored once in the skills dimension table, in keyword order
+    the first time they are seen, and the bridge holds one (job_id, skill_id)
+    row per skill of a job. Both directions are indexed, so SQL can count,
+    filter and join on skills without splitting the comma-joined column.
+    :param db_path: Path to the SQLite database.
+    :param job_ids: Ids of the jobs, matching raw_id in the processed table.
+    :param skill_lists: Lists of skill names, one per job.
+    :param skill_keywords: Every known skill, added to the dimension table if missing.
+    :return: Number of bridge rows written.
+    """
+    job_ids = [int(job_id) for job_id in job_ids]
+    with get_engine(db_path).begin() as conn:
+        create_skill_tables(conn)
+        conn.execute(
+            text(f'INSERT OR IGNORE INTO "{SKILLS_TABLE_NAME}" (skill) VALUES (:skill)'),
+            [{'skill': skill} for skill in skill_keywords],
+        )
+        skill_ids = dict(conn.execute(text(f'SELECT skill, skill_id FROM "{SKILLS_TABLE_NAME}"')).fetchall())
+        unknown = {skill for skills in skill_lists for skill in skills} - skill_ids.keys()
+        if unknown:
+            conn.execute(
+                text(f'INSERT OR IGNORE INTO "{SKILLS_TABLE_NAME}" (skill) VALUES (:skill)'),
+                [{'skill': skill} for skill in sorted(unknown)],
+            )
+            skill_ids = dict(conn.execute(text(f'SELECT skill, skill_id FROM "{SKILLS_TABLE_NAME}"')).fetchall())
+        if job_ids:
+            conn.execute(
+                text(f'DELETE FROM "{JOB_SKILLS_TABLE_NAME}" WHERE job_id = :job_id'),
+                [{'job_id': job_id} for job_id in job_ids],
+            )
+        rows = [
+            {'job_id': job_id, 'skill_id': skill_ids[skill]}
+            for job_id, skills in zip(job_ids, skill_lists)
+            for skill in dict.fromkeys(skills)
+        ]
+        if rows:
+            conn.execute(
+                text(f'INSERT INTO "{JOB_SKILLS_TABLE_NAME}" (job_id, skill_id) VALUES (:job_id, :skill_id)'),
+                rows,
+            )
+    return len(rows)
+
+def create_skill_tables(conn):
+    """
+    Create the skills dimension and job_skills bridge tables if they are missing.
+    :param conn: Open SQLAlchemy connection.
+    """
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{SKILLS_TABLE_NAME}" ('
+        'skill_id INTEGER PRIMARY KEY, skill TEXT NOT NULL UNIQUE)'
+    ))
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{JOB_SKILLS_TABLE_NAME}" ('
+        f'job_id INTEGER NOT NULL, skill_id INTEGER NOT NULL REFERENCES "{SKILLS_TABLE_NAME}" (skill_id), '
+        'PRIMARY KEY (job_id, skill_id)) WITHOUT ROWID'
+    ))
+    conn.execute(text(
+        f'CREATE INDEX IF NOT EXISTS "ix_{JOB_SKILLS_TABLE_NAME}_skill_id" '
+        f'ON "{JOB_SKILLS_TABLE_NAME}" (skill_id, job_id)'
+    ))
+
+def split_skills(skills):
+    """
+    Split the comma-joined skills column of the processed table.
+    :param skills: Comma-joined skill names, or an empty string.
+    :return: List of skill names.
+    """
+    return skills.split(',') if isinstance(skills, str) and skills else []
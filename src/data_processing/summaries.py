@@ -0,0 +1,261 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, inspect, text
+
+from src.config import (
+    SALARY_SKETCH_ACCURACY, SKILL_SUMMARY_TABLE_NAME, SUMMARY_CACHE_SIZE, SUMMARY_TABLE_NAME
+)
+from src.data_processing.quantile_sketch import QuantileSketch
+from src.data_processing.skill_tables import split_skills
+from src.utils import drop_table, get_engine, get_watermark, reset_watermark, set_watermark
+
+SUMMARY_DIMENSIONS = ['week', 'region', 'seniority', 'search_category']
+_SUM_COLUMNS = ['jobs', 'salary_count', 'salary_sum', 'salary_sumsq']
+_STAT_COLUMNS = _SUM_COLUMNS + ['salary_min', 'salary_max', 'salary_sketch']
+
+
+def update_summaries(db_path, processed):
+    """
+    Add newly processed postings to the summary tables.
+
+    The summary tables hold, for every posting week, region, seniority and
+    search category (and skill, in the skill summary), the number of jobs
+    and the count, sum, sum of squares, min, max and a quantile sketch of
+    the known salaries. These all merge exactly, so the postings of a chunk
+    are aggregated on their own and then folded into the stored rows for
+    the same keys, instead of recomputing the summaries from the whole
+    processed table. The summaries keep their own high-water mark, updated
+    in the same transaction, so a chunk is never counted twice. A posting
+    counts towards the search category that first found it only, not the
+    other categories in the url_categories table.
+    :param db_path: Path to the SQLite database.
+    :param processed: DataFrame of processed postings, with raw_id.
+    :return: Number of postings added.
+    """
+    processed = processed[processed['raw_id'] > get_watermark(db_path, SUMMARY_TABLE_NAME)]
+    if processed.empty:
+        return 0
+    facts = _summary_facts(processed)
+    skill_facts = facts.assign(skill=facts.pop('skills').map(split_skills)).explode('skill')
+    skill_facts = skill_facts[skill_facts['skill'].notna()]
+    with get_engine(db_path).begin() as conn:
+        _create_summary_tables(conn)
+        _fold_into(conn, SUMMARY_TABLE_NAME, SUMMARY_DIMENSIONS, facts)
+        _fold_into(conn, SKILL_SUMMARY_TABLE_NAME, SUMMARY_DIMENSIONS + ['skill'], skill_facts)
+        set_watermark(conn, SUMMARY_TABLE_NAME, processed['raw_id'].max())
+    return len(processed)
+
+def reset_summaries(db_path):
+    """
+    Drop the summary tables so they are rebuilt from scratch.
+    :param db_path: Path to the SQLite database.
+    """
+    drop_table(db_path, SUMMARY_TABLE_NAME)
+    drop_table(db_path, SKILL_SUMMARY_TABLE_NAME)
+    reset_watermark(db_path, SUMMARY_TABLE_NAME)
+
+def salary_summary(db_path, by=('region',), skill=None, region=None, seniority=None, search_category=None,
+                   since=None, until=None):
+    """
+    Summarize salaries from the summary tables, grouped and filtered by dimension.
+
+    Results are cached in-process until the summaries are next updated.
+    :param db_path: Path to the SQLite database.
+    :param by: Dimensions to group by, from week, region, seniority, search_category and skill.
+    :param skill: Only count jobs requiring this skill.
+    :param region: Only count jobs in this region.
+    :param seniority: Only count jobs of this seniority.
+    :param search_category: Only count jobs of this search category.
+    :param since: Only count jobs posted in or after the week of this 'yyyy-mm-dd' date.
+    :param until: Only count jobs posted in or before the week of this 'yyyy-mm-dd' date.
+    :return: DataFrame with a row per group: jobs, salary_count, salary_mean, salary_std,
+        salary_min, salary_p25, salary_median, salary_p75 and salary_max.
+    """
+    by = tuple(by)
+    unknown = set(by) - set(SUMMARY_DIMENSIONS) - {'skill'}
+    if unknown:
+        raise ValueError(f"Cannot group by {sorted(unknown)}, expected some of {SUMMARY_DIMENSIONS + ['skill']}")
+    since = _week_of(since) if since is not None else None
+    until = _week_of(until) if until is not None else None
+    version = get_watermark(db_path, SUMMARY_TABLE_NAME)
+    return _cached_salary_summary(str(db_path), version, by, skill, region, seniority, search_category,
+                                  since, until).copy()
+
+@lru_cache(maxsize=SUMMARY_CACHE_SIZE)
+def _cached_salary_summary(db_path, version, by, skill, region, seniority, search_category, since, until):
+    table_name = SKILL_SUMMARY_TABLE_NAME if skill is not None or 'skill' in by else SUMMARY_TABLE_NAME
+    filters = {'skill': skill, 'region': region, 'seniority': seniority, 'search_category': search_category}
+    conditions = [f'"{column}" = :{column}' for column, value in filters.items() if value is not None]
+    if since is not None or until is not None:
+        conditions.append("week != 'N/A'")
+    if since is not None:
+        conditions.append('week >= :since')
+    if until is not None:
+        conditions.append('week <= :until')
+    query = f'SELECT * FROM "{table_name}"' + (' WHERE ' + ' AND '.join(conditions) if conditions else '')
+    parameters = {column: value for column, value in filters.items() if value is not None}
+    parameters.update({'since': since, 'until': until})
+    with get_engine(db_path).connect() as conn:
+        if not inspect(conn).has_table(table_name):
+            rows = pd.DataFrame(columns=SUMMARY_DIMENSIONS + ['skill'] + _STAT_COLUMNS)
+        else:
+            rows = pd.read_sql_query(text(query), conn, params=parameters)
+    merged = _merge_rows(rows, list(by)) if by else _merge_rows(rows.assign(_all=0), ['_all']).drop(columns='_all')
+    sketches = merged['salary_sketch']
+    counts = merged['salary_count'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = merged['salary_sum'].to_numpy(dtype=np.float64) / counts
+        variance = merged['salary_sumsq'].to_numpy(dtype=np.float64) / counts - mean ** 2
+    return pd.DataFrame({
+        **{column: merged[column] for column in by},
+        'jobs': merged['jobs'].astype(np.int64),
+        'salary_count': merged['salary_count'].astype(np.int64),
+        'salary_mean': mean,
+        'salary_std': np.sqrt(np.maximum(variance, 0)),
+        'salary_min': merged['salary_min'].astype(np.float64),
+        'salary_p25': [sketch.quantile(0.25) for sketch in sketches],
+        'salary_median': [sketch.quantile(0.5) for sketch in sketches],
+        'salary_p75': [sketch.quantile(0.75) for sketch in sketches],
+        'salary_max': merged['salary_max'].astype(np.float64),
+    })
+
+def _summary_facts(processed):
+    """
+    Pick the summary dimensions and salary of each processed posting.
+    :param processed: DataFrame of processed postings.
+    :return: DataFrame with the dimension columns, salary and skills.
+    """
+    return pd.DataFrame({
+        'week': _week_of(processed['date_posted']),
+        'region': processed['region'].fillna('N/A'),
+        'seniority': processed['seniority'].fillna('N/A'),
+        'search_category': processed['search_category'].fillna('N/A')
+        if 'search_category' in processed else 'N/A',
+        'salary': pd.to_numeric(processed['salary_numeric'], errors='coerce').fillna(0).astype(np.float64),
+        'skills': processed['skills'],
+    }, index=processed.index)
+
+def _week_of(dates):
+    """
+    Get the Monday starting the week of each date.
+    :param dates: Date, 'yyyy-mm-dd' string, or Series of them.
+    :return: 'yyyy-mm-dd' string(s), 'N/A' for missing dates.
+    """
+    if not isinstance(dates, pd.Series):
+        return _week_of(pd.Series([dates])).iloc[0]
+    dates = pd.to_datetime(dates, errors='coerce')
+    weeks = (dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+    return weeks.fillna('N/A')
+
+def _aggregate(facts, keys):
+    """
+    Aggregate postings into summary rows.
+    :param facts: DataFrame with the key columns and salary.
+    :param keys: Columns to group by.
+    :return: DataFrame with the key columns and the summary statistics.
+    """
+    summary = facts.groupby(keys).size().rename('jobs').to_frame()
+    paid = facts[facts['salary'] > 0]
+    salaries = paid['salary']
+    stats = paid.assign(salary_sq=salaries ** 2).groupby(keys).agg(
+        salary_count=('salary', 'size'),
+        salary_sum=('salary', 'sum'),
+        salary_sumsq=('salary_sq', 'sum'),
+        salary_min=('salary', 'min'),
+        salary_max=('salary', 'max'),
+    )
+    sketch = QuantileSketch(SALARY_SKETCH_ACCURACY)
+    buckets = paid.assign(bucket=sketch.bucket_indices(salaries)).groupby(keys + ['bucket']).size()
+    bucket_counts = {}
+    for (*key, bucket), count in zip(buckets.index, buckets.tolist()):
+        bucket_counts.setdefault(tuple(key), {})[bucket] = count
+    summary = summary.join(stats)
+    summary['salary_sketch'] = [
+        QuantileSketch(SALARY_SKETCH_ACCURACY, bucket_counts[key]).to_json() if key in bucket_counts else None
+        for key in summary.index
+    ]
+    summary[['salary_count', 'salary_sum', 'salary_sumsq']] = (
+        summary[['salary_count', 'salary_sum', 'salary_sumsq']].fillna(0)
+    )
+    return summary.reset_index()
+
+def _merge_rows(rows, keys):
+    """
+    Merge summary rows that share the same keys.
+    :param rows: DataFrame with the key columns and the summary statistics.
+    :param keys: Columns identifying a summary row.
+    :return: DataFrame with one row per key, with QuantileSketch objects in salary_sketch.
+    """
+    if rows.empty:
+        return pd.DataFrame(columns=keys + _STAT_COLUMNS)
+    grouped = rows.groupby(keys, sort=True)
+    merged = grouped[_SUM_COLUMNS].sum()
+    merged['salary_min'] = grouped['salary_min'].min()
+    merged['salary_max'] = grouped['salary_max'].max()
+    sketches = [QuantileSketch(SALARY_SKETCH_ACCURACY) for _ in range(len(merged))]
+    for group, payload in zip(grouped.ngroup().tolist(), rows['salary_sketch'].tolist()):
+        if isinstance(payload, str):
+            sketches[group].merge(QuantileSketch.from_json(payload, SALARY_SKETCH_ACCURACY))
+    merged['salary_sketch'] = sketches
+    return merged.reset_index()
+
+def _fold_into(conn, table_name, keys, facts):
+    """
+    Add the aggregates of some postings to the stored summary rows.
+
+    Counts and sums are added, and min/max combined, by the upsert itself.
+    Only the sketches of rows that already exist are merged in Python.
+    :param conn: Open SQLAlchemy connection, inside a transaction.
+    :param table_name: Summary table to update.
+    :param keys: Columns identifying a summary row.
+    :param facts: DataFrame with the key columns and salary.
+    """
+    if facts.empty:
+        return
+    partial = _aggregate(facts, keys)
+    weeks = sorted(partial['week'].unique())
+    stored = conn.execute(
+        text(f'SELECT {", ".join(keys)}, salary_sketch FROM "{table_name}" '
+             'WHERE week IN :weeks AND salary_sketch IS NOT NULL').bindparams(bindparam('weeks', expanding=True)),
+        {'weeks': weeks},
+    ).fetchall()
+    if stored:
+        stored_sketches = {tuple(row[:-1]): row[-1] for row in stored}
+        partial['salary_sketch'] = [
+            _merge_payloads(stored_sketches.get(key), payload)
+            for key, payload in zip(partial[keys].itertuples(index=False, name=None), partial['salary_sketch'])
+        ]
+    records = partial.astype(object).where(partial.notna(), None).to_dict('records')
+    columns = keys + _STAT_COLUMNS
+    conn.execute(
+        text(
+            f'INSERT INTO "{table_name}" ({", ".join(columns)}) '
+            f'VALUES ({", ".join(":" + column for column in columns)}) '
+            f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET '
+            + ', '.join(f'{column} = {column} + excluded.{column}' for column in _SUM_COLUMNS) + ', '
+            'salary_min = coalesce(min(salary_min, excluded.salary_min), salary_min, excluded.salary_min), '
+            'salary_max = coalesce(max(salary_max, excluded.salary_max), salary_max, excluded.salary_max), '
+            'salary_sketch = coalesce(excluded.salary_sketch, salary_sketch)'
+        ),
+        records,
+    )
+
+def _merge_payloads(stored, added):
+    if stored is None or added is None:
+        return added
+    sketch = QuantileSketch.from_json(stored, SALARY_SKETCH_ACCURACY)
+    sketch.merge(QuantileSketch.from_json(added, SALARY_SKETCH_ACCURACY))
+    return sketch.to_json()
+
+def _create_summary_tables(conn):
+    for table_name, keys in [(SUMMARY_TABLE_NAME, SUMMARY_DIMENSIONS),
+                             (SKILL_SUMMARY_TABLE_NAME, SUMMARY_DIMENSIONS + ['skill'])]:
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{table_name}" ('
+            + ''.join(f'{key} TEXT NOT NULL, ' for key in keys)
+            + 'jobs INTEGER NOT NULL, salary_count INTEGER NOT NULL, salary_sum REAL NOT NULL, '
+            'salary_sumsq REAL NOT NULL, salary_min REAL, salary_max REAL, salary_sketch TEXT, '
+            f'PRIMARY KEY ({", ".join(keys)}))'
+        ))
@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src.config import METRICS_DIR, METRICS_ENABLED
+
+_logger = logging.getLogger(__name__)
+_NO_TIMER = contextlib.nullcontext()
+
+
+class Metrics:
+    """
+    In-process registry of counters and timers for one pipeline run.
+
+    Metrics are identified by a name and keyword labels, e.g.
+    `metrics.count('scraper_fetch_errors_total', error='TimeoutError')`. Timers
+    add up the number of timed calls, their seconds and, optionally, the rows
+    they handled, from which rows per second follow. Every timing is logged
+    at DEBUG as a JSON line, and `write_report` writes the totals as JSON and
+    in the Prometheus text format at the end of a run.
+
+    While disabled, `count` returns at once and `timer` hands out a shared
+    no-op context manager, so instrumented code runs at its normal speed.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether metrics are recorded.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._counters = {}
+        self._timers = {}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        self._counters = {}
+        self._timers = {}
+
+    def count(self, name, value=1, **labels):
+        """
+        Add to a counter.
+        :param name: Counter name, ending in '_total' by convention.
+        :param value: Amount to add.
+        :param labels: Label names and values.
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, rows=None, **labels):
+        """
+        Record one timed call.
+        :param name: Timer name, ending in '_seconds' by convention.
+        :param seconds: Duration of the call.
+        :param rows: Number of rows the call handled, if it handles rows.
+        :param labels: Label names and values.
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        totals = self._timers.setdefault(key, [0, 0.0, None])
+        totals[0] += 1
+        totals[1] += seconds
+        if rows is not None:
+            totals[2] = (totals[2] or 0) + rows
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug(json.dumps({'metric': name, **labels, 'seconds': round(seconds, 6), 'rows': rows}))
+
+    def timer(self, name, rows=None, **labels):
+        """
+        Time a block of code.
+        :param name: Timer name.
+        :param rows: Number of rows the block handles, optional.
+        :param labels: Label names and values.
+        :return: Context manager.
+        """
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, name, rows, labels)
+
+    def timed(self, name, **labels):
+        """
+        Decorator timing every call of a function or coroutine function.
+        :param name: Timer name.
+        :param labels: Label names and values.
+        :return: Decorator.
+        """
+        def decorator(function):
+            if asyncio.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await function(*args, **kwargs)
+                    with _Timer(self, name, None, labels):
+                        return await function(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Timer(self, name, None, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """
+        Get the current totals.
+        :return: Dictionary with a list of counters and a list of timers.
+        """
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self._counters.items())]
+        timers = []
+        for (name, labels), (calls, seconds, rows) in sorted(self._timers.items(), key=lambda item: item[0]):
+            timer = {'name': name, 'labels': dict(labels), 'count': calls, 'seconds': round(seconds, 6)}
+            if rows is not None:
+                timer['rows'] = rows
+                timer['rows_per_second'] = round(rows / seconds, 1) if seconds > 0 else None
+            timers.append(timer)
+        return {'counters': counters, 'timers': timers}
+
+    def to_prometheus(self):
+        """
+        Render the current totals in the Prometheus text exposition format.
+
+        Counters are exposed as counters, and each timer as a summary with
+        `_sum` and `_count` series, plus a `_rows_total` counter if it has rows.
+        :return: Exposition text.
+        """
+        lines = []
+        snapshot = self.snapshot()
+        for name in sorted({counter['name'] for counter in snapshot['counters']}):
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{_labels(counter["labels"])} {counter["value"]}'
+                         for counter in snapshot['counters'] if counter['name'] == name)
+        for name in sorted({timer['name'] for timer in snapshot['timers']}):
+            timers = [timer for timer in snapshot['timers'] if timer['name'] == name]
+            lines.append(f'# TYPE {name} summary')
+            for timer in timers:
+                lines.append(f'{name}_sum{_labels(timer["labels"])} {timer["seconds"]}')
+                lines.append(f'{name}_count{_labels(timer["labels"])} {timer["count"]}')
+            rows_name = name.removesuffix('_seconds') + '_rows_total'
+            timers_with_rows = [timer for timer in timers if 'rows' in timer]
+            if timers_with_rows:
+                lines.append(f'# TYPE {rows_name} counter')
+                lines.extend(f'{rows_name}{_labels(timer["labels"])} {timer["rows"]}' for timer in timers_with_rows)
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, run_name, directory=None):
+        """
+        Log the totals and write them to `<run_name>.json` and `<run_name>.prom`.
+
+        Does nothing while disabled.
+        :param run_name: Name of the run, e.g. 'scrape' or 'processing'.
+        :param directory: Directory to write the files to, METRICS_DIR by default.
+        :return: Tuple of the JSON and Prometheus file paths, or None while disabled.
+        """
+        if not self.enabled:
+            return None
+        snapshot = self.snapshot()
+        for metric in snapshot['counters'] + snapshot['timers']:
+            _logger.info(json.dumps({'run': run_name, **metric}))
+        directory = Path(directory or METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        json_path = directory / f'{run_name}.json'
+        prometheus_path = directory / f'{run_name}.prom'
+        json_path.write_text(json.dumps(
+            {'run': run_name, 'written': datetime.now().isoformat(timespec='seconds'), **snapshot}, indent=2
+        ))
+        prometheus_path.write_text(self.to_prometheus())
+        print(f"Metrics written to {json_path} and {prometheus_path}.")
+        return json_path, prometheus_path
+
+
+class _Timer:
+    """
+    Context manager recording the duration of its block in a Metrics registry.
+    """
+
+    def __init__(self, registry, name, rows, labels):
+        self.registry = registry
+        self.name = name
+        self.rows = rows
+        self.labels = labels
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self._start, self.rows, **self.labels)
+        return False
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = {name: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for name, value in labels.items()}
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped.items()) + '}'
+
+
+# Shared by the scraper, the cleaning functions and the DB helpers
+metrics = Metrics(enabled=METRICS_ENABLED)
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import contextlib
+import logging
+import time
+
+from src.config import (
+    ARCHIVE_HTML, DB_PATH, PIPELINE_BATCH_SIZE, PIPELINE_FLUSH_SECONDS, PIPELINE_QUEUE_SIZE, RAW_DATA_TABLE_NAME,
+    SEARCH_CATEGORIES
+)
+from src.data_collection.frontier import UrlFrontier
+from src.data_collection.html_archive import HtmlArchive
+from src.data_collection.scheduler import scrape_categories_async
+from src.data_collection.scraper import _RecordSink
+from src.data_processing.data_cleaning import process_new_raw_rows
+from src.metrics import metrics
+from src.utils import save_data_to_db
+
+
+class _StreamingSink(_RecordSink):
+    """
+    Scraper sink handing postings to the pipeline queue in small batches.
+
+    A batch is queued once it holds `batch_size` postings or its oldest
+    posting is `flush_seconds` old, checked as postings arrive, on every
+    drain and by _flush_stale_batches while the scraper is stalled.
+    Queuing waits while the queue is full, which holds back the scraper
+    pages feeding this sink. Failed urls are queued with the batch too, so
+    every database write goes through the pipeline's single writer rather
+    than the event loop. Postings are stored by the writer, so none are
+    left in `records` for the scraper to return.
+    """
+
+    def __init__(self, queue, frontier, search_category, batch_size=PIPELINE_BATCH_SIZE,
+                 flush_seconds=PIPELINE_FLUSH_SECONDS):
+        super().__init__(frontier, search_category, flush_size=batch_size)
+        self.queue = queue
+        self.flush_seconds = flush_seconds
+        self._failures = []
+        self._started_at = None
+        self._ready = []
+
+    def add(self, url, job_data_raw):
+        self._start_batch()
+        super().add(url, job_data_raw)
+        self.flush_if_stale()
+
+    def failed(self, url, error):
+        self._start_batch()
+        self._failures.append((url, repr(error)))
+
+    def _start_batch(self):
+        if not self.records and not self._failures:
+            self._started_at = time.monotonic()
+
+    def flush_if_stale(self):
+        """
+        Flush the batch if its oldest entry is `flush_seconds` old.
+        """
+        if (self.records or self._failures) and time.monotonic() - self._started_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.records or self._failures:
+            self._ready.append(
+                _Batch(self.search_category, self.records, self._urls, self._started_at, self._failures)
+            )
+            self.records = []
+            self._urls = []
+            self._failures = []
+
+    async def drain(self):
+        """
+        Queue the full and stale batches, waiting for room in the queue.
+        """
+        self.flush_if_stale()
+        while self._ready:
+            batch = self._ready.pop(0)
+            with metrics.timer('pipeline_backpressure_seconds', category=self.search_category):
+                await self.queue.put(batch)
+
+
+class _Batch:
+    """
+    Postings of one search category waiting to be stored, with the urls that failed to scrape.
+    """
+
+    def __init__(self, search_category, records, urls, started_at, failures=()):
+        self.search_category = search_category
+        self.records = records
+        self.urls = urls
+        self.started_at = started_at
+        self.failures = list(failures)
+
+
+def store_batch(db_path, frontier, batch, workers=None):
+    """
+    Save a batch of raw postings and clean them into the processed table.
+
+    Only the rows after the processed high-water mark are read back, which
+    are the ones just saved, so each posting is cleaned once. The failed
+    urls of the batch are recorded in the frontier first.
+    :param db_path: Path to the SQLite database.
+    :param frontier: UrlFrontier whose urls are marked done once saved.
+    :param batch: _Batch of postings.
+    :param workers: Number of cleaning processes, see clean_dataframe.
+    :return: Number of raw rows processed, or None if saving failed.
+    """
+    for url, error in batch.failures:
+        frontier.mark_failed(url, error)
+    rows = len(batch.records)
+    if not rows:
+        return 0
+    with metrics.timer('pipeline_stage_seconds', rows=rows, stage='save'):
+        written = save_data_to_db(batch.records, RAW_DATA_TABLE_NAME, db_path, batch.search_category)
+    if written is None:
+        # The urls stay pending, so the next run scrapes them again
+        return None
+    frontier.mark_done(batch.urls)
+    with metrics.timer('pipeline_stage_seconds', rows=rows, stage='process'):
+        processed = process_new_raw_rows(db_path, workers=workers)
+    metrics.observe('pipeline_latency_seconds', time.monotonic() - batch.started_at, rows=rows)
+    return processed
+
+async def _store_batches(queue, db_path, frontier, workers):
+    """
+    Store queued batches until the None sentinel, off the event loop so scraping continues.
+    :return: Number of raw rows processed.
+    """
+    processed = 0
+    while (batch := await queue.get()) is not None:
+        try:
+            processed += await asyncio.to_thread(store_batch, db_path, frontier, batch, workers) or 0
+        except Exception as e:
+            # The raw rows are saved, so a later processing run picks them up
+            print(f"Could not process a batch of {len(batch.records)} {batch.search_category} postings: {e!r}")
+            metrics.count('pipeline_errors_total', error=type(e).__name__)
+    return processed
+
+async def _flush_stale_batches(sinks, flush_seconds, done):
+    """
+    Queue the batches of every sink once they are `flush_seconds` old, until done is set.
+
+    A sink only checks the age of its batch when its scraper hands it a
+    result, so this keeps postings flowing while a scraper waits on retries,
+    backoff or the rate limiter.
+    :param sinks: List of _StreamingSink, which may grow while this runs.
+    :param flush_seconds: Maximum age of a batch before it is queued.
+    :param done: asyncio.Event set once scraping has finished.
+    """
+    while not done.is_set():
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(done.wait(), flush_seconds / 4)
+        for sink in list(sinks):
+            await sink.drain()
+
+def run_pipeline(search_categories, db_path=DB_PATH, archive=None, **options):
+    """
+    Scrape search categories and clean each posting into the processed table as it arrives.
+
+    Scraped postings go through a bounded queue to a single writer, which
+    saves each batch to the raw table and cleans it into the processed,
+    skills and summary tables right away, so new postings are queryable
+    within seconds and nothing is read back from the raw table afterwards.
+    While the writer falls behind, the full queue holds back the scraper,
+    so memory stays bounded by the queue size.
+    :param search_categories: Dictionary of job title to number of search result pages.
+    :param db_path: Path to the SQLite database.
+    :param archive: HtmlArchive to store fetched pages in, optional.
+    :param options: Keyword arguments for run_pipeline_async.
+    :return: Tuple of the number of postings processed and the dictionary of
+        job title to the error that stopped it, for categories that failed.
+    """
+    return asyncio.run(run_pipeline_async(search_categories, db_path, archive, **options))
+
+async def run_pipeline_async(search_categories, db_path=DB_PATH, archive=None, queue_size=PIPELINE_QUEUE_SIZE,
+                             batch_size=PIPELINE_BATCH_SIZE, flush_seconds=PIPELINE_FLUSH_SECONDS, workers=None,
+                             **scrape_options):
+    """
+    Asynchronous version of run_pipeline, for use inside a running event loop.
+    :param search_categories: Dictionary of job title to number of search result pages.
+    :param db_path: Path to the SQLite database.
+    :param archive: HtmlArchive to store fetched pages in, optional.
+    :param queue_size: Maximum number of batches waiting to be stored.
+    :param batch_size: Maximum number of postings per batch.
+    :param flush_seconds: Maximum age of the oldest posting in a batch before it is queued.
+    :param workers: Number of cleaning processes, see clean_dataframe.
+    :param scrape_options: Extra keyword arguments for scrape_categories_async.
+    :return: Tuple of the number of postings processed and the dictionary of
+        job title to the error that stopped it, for categories that failed.
+    """
+    frontier = UrlFrontier(db_path)
+    queue = asyncio.Queue(maxsize=queue_size)
+    sinks = []
+
+    def sink_factory(job_title):
+        sinks.append(_StreamingSink(queue, frontier, job_title, batch_size, flush_seconds))
+        return sinks[-1]
+
+    store = asyncio.create_task(_store_batches(queue, db_path, frontier, workers))
+    scraped = asyncio.Event()
+    flusher = asyncio.create_task(_flush_stale_batches(sinks, flush_seconds, scraped))
+    try:
+        errors = await scrape_categories_async(
+            search_categories, frontier, archive, sink_factory=sink_factory, **scrape_options,
+        )
+    finally:
+        scraped.set()
+        await flusher
+        # Categories stopped by an error may have left a partial batch behind
+        for sink in sinks:
+            sink.flush()
+            await sink.drain()
+        await queue.put(None)
+        processed = await store
+    print(f"Pipeline processed {processed} new postings. Frontier status: {frontier.counts()}")
+    metrics.write_report('pipeline')
+    return processed, errors
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scrape job postings and clean them as they arrive.")
+    parser.add_argument('--queue-size', type=int, default=PIPELINE_QUEUE_SIZE, help="Batches waiting to be stored.")
+    parser.add_argument('--batch-size', type=int, default=PIPELINE_BATCH_SIZE, help="Postings per batch.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of cleaning processes.")
+    args = parser.parse_args()
+    if metrics.enabled:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    run_pipeline(SEARCH_CATEGORIES, archive=HtmlArchive(DB_PATH) if ARCHIVE_HTML else None,
+                 queue_size=args.queue_size, batch_size=args.batch_size, workers=args.workers)
@@ -1,32 +1,374 @@
-from sqlalchemy import create_engine, inspect
+import hashlib
+import time
+from functools import lru_cache
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 
 import pandas as pd
 
+from src.config import (
+    DB_PATH, PIPELINE_STATE_TABLE_NAME, PROCESSED_DATA_TABLE_NAME, RAW_DATA_TABLE_NAME, SQLITE_BUSY_TIMEOUT_MS
+)
+from src.metrics import metrics
+
+CONTENT_HASH_COLUMN = 'content_hash'
+RAW_ID_COLUMN = 'raw_id'
+# Normalized descriptions that say nothing about the posting, e.g. FieldExtractor's value for a missing field
+PLACEHOLDER_DESCRIPTIONS = {'', 'n/a'}
+
+def content_hash(description):
+    """
+    Hash a job description for duplicate detection.
+
+    Descriptions are compared case-insensitively with runs of whitespace
+    collapsed, so re-scrapes that only differ in formatting hash the same.
+    Missing and placeholder descriptions get no hash: postings whose
+    description could not be extracted are not duplicates of each other,
+    and the unique index allows any number of NULLs.
+    :param description: Full job description.
+    :return: Hex SHA-1 digest of the normalized description, or None.
+    """
+    if not isinstance(description, str):
+        return None
+    normalized = ' '.join(description.lower().split())
+    if normalized in PLACEHOLDER_DESCRIPTIONS:
+        return None
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+@lru_cache(maxsize=None)
+def get_engine(db_path):
+    """
+    Get the shared SQLAlchemy engine for a database, creating it on first use.
+
+    Connections are configured for bulk loads: write-ahead logging lets
+    readers continue during writes, and synchronous=NORMAL only syncs at
+    checkpoints instead of on every commit. A write waits up to
+    SQLITE_BUSY_TIMEOUT_MS for a long transaction on another connection,
+    such as a processing run, instead of failing as locked.
+    :param db_path: Path to the SQLite database.
+    :return: A cached SQLAlchemy engine.
+    """
+    engine = create_engine(f'sqlite:///{db_path}')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA cache_size=-65536')
+        cursor.execute(f'PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}')
+        cursor.close()
+        dbapi_connection.create_function(CONTENT_HASH_COLUMN, 1, content_hash, deterministic=True)
+
+    return engine
+
 def save_data_to_db(data, table_name, db_path, search_category=None):
     """
     Save the data to a specified table in an SQLite database.
+
+    Rows with a 'full_description' get a content hash with a unique index,
+    and rows whose description is already stored are skipped on insert.
+    Their table is keyed on an autoincrementing raw_id, see _ensure_raw_id.
     :param data: Raw data that is to be saved.
     :param table_name: Name of the table to create/replace.
     :param db_path: Path to the SQLite database.
     :param search_category: Name of the searched job role.
+    :return: Number of rows written, or None if saving failed.
     """
     df = pd.DataFrame(data)
     if df.empty:
         print("DataFrame is empty. Nothing to save.")
-        return
+        return 0
     if search_category is not None:
         df['search_category'] = search_category
+    deduplicate = 'full_description' in df.columns
+    if deduplicate:
+        df[CONTENT_HASH_COLUMN] = df['full_description'].map(content_hash)
     try:
-        engine = create_engine(f'sqlite:///{db_path}')
-        df.to_sql(
-            name=table_name,
-            con=engine,
-            if_exists='append',
-            index=False,
+        start = time.perf_counter()
+        with get_engine(db_path).begin() as conn:
+            if inspect(conn).has_table(table_name):
+                _add_missing_columns(conn, table_name, df)
+            elif deduplicate:
+                conn.execute(text(pd.io.sql.get_schema(df, table_name, con=conn)))
+            if deduplicate:
+                _ensure_raw_id(conn, table_name)
+                _ensure_content_hash_index(conn, table_name)
+            written = df.to_sql(
+                name=table_name,
+                con=conn,
+                if_exists='append',
+                index=False,
+                method=_insert_or_ignore if deduplicate else None,
+            )
+        if not deduplicate:
+            written = len(df)
+        metrics.observe('db_operation_seconds', time.perf_counter() - start, rows=len(df),
+                        operation='save', table=table_name)
+        metrics.count('db_duplicates_skipped_total', len(df) - written, table=table_name)
+        skipped = f", skipped {len(df) - written} duplicates" if deduplicate else ""
+        print(f"Successfully wrote {written} records to the '{table_name}' table "
+              f"in {db_path} ({_rows_per_second(len(df), start):.0f} rows/sec{skipped}).")
+        return written
+    except Exception as e:
+        print(f"An error occurred while saving to the database: {e}")
+        metrics.count('db_errors_total', operation='save', error=type(e).__name__)
+        return None
+
+def _add_missing_columns(conn, table_name, df):
+    """
+    Add columns of the DataFrame that an existing table does not have yet.
+    :param conn: Open connection inside a transaction.
+    :param table_name: Name of an existing table.
+    :param df: DataFrame that is about to be written to the table.
+    """
+    columns = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    for column in df.columns:
+        if column not in columns:
+            conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN "{column}"'))
+
+def _ensure_raw_id(conn, table_name):
+    """
+    Give a table an explicit raw_id INTEGER PRIMARY KEY AUTOINCREMENT column.
+
+    Processing keys its watermarks and processed rows on raw_id. The
+    implicit rowid of a table without such a key is reused once the last
+    rows are deleted, and VACUUM may renumber it, so a new posting could
+    land at or below a watermark and never be processed. AUTOINCREMENT ids
+    are never reused. A table without the column is rebuilt once, with
+    raw_id set to each row's rowid, so existing watermarks stay valid.
+    Indexes are not copied; the content hash index is recreated afterwards.
+    :param conn: Open connection inside a transaction.
+    :param table_name: Name of an existing table.
+    """
+    columns = conn.execute(text(f'PRAGMA table_info("{table_name}")')).fetchall()
+    if any(column[1] == RAW_ID_COLUMN for column in columns):
+        return
+    rebuilt_name = f'{table_name}_rebuilt'
+    definitions = ''.join(f', "{column[1]}" {column[2]}' for column in columns)
+    names = ', '.join(f'"{column[1]}"' for column in columns)
+    conn.execute(text(
+        f'CREATE TABLE "{rebuilt_name}" ("{RAW_ID_COLUMN}" INTEGER PRIMARY KEY AUTOINCREMENT{definitions})'
+    ))
+    conn.execute(text(
+        f'INSERT INTO "{rebuilt_name}" ("{RAW_ID_COLUMN}", {names}) SELECT rowid, {names} FROM "{table_name}"'
+    ))
+    conn.execute(text(f'DROP TABLE "{table_name}"'))
+    conn.execute(text(f'ALTER TABLE "{rebuilt_name}" RENAME TO "{table_name}"'))
+    if inspect(conn).has_table(PIPELINE_STATE_TABLE_NAME):
+        # Rows deleted from the end before the rebuild may already be past a watermark, so their ids stay used
+        watermark = conn.execute(text(f'SELECT MAX(last_rowid) FROM "{PIPELINE_STATE_TABLE_NAME}"')).scalar() or 0
+        conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table_name})
+        conn.execute(
+            text(f'INSERT INTO sqlite_sequence (name, seq) '
+                 f'SELECT :name, MAX(:watermark, COALESCE(MAX("{RAW_ID_COLUMN}"), 0)) FROM "{table_name}"'),
+            {'name': table_name, 'watermark': watermark},
         )
-        print(f"Successfully wrote {len(df)} records to the '{table_name}' table in {db_path}.")
+
+def _insert_or_ignore(pd_table, conn, keys, data_iter):
+    """
+    pandas to_sql insert method that skips rows violating a unique index.
+    """
+    rows = [dict(zip(keys, row)) for row in data_iter]
+    return conn.execute(pd_table.table.insert().prefix_with('OR IGNORE'), rows).rowcount
+
+def _ensure_content_hash_index(conn, table_name):
+    """
+    Make sure a table has a filled content hash column with a unique index.
+
+    Creating the index fails if the table still holds duplicates, see
+    deduplicate_table.
+    :param conn: Open connection inside a transaction.
+    :param table_name: Name of a table with a 'full_description' column.
+    """
+    index_name = f'ix_{table_name}_{CONTENT_HASH_COLUMN}'
+    if any(index['name'] == index_name for index in inspect(conn).get_indexes(table_name)):
+        return
+    _backfill_content_hash(conn, table_name)
+    try:
+        conn.execute(text(f'CREATE UNIQUE INDEX "{index_name}" ON "{table_name}" ("{CONTENT_HASH_COLUMN}")'))
+    except IntegrityError:
+        raise ValueError(f"'{table_name}' contains duplicate descriptions, run deduplicate_table first.")
+
+def _backfill_content_hash(conn, table_name):
+    """
+    Add the content hash column to an older table and fill it in SQL.
+    :param conn: Open connection inside a transaction.
+    :param table_name: Name of a table with a 'full_description' column.
+    """
+    columns = [column['name'] for column in inspect(conn).get_columns(table_name)]
+    if CONTENT_HASH_COLUMN not in columns:
+        conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN "{CONTENT_HASH_COLUMN}" TEXT'))
+    conn.execute(text(
+        f'UPDATE "{table_name}" SET "{CONTENT_HASH_COLUMN}" = {CONTENT_HASH_COLUMN}(full_description) '
+        f'WHERE "{CONTENT_HASH_COLUMN}" IS NULL'
+    ))
+
+def upsert_data_to_db(data, table_name, db_path, key_column, watermark=None):
+    """
+    Insert or update rows in a table, keyed on a unique column.
+    :param data: Data that is to be saved.
+    :param table_name: Name of the table to write to, created if missing.
+    :param db_path: Path to the SQLite database.
+    :param key_column: Column identifying a row; existing rows with the same key are updated.
+    :param watermark: Optional (name, value) pair saved in the same transaction, see get_watermark.
+    :return: Number of rows upserted, or None if saving failed, in which case the watermark is unchanged.
+    """
+    df = pd.DataFrame(data)
+    if df.empty:
+        print("DataFrame is empty. Nothing to save.")
+        return 0
+    try:
+        start = time.perf_counter()
+        with get_engine(db_path).begin() as conn:
+            if not inspect(conn).has_table(table_name):
+                conn.execute(text(pd.io.sql.get_schema(df, table_name, con=conn)))
+            elif key_column not in [column['name'] for column in inspect(conn).get_columns(table_name)]:
+                raise ValueError(f"'{table_name}' has no '{key_column}' column, rebuild it to enable upserts.")
+            else:
+                _add_missing_columns(conn, table_name, df)
+            conn.execute(text(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS "ix_{table_name}_{key_column}" '
+                f'ON "{table_name}" ("{key_column}")'
+            ))
+            df.to_sql(
+                name=table_name,
+                con=conn,
+                if_exists='append',
+                index=False,
+                method=_upsert_on(key_column),
+            )
+            if watermark is not None:
+                set_watermark(conn, *watermark)
+        metrics.observe('db_operation_seconds', time.perf_counter() - start, rows=len(df),
+                        operation='upsert', table=table_name)
+        print(f"Successfully upserted {len(df)} records into the '{table_name}' table in {db_path} "
+              f"({_rows_per_second(len(df), start):.0f} rows/sec).")
+        return len(df)
     except Exception as e:
         print(f"An error occurred while saving to the database: {e}")
+        metrics.count('db_errors_total', operation='upsert', error=type(e).__name__)
+        return None
+
+def _upsert_on(key_column):
+    """
+    Build a pandas to_sql insert method that updates rows on a key conflict.
+    :param key_column: Column with a unique index.
+    :return: Callable usable as the method argument of DataFrame.to_sql.
+    """
+    def upsert(pd_table, conn, keys, data_iter):
+        rows = [dict(zip(keys, row)) for row in data_iter]
+        statement = sqlite_insert(pd_table.table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[key_column],
+            set_={key: statement.excluded[key] for key in keys if key != key_column},
+        )
+        return conn.execute(statement, rows).rowcount
+    return upsert
+
+def _rows_per_second(rows, start):
+    return rows / max(time.perf_counter() - start, 1e-9)
+
+def get_watermark(db_path, name):
+    """
+    Get the high-water mark recorded for a processing step.
+    :param db_path: Path to the SQLite database.
+    :param name: Name of the processing step.
+    :return: The last rowid processed by the step, or 0 if it has never run.
+    """
+    with get_engine(db_path).connect() as conn:
+        if not inspect(conn).has_table(PIPELINE_STATE_TABLE_NAME):
+            return 0
+        value = conn.execute(
+            text(f'SELECT last_rowid FROM "{PIPELINE_STATE_TABLE_NAME}" WHERE name = :name'),
+            {'name': name},
+        ).scalar()
+    return value or 0
+
+def reset_watermark(db_path, name):
+    """
+    Forget the high-water mark of a processing step so it starts from scratch.
+    :param db_path: Path to the SQLite database.
+    :param name: Name of the processing step.
+    """
+    with get_engine(db_path).begin() as conn:
+        set_watermark(conn, name, 0)
+
+def set_watermark(conn, name, last_rowid):
+    """
+    Record the high-water mark of a processing step inside an open transaction.
+    :param conn: Open SQLAlchemy connection.
+    :param name: Name of the processing step.
+    :param last_rowid: The last rowid processed by the step.
+    """
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{PIPELINE_STATE_TABLE_NAME}" '
+        '(name TEXT PRIMARY KEY, last_rowid INTEGER NOT NULL)'
+    ))
+    conn.execute(
+        text(
+            f'INSERT INTO "{PIPELINE_STATE_TABLE_NAME}" (name, last_rowid) VALUES (:name, :last_rowid) '
+            'ON CONFLICT (name) DO UPDATE SET last_rowid = excluded.last_rowid'
+        ),
+        {'name': name, 'last_rowid': int(last_rowid)},
+    )
+
+def drop_table(db_path, table_name):
+    """
+    Drop a table from the database if it exists.
+    :param db_path: Path to the SQLite database.
+    :param table_name: Name of the table to drop.
+    """
+    with get_engine(db_path).begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS "{table_name}"'))
+
+def replace_rows_from_table(db_path, table_name, staging_table, key_column):
+    """
+    Replace the rows of a table with the rows staged in another table, in one transaction.
+
+    Rows of the table whose key is in the staging table are deleted, the
+    staged rows are inserted with new raw_ids in their staged order, and the
+    staging table is dropped. Staged rows whose description is already
+    stored are skipped, as in save_data_to_db. An error leaves both tables
+    as they were.
+    :param db_path: Path to the SQLite database.
+    :param table_name: Name of the table to replace rows in, created if missing.
+    :param staging_table: Name of the table holding the new rows, written by save_data_to_db.
+    :param key_column: Column matching staged rows to the rows they replace.
+    :return: Tuple of the number of rows deleted and the number of rows inserted.
+    """
+    with get_engine(db_path).begin() as conn:
+        inspector = inspect(conn)
+        if not inspector.has_table(staging_table):
+            return 0, 0
+        if not inspector.has_table(table_name):
+            inserted = conn.execute(text(f'SELECT COUNT(*) FROM "{staging_table}"')).scalar()
+            conn.execute(text(f'ALTER TABLE "{staging_table}" RENAME TO "{table_name}"'))
+            return 0, inserted
+        staged_columns = [column['name'] for column in inspector.get_columns(staging_table)
+                          if column['name'] != RAW_ID_COLUMN]
+        columns = [column['name'] for column in inspector.get_columns(table_name)]
+        for column in staged_columns:
+            if column not in columns:
+                conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN "{column}"'))
+        _ensure_raw_id(conn, table_name)
+        if 'full_description' in staged_columns:
+            _ensure_content_hash_index(conn, table_name)
+        deleted = 0
+        if key_column in columns:
+            deleted = conn.execute(text(
+                f'DELETE FROM "{table_name}" WHERE "{key_column}" IN (SELECT "{key_column}" FROM "{staging_table}")'
+            )).rowcount
+        names = ', '.join(f'"{column}"' for column in staged_columns)
+        inserted = conn.execute(text(
+            f'INSERT OR IGNORE INTO "{table_name}" ({names}) '
+            f'SELECT {names} FROM "{staging_table}" ORDER BY "{RAW_ID_COLUMN}"'
+        )).rowcount
+        conn.execute(text(f'DROP TABLE "{staging_table}"'))
+    return deleted, inserted
 
 def load_data_from_db(db_path, table_name):
     """
@@ -35,37 +377,87 @@ def load_data_from_db(db_path, table_name):
     :param table_name: Name of the table to load.
     :return: A DataFrame containing the raw data, or an empty one on error.
     """
-    engine = create_engine(f'sqlite:///{db_path}')
+    engine = get_engine(db_path)
     inspector = inspect(engine)
     if not inspector.has_table(table_name):
         return pd.DataFrame()
+    start = time.perf_counter()
     df = pd.read_sql_table(table_name, engine)
+    metrics.observe('db_operation_seconds', time.perf_counter() - start, rows=len(df),
+                    operation='load', table=table_name)
     print(f"Successfully loaded {len(df)} rows.")
     return df
 
+def iter_data_from_db(db_path, table_name, chunksize, after_rowid=0):
+    """
+    Stream a table from the database in chunks of bounded size.
+
+    Chunks are read in rowid order with keyset pagination, so no cursor is
+    held open between chunks and only one chunk is in memory at a time.
+    Tables with a raw_id key (see _ensure_raw_id) return it, where it equals
+    the rowid; older tables return their rowid as raw_id.
+    :param db_path: Path to the SQLite database.
+    :param table_name: Name of the table to load.
+    :param chunksize: Maximum number of rows per chunk.
+    :param after_rowid: Only load rows with a greater rowid.
+    :return: Generator of DataFrames, each with the rowid in a 'raw_id' column.
+    """
+    engine = get_engine(db_path)
+    if not inspect(engine).has_table(table_name):
+        return
+    columns = [column['name'] for column in inspect(engine).get_columns(table_name)]
+    selected = '*' if RAW_ID_COLUMN in columns else f'rowid AS {RAW_ID_COLUMN}, *'
+    query = text(f'SELECT {selected} FROM "{table_name}" WHERE rowid > :after_rowid '
+                 'ORDER BY rowid LIMIT :chunksize')
+    while True:
+        start = time.perf_counter()
+        df = pd.read_sql_query(query, engine, params={'after_rowid': int(after_rowid), 'chunksize': chunksize})
+        metrics.observe('db_operation_seconds', time.perf_counter() - start, rows=len(df),
+                        operation='load_chunk', table=table_name)
+        if df.empty:
+            return
+        yield df
+        after_rowid = df['raw_id'].iloc[-1]
+
 def deduplicate_table(table_name, db_path):
     """
-    Reads a table, removes duplicate rows based on the 'url' column,
-    and overwrites the table with the clean data.
-    :param table_name: Name of the table to create/replace.
+    Remove rows whose description duplicates an earlier row, keeping the first.
+
+    Runs entirely inside SQLite: the table gets its raw_id key, the content
+    hash column is backfilled, all but the lowest raw_id per hash is deleted
+    and the unique index is added, so later saves skip duplicates at insert
+    time. Deleted ids are never handed out again.
+    :param table_name: Name of a table with a 'full_description' column.
     :param db_path: Path to the SQLite database.
     """
+    watermark = get_watermark(db_path, PROCESSED_DATA_TABLE_NAME) if table_name == RAW_DATA_TABLE_NAME else 0
     try:
-        engine = create_engine(f'sqlite:///{db_path}')
-        df = pd.read_sql_table(table_name, engine)
-        print(f"Loaded {len(df)} rows from '{table_name}' (with duplicates).")
-        df_clean = df.drop_duplicates(subset=['full_description'], keep='first')
-        print(f"Removed {len(df) - len(df_clean)} duplicate rows.")
-        print(f"New row count: {len(df_clean)}.")
-        print(f"Overwriting '{table_name}' with de-duplicated data...")
-        df_clean.to_sql(
-            table_name,
-            con=engine,
-            if_exists='replace',
-            index=False
-        )
+        start = time.perf_counter()
+        with get_engine(db_path).begin() as conn:
+            row_count = conn.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar()
+            print(f"Found {row_count} rows in '{table_name}' (with duplicates).")
+            _ensure_raw_id(conn, table_name)
+            _backfill_content_hash(conn, table_name)
+            duplicates = (f'"{CONTENT_HASH_COLUMN}" IS NOT NULL AND "{RAW_ID_COLUMN}" NOT IN '
+                          f'(SELECT MIN("{RAW_ID_COLUMN}") FROM "{table_name}" GROUP BY "{CONTENT_HASH_COLUMN}")')
+            processed = conn.execute(
+                text(f'SELECT COUNT(*) FROM "{table_name}" WHERE "{RAW_ID_COLUMN}" <= :watermark AND {duplicates}'),
+                {'watermark': watermark},
+            ).scalar()
+            removed = conn.execute(text(f'DELETE FROM "{table_name}" WHERE {duplicates}')).rowcount
+            _ensure_content_hash_index(conn, table_name)
+        metrics.observe('db_operation_seconds', time.perf_counter() - start, rows=row_count,
+                        operation='deduplicate', table=table_name)
+        metrics.count('db_duplicates_removed_total', removed, table=table_name)
+        print(f"Removed {removed} duplicate rows.")
+        print(f"New row count: {row_count - removed}.")
+        if processed:
+            print(f"{processed} removed rows were already processed, run the cleaning script with --full "
+                  f"to drop them from '{PROCESSED_DATA_TABLE_NAME}'.")
         print("De-duplication complete.")
     except Exception as e:
         print(f"An error occurred: {e}")
+        metrics.count('db_errors_total', operation='deduplicate', error=type(e).__name__)
 
-
+if __name__ == '__main__':
+    deduplicate_table(RAW_DATA_TABLE_NAME, DB_PATH)
@@ -0,0 +1,44 @@
+from sqlalchemy import text
+
+from src.config import FRONTIER_TABLE_NAME, RAW_DATA_TABLE_NAME
+from src.data_collection.frontier import UrlFrontier
+from src.utils import get_engine, get_watermark, save_data_to_db
+
+
+def test_frontier_skips_known_urls_and_retries_failures(tmp_path):
+    """Test that urls are queued once, and failed urls are retried until max_attempts."""
+    frontier = UrlFrontier(tmp_path / 'jobs.db', max_attempts=2)
+    assert frontier.add(['u1', 'u2', 'u3'], 'DevOps') == 3
+    assert frontier.add(['u2', 'u4'], 'DevOps') == 1
+    frontier.mark_done(['u1'])
+    frontier.mark_failed('u2', 'TimeoutError')
+    assert list(frontier.pending('DevOps', batch_size=2)) == ['u2', 'u3', 'u4']
+    frontier.mark_failed('u2', 'TimeoutError')
+    assert list(frontier.pending()) == ['u3', 'u4']
+    assert list(frontier.pending('Data Engineer')) == []
+    assert frontier.counts() == {'done': 1, 'failed': 1, 'pending': 2}
+
+def test_frontier_treats_urls_in_raw_table_as_done(tmp_path):
+    """Test that postings saved before the frontier existed are not scraped again."""
+    db_path = tmp_path / 'jobs.db'
+    save_data_to_db([{'url': 'u1', 'full_description': 'a'}], RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+    frontier = UrlFrontier(db_path)
+    assert frontier.add(['u1', 'u2'], 'DevOps') == 1
+    assert list(frontier.pending()) == ['u2']
+    save_data_to_db([{'url': 'u3', 'full_description': 'c'}], RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+    # Raw rows already backfilled are not read again, only the new one is
+    with get_engine(db_path).begin() as conn:
+        conn.execute(text(f'DELETE FROM "{FRONTIER_TABLE_NAME}" WHERE url = \'u1\''))
+    frontier = UrlFrontier(db_path)
+    assert frontier.add(['u3'], 'DevOps') == 0
+    assert frontier.counts() == {'done': 1, 'pending': 1}
+    assert get_watermark(db_path, FRONTIER_TABLE_NAME) == 2
+
+def test_frontier_records_every_category_of_a_url(tmp_path):
+    """Test that a url found under a second category is not queued again but keeps both categories."""
+    frontier = UrlFrontier(tmp_path / 'jobs.db')
+    assert frontier.add(['u1', 'u2'], 'DevOps Engineer') == 2
+    assert frontier.add(['u2', 'u3'], 'Data Engineer') == 1
+    assert list(frontier.pending('Data Engineer')) == ['u3']
+    assert frontier.categories('u2') == ['Data Engineer', 'DevOps Engineer']
+    assert frontier.categories('u1') == ['DevOps Engineer']
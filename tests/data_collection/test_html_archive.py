@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy import inspect
+
+from src.config import (
+    JOB_SKILLS_TABLE_NAME, NEAR_DUPLICATE_SIGNATURES_TABLE_NAME, PROCESSED_DATA_TABLE_NAME, RAW_DATA_TABLE_NAME,
+    REEXTRACTED_TABLE_NAME
+)
+from src.data_collection.html_archive import HtmlArchive, decompress_html
+from src.data_collection.reextract import reextract_archive
+from src.data_processing.data_cleaning import process_raw_data
+from src.utils import get_engine, load_data_from_db, save_data_to_db
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def test_archive_stores_compressed_pages_and_streams_latest_fetch(tmp_path):
+    """Test that only the most recent fetch of each url is streamed back."""
+    archive = HtmlArchive(tmp_path / 'jobs.db')
+    archive.store('https://example.com/a', '<p>old</p>', 'DevOps', datetime(2025, 9, 1, tzinfo=timezone.utc))
+    archive.store('https://example.com/b', '<p>b</p>', 'DevOps', datetime(2025, 9, 1, tzinfo=timezone.utc))
+    archive.store('https://example.com/a', '<p>new</p>', 'DevOps', datetime(2025, 9, 2, tzinfo=timezone.utc))
+    assert len(archive) == 3
+    pages = [page for batch in archive.iter_latest(batch_size=1) for page in batch]
+    assert [(url, decompress_html(html)) for url, _, html in pages] == [
+        ('https://example.com/b', '<p>b</p>'),
+        ('https://example.com/a', '<p>new</p>'),
+    ]
+
+def test_reextract_archive_rebuilds_raw_table(tmp_path):
+    """Test that archived fixture pages are re-parsed in parallel into the raw table."""
+    db_path = tmp_path / 'jobs.db'
+    archive = HtmlArchive(db_path)
+    for i in (1, 2, 3):
+        archive.store(f'https://example.com/job_{i}', (FIXTURES_DIR / f'job_{i}.html').read_text(), 'DevOps Engineer')
+    reextract_archive(db_path, workers=2, batch_size=2)
+    df = load_data_from_db(db_path, RAW_DATA_TABLE_NAME)
+    assert df['job_title'].tolist() == ['Senior DevOps Engineer', 'DevOps Engineer', 'Junior DevOps Engineer']
+    assert df['search_category'].unique().tolist() == ['DevOps Engineer']
+    assert df['salary_raw'].tolist()[1] == '£500 per day'
+
+def test_reextract_archive_keeps_rows_without_an_archived_page(tmp_path):
+    """Test that only rows of archived urls are replaced, and the tables keyed on raw_ids are dropped."""
+    db_path = tmp_path / 'jobs.db'
+    details = {'location': 'London', 'employment_type': 'Permanent', 'date_posted_raw': '1 day ago',
+               'salary_raw': '£50,000'}
+    save_data_to_db([
+        {'job_title': 'Cloud Engineer', 'full_description': 'Scraped before archiving.',
+         'url': 'https://example.com/old', **details},
+        {'job_title': 'Stale title', 'full_description': 'Parsed with old selectors.',
+         'url': 'https://example.com/job_1', **details},
+    ], RAW_DATA_TABLE_NAME, db_path, 'DevOps Engineer')
+    process_raw_data(db_path)
+    HtmlArchive(db_path).store('https://example.com/job_1', (FIXTURES_DIR / 'job_1.html').read_text(),
+                               'DevOps Engineer')
+    reextract_archive(db_path, workers=1)
+    df = load_data_from_db(db_path, RAW_DATA_TABLE_NAME)
+    assert df['url'].tolist() == ['https://example.com/old', 'https://example.com/job_1']
+    assert df['job_title'].tolist() == ['Cloud Engineer', 'Senior DevOps Engineer']
+    tables = inspect(get_engine(db_path)).get_table_names()
+    for table in (PROCESSED_DATA_TABLE_NAME, JOB_SKILLS_TABLE_NAME, NEAR_DUPLICATE_SIGNATURES_TABLE_NAME):
+        assert table not in tables
+    process_raw_data(db_path)
+    assert load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME)['raw_id'].tolist() == [1, 3]
+
+def test_reextract_archive_leaves_raw_table_unchanged_when_staging_fails(tmp_path, monkeypatch):
+    """Test that a batch that cannot be written raises before any raw or processed row is touched."""
+    db_path = tmp_path / 'jobs.db'
+    save_data_to_db([{'job_title': 'Stale title', 'full_description': 'Parsed with old selectors.',
+                      'url': 'https://example.com/job_1', 'location': 'London', 'employment_type': 'Permanent',
+                      'date_posted_raw': '1 day ago', 'salary_raw': '£50,000'}],
+                    RAW_DATA_TABLE_NAME, db_path, 'DevOps Engineer')
+    process_raw_data(db_path)
+    archive = HtmlArchive(db_path)
+    for i in (1, 2):
+        archive.store(f'https://example.com/job_{i}', (FIXTURES_DIR / f'job_{i}.html').read_text(), 'DevOps Engineer')
+    saves = []
+
+    def fail_second_save(records, table_name, db_path):
+        saves.append(table_name)
+        return save_data_to_db(records, table_name, db_path) if len(saves) == 1 else None
+
+    monkeypatch.setattr('src.data_collection.reextract.save_data_to_db', fail_second_save)
+    with pytest.raises(RuntimeError):
+        reextract_archive(db_path, workers=1, batch_size=1)
+    assert saves == [REEXTRACTED_TABLE_NAME, REEXTRACTED_TABLE_NAME]
+    assert load_data_from_db(db_path, RAW_DATA_TABLE_NAME)['job_title'].tolist() == ['Stale title']
+    tables = inspect(get_engine(db_path)).get_table_names()
+    assert PROCESSED_DATA_TABLE_NAME in tables
+    assert REEXTRACTED_TABLE_NAME not in tables
@@ -0,0 +1,389 @@
+import asyncio
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from src.config import JOB_DETAIL_SELECTORS, JOB_LINK_SELECTOR, JOB_POST_BASE_URL, RAW_DATA_TABLE_NAME
+from src.data_collection.extraction import AttributeExtractor, FieldExtractor
+from src.data_collection.frontier import UrlFrontier
+from src.data_collection.html_archive import HtmlArchive, decompress_html
+from src.data_collection.rate_limiter import TokenBucket
+from src.data_collection.relevance import title_matcher_for
+from src.data_collection.scraper import JobScraper, _RecordSink, is_blocked_request
+from src.metrics import metrics
+from src.utils import load_data_from_db
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+@pytest.fixture
+def fixture_server():
+    """Serve the fixture job pages from a local HTTP server."""
+    handler = functools.partial(_QuietHandler, directory=str(FIXTURES_DIR))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def test_token_bucket_limits_rate_across_tasks():
+    """Test that concurrent tasks share one rate budget."""
+    async def acquire_all(bucket, tasks):
+        await asyncio.gather(*(bucket.acquire() for _ in range(tasks)))
+
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    asyncio.run(acquire_all(bucket, 6))
+    elapsed = time.monotonic() - start
+    # The first token is available immediately, the other five take 1/50s each
+    assert elapsed >= 5 / 50 * 0.9
+    assert bucket.total_wait > 0
+
+def test_scrape_job_details_from_local_server(fixture_server):
+    """Test that the page pool scrapes every fixture page and keeps url order."""
+    playwright_api = pytest.importorskip('playwright.async_api')
+
+    async def scrape(urls):
+        scraper = JobScraper(fixture_server, concurrency=2, max_retries=2)
+        scraper.rate_limiter = TokenBucket(rate=100)
+        async with playwright_api.async_playwright() as p:
+            try:
+                browser = await p.chromium.launch(headless=True)
+            except Exception as e:
+                pytest.skip(f"Chromium is not available: {e}")
+            context = await browser.new_context()
+            details = await scraper._scrape_job_details(context, urls)
+            await browser.close()
+            return details
+
+    urls = [f'{fixture_server}/job_{i}.html' for i in (1, 2, 3)]
+    details = asyncio.run(scrape(urls))
+    assert [d['job_title'] for d in details] == ['Senior DevOps Engineer', 'DevOps Engineer', 'Junior DevOps Engineer']
+    assert details[0]['company_name'] == 'Acme Cloud Ltd'
+    assert details[1]['salary_raw'] == '£500 per day'
+    assert 'Terraform' in details[0]['full_description']
+
+def test_parse_job_details_from_fixture():
+    """Test that the raw fields are extracted from a saved job page."""
+    html = (FIXTURES_DIR / 'job_1.html').read_text()
+    details = JobScraper('')._parse_job_details(html)
+    assert details['job_title'] == 'Senior DevOps Engineer'
+    assert details['location'] == 'Manchester, Greater Manchester'
+    assert details['employment_type'] == 'Permanent'
+    assert details['date_posted_raw'] == 'Published: 2 days ago'
+
+def test_is_blocked_request():
+    """Test that only heavy or tracking requests are aborted in lite mode."""
+    assert is_blocked_request('image', 'https://www.cwjobs.co.uk/logo.png')
+    assert is_blocked_request('font', 'https://fonts.example.com/font.woff2')
+    assert is_blocked_request('script', 'https://www.googletagmanager.com/gtm.js')
+    assert not is_blocked_request('document', 'https://www.cwjobs.co.uk/job/devops-engineer/123')
+    assert not is_blocked_request('script', 'https://www.cwjobs.co.uk/static/app.js')
+
+class _StubPage:
+    """Browser page stand-in that records fallback renders and exposes an HTTP client."""
+
+    def __init__(self, request):
+        self.context = type('Context', (), {'request': request})()
+        self.rendered = []
+
+    async def goto(self, url, timeout):
+        self.rendered.append(url)
+
+    async def wait_for_selector(self, selector, timeout):
+        pass
+
+    async def content(self):
+        return (FIXTURES_DIR / 'job_2.html').read_text()
+
+def test_http_fetch_mode_falls_back_to_browser_without_job_markup(fixture_server):
+    """Test that http mode parses pages over HTTP and renders only pages missing the job markup."""
+    playwright_api = pytest.importorskip('playwright.async_api')
+
+    async def fetch(urls):
+        scraper = JobScraper(fixture_server, fetch_mode='http', max_retries=1)
+        scraper.rate_limiter = TokenBucket(rate=100)
+        async with playwright_api.async_playwright() as p:
+            request = await p.request.new_context()
+            page = _StubPage(request)
+            details = [await scraper._fetch_job_details(page, url) for url in urls]
+            await request.dispose()
+            return details, page.rendered
+
+    urls = [f'{fixture_server}/job_1.html', f'{fixture_server}/consent.html']
+    details, rendered = asyncio.run(fetch(urls))
+    assert details[0]['job_title'] == 'Senior DevOps Engineer'
+    assert details[1]['job_title'] == 'DevOps Engineer'
+    assert rendered == [urls[1]]
+
+def test_field_extractor_matches_beautifulsoup():
+    """Test that single-pass extraction returns what select_one/get_text return."""
+    extractor = FieldExtractor(JOB_DETAIL_SELECTORS)
+    for path in sorted(FIXTURES_DIR.glob('*.html')):
+        html = path.read_text()
+        soup = BeautifulSoup(html, 'lxml')
+        expected = {}
+        for field, selector in JOB_DETAIL_SELECTORS.items():
+            element = soup.select_one(selector)
+            expected[field] = element.get_text(strip=True) if element else 'N/A'
+        assert extractor.extract(html) == expected, path.name
+
+def test_attribute_extractor_matches_beautifulsoup():
+    """Test that listing links are extracted in page order."""
+    html = (FIXTURES_DIR / 'search_results.html').read_text()
+    expected = [link.get('href') for link in BeautifulSoup(html, 'lxml').select(JOB_LINK_SELECTOR)]
+    assert len(expected) == 25
+    assert AttributeExtractor(JOB_LINK_SELECTOR, 'href').extract(html) == expected
+
+def test_select_relevant_jobs_filters_listing_titles():
+    """Test that only postings with a relevant listing title are kept, in page order."""
+    html = (FIXTURES_DIR / 'search_results.html').read_text()
+    links = BeautifulSoup(html, 'lxml').select(JOB_LINK_SELECTOR)
+    expected = [JOB_POST_BASE_URL + link.get('href') for link in links if 'devops' in link.get_text().lower()]
+    scraper = JobScraper('http://localhost/')
+    scraper.title_matcher = title_matcher_for('DevOps Engineer')
+    relevant_urls, listed = scraper._select_relevant_jobs(html)
+    assert listed == 25
+    assert relevant_urls == expected
+    assert len(relevant_urls) == 15
+
+def test_title_matcher_defaults_to_category_name():
+    """Test that a category without configured keywords matches its own name, ignoring case."""
+    matcher = title_matcher_for('Cloud Architect')
+    assert matcher.matches('Senior cloud architect (AWS)')
+    assert not matcher.matches('Cloud Engineer')
+    assert not matcher.matches(None)
+
+class _ListingPage:
+    """Search results page stand-in that moves through a list of result pages."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.index = 0
+
+    async def goto(self, url, timeout):
+        pass
+
+    async def wait_for_selector(self, selector):
+        pass
+
+    async def content(self):
+        return self.pages[self.index]
+
+    def get_by_role(self, role, name, exact=False):
+        return _ListingControl(self, advances=role == 'link')
+
+class _ListingControl:
+    """The cookie consent button, or the 'Next' link when `advances` is set."""
+
+    def __init__(self, page, advances):
+        self.page = page
+        self.advances = advances
+
+    async def wait_for(self, timeout):
+        pass
+
+    async def click(self):
+        if self.advances:
+            self.page.index += 1
+
+def test_get_job_urls_stops_at_irrelevant_page():
+    """Test that paging stops after the first page with too few relevant postings."""
+    def listing(*titles):
+        return ''.join(f'<a data-testid="job-item-title" href="/job/{i}">{title}</a>' for i, title in enumerate(titles))
+
+    pages = [
+        listing('DevOps Engineer', 'Senior DevOps Engineer', 'Data Engineer'),
+        listing('Data Engineer', 'Platform Engineer', 'Site Reliability Engineer', 'Lead DevOps Engineer',
+                'Java Developer', 'Data Analyst'),
+        listing('DevOps Engineer'),
+    ]
+    page = _ListingPage(pages)
+    scraper = JobScraper('http://localhost/', min_page_relevance=0.2)
+    scraper.rate_limiter = TokenBucket(rate=1000)
+    scraper.title_matcher = title_matcher_for('DevOps Engineer')
+    job_urls = asyncio.run(scraper._get_job_urls(page, 'first', pages_to_scrape=3))
+    assert job_urls == [JOB_POST_BASE_URL + '/job/0', JOB_POST_BASE_URL + '/job/1', JOB_POST_BASE_URL + '/job/3']
+    assert page.index == 1
+
+class _FixtureResponse:
+    def __init__(self, path):
+        self.path = path
+
+    async def body(self):
+        return self.path.read_bytes()
+
+class _FixturePage:
+    """Browser page stand-in serving fixture pages by name, failing on unknown urls."""
+
+    def __init__(self):
+        self.url = None
+
+    async def goto(self, url, timeout):
+        if not (FIXTURES_DIR / f'{url}.html').exists():
+            raise TimeoutError(url)
+        self.url = url
+        return _FixtureResponse(FIXTURES_DIR / f'{url}.html')
+
+    async def wait_for_selector(self, selector, timeout):
+        pass
+
+    async def content(self):
+        return (FIXTURES_DIR / f'{self.url}.html').read_text()
+
+    async def close(self):
+        pass
+
+class _FixtureContext:
+    async def new_page(self):
+        return _FixturePage()
+
+def test_scrape_with_frontier_flushes_batches_and_resumes(tmp_path, monkeypatch):
+    """Test that postings are saved as they are scraped and a re-run only visits what is left."""
+    monkeypatch.setattr('src.data_collection.scraper.RETRY_BACKOFF_SECONDS', 0)
+    db_path = tmp_path / 'jobs.db'
+    frontier = UrlFrontier(db_path, max_attempts=2)
+    frontier.add(['job_1', 'job_2', 'missing', 'job_3'], 'DevOps Engineer')
+    scraper = JobScraper('', concurrency=2, max_retries=1, frontier=frontier)
+    scraper.rate_limiter = TokenBucket(rate=1000)
+
+    async def scrape():
+        sink = _RecordSink(frontier, 'DevOps Engineer', flush_size=2)
+        return await scraper._scrape_job_details(_FixtureContext(), frontier.pending('DevOps Engineer'), sink)
+
+    assert asyncio.run(scrape()) == []
+    df = load_data_from_db(db_path, RAW_DATA_TABLE_NAME)
+    assert df['url'].tolist() == ['job_1', 'job_2', 'job_3']
+    assert frontier.counts() == {'done': 3, 'failed': 1}
+    assert list(frontier.pending()) == ['missing']
+    asyncio.run(scrape())
+    assert list(frontier.pending()) == []
+    assert len(load_data_from_db(db_path, RAW_DATA_TABLE_NAME)) == 3
+
+def test_fetched_pages_are_archived_off_the_event_loop(tmp_path, monkeypatch):
+    """Test that every fetched page is archived, on a thread other than the event loop's."""
+    archive = HtmlArchive(tmp_path / 'jobs.db')
+    threads = []
+    store = archive.store
+
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        store(*args)
+
+    monkeypatch.setattr(archive, 'store', record_thread)
+    scraper = JobScraper('', concurrency=2, archive=archive)
+    scraper.search_category = 'DevOps Engineer'
+    scraper.rate_limiter = TokenBucket(rate=1000)
+    asyncio.run(scraper._scrape_job_details(_FixtureContext(), ['job_1', 'job_2']))
+    assert threading.get_ident() not in threads
+    pages = {url: decompress_html(html) for batch in archive.iter_latest() for url, _, html in batch}
+    assert pages == {name: (FIXTURES_DIR / f'{name}.html').read_text() for name in ['job_1', 'job_2']}
+
+class _CategoryPage(_FixturePage):
+    """Page stand-in serving a search listing per category and fixture job pages by url."""
+
+    def __init__(self, listings, visited):
+        super().__init__()
+        self.listings = listings
+        self.visited = visited
+
+    async def goto(self, url, timeout):
+        self.url = url
+        if url not in self.listings:
+            self.visited.append(url)
+
+    async def wait_for_selector(self, selector, timeout=None):
+        pass
+
+    async def content(self):
+        if self.url in self.listings:
+            return self.listings[self.url]
+        return (FIXTURES_DIR / f"{self.url.rsplit('/', 1)[-1]}.html").read_text()
+
+    def get_by_role(self, role, name, exact=False):
+        return _ListingControl(self, advances=role == 'link')
+
+class _CategoryBrowser:
+    def __init__(self, listings):
+        self.listings = listings
+        self.visited = []
+        self.contexts = 0
+
+    async def new_context(self):
+        self.contexts += 1
+        return _CategoryContext(self.listings, self.visited)
+
+class _CategoryContext:
+    def __init__(self, listings, visited):
+        self.listings = listings
+        self.visited = visited
+
+    async def new_page(self):
+        return _CategoryPage(self.listings, self.visited)
+
+    async def close(self):
+        pass
+
+def test_parallel_categories_fetch_shared_postings_once(tmp_path):
+    """Test that categories sharing a browser and rate limit fetch an overlapping posting only once."""
+    def listing(*jobs):
+        return ''.join(f'<a data-testid="job-item-title" href="/{job}">{title}</a>' for job, title in jobs)
+
+    listings = {
+        'search/devops-engineer': listing(('job_1', 'Senior DevOps Engineer'), ('job_2', 'DevOps Engineer')),
+        'search/cloud-engineer': listing(('job_2', 'DevOps Cloud Engineer'), ('job_3', 'Cloud Engineer')),
+    }
+    db_path = tmp_path / 'jobs.db'
+    frontier = UrlFrontier(db_path)
+    rate_limiter = TokenBucket(rate=1000)
+    browser = _CategoryBrowser(listings)
+
+    async def scrape_all():
+        scrapers = {
+            job_title: JobScraper('search/', '', concurrency=2, fetch_mode='render', frontier=frontier,
+                                  rate_limiter=rate_limiter)
+            for job_title in ('DevOps Engineer', 'Cloud Engineer')
+        }
+        await asyncio.gather(*(scraper.scrape_category(browser, job_title, 2)
+                               for job_title, scraper in scrapers.items()))
+        return scrapers
+
+    scrapers = asyncio.run(scrape_all())
+    assert browser.contexts == 2
+    assert sorted(browser.visited) == [JOB_POST_BASE_URL + f'/job_{i}' for i in (1, 2, 3)]
+    assert all(scraper.rate_limiter is rate_limiter for scraper in scrapers.values())
+    raw = load_data_from_db(db_path, RAW_DATA_TABLE_NAME)
+    assert sorted(raw['url'].str.rsplit('/', n=1).str[-1]) == ['job_1', 'job_2', 'job_3']
+    assert frontier.categories(JOB_POST_BASE_URL + '/job_2') == ['Cloud Engineer', 'DevOps Engineer']
+    assert frontier.counts() == {'done': 3}
+
+def test_scrape_metrics_count_pages_failures_and_sleep(tmp_path, monkeypatch):
+    """Test that fetches, failures by exception type, bytes and politeness sleeps are recorded."""
+    monkeypatch.setattr('src.data_collection.scraper.RETRY_BACKOFF_SECONDS', 0)
+    monkeypatch.setattr(metrics, 'enabled', True)
+    monkeypatch.setattr(metrics, '_counters', {})
+    monkeypatch.setattr(metrics, '_timers', {})
+    scraper = JobScraper('', concurrency=2, max_retries=2)
+    scraper.rate_limiter = TokenBucket(rate=1000)
+    asyncio.run(scraper._scrape_job_details(_FixtureContext(), ['job_1', 'missing', 'job_2']))
+    snapshot = metrics.snapshot()
+    counters = {(c['name'], tuple(c['labels'].values())): c['value'] for c in snapshot['counters']}
+    assert counters[('scraper_pages_fetched_total', (None,))] == 2
+    assert counters[('scraper_fetch_errors_total', ('TimeoutError',))] == 2
+    assert counters[('scraper_pages_failed_total', ('TimeoutError',))] == 1
+    page_bytes = sum(len((FIXTURES_DIR / f'{name}.html').read_bytes()) for name in ['job_1', 'job_2'])
+    assert counters[('scraper_bytes_downloaded_total', (None,))] == page_bytes
+    timers = {(t['name'], tuple(t['labels'].values())): t['count'] for t in snapshot['timers']}
+    assert timers[('scraper_sleep_seconds', ('rate_limit',))] == 4
+    assert timers[('scraper_sleep_seconds', ('backoff',))] == 1
+    assert timers[('scraper_step_seconds', ('job', 'parse'))] == 2
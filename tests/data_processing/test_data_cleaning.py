@@ -1,13 +1,27 @@
+import sqlite3
 from datetime import datetime
 
-from src.config import SKILL_KEYWORDS, REGION_TO_CITIES_MAP
+import pandas as pd
+import pytest
+
+from src.config import SKILL_KEYWORDS, REGION_TO_CITIES_MAP, TARGET_CITIES, RAW_DATA_TABLE_NAME, PROCESSED_DATA_TABLE_NAME
 from src.data_processing.data_cleaning import (
     parse_salary,
+    parse_salary_series,
     classify_location_by_city,
     classify_location_by_region,
+    categorize_employment_type,
+    classify_seniority_series,
+    clean_dataframe,
     parse_date,
-    extract_skills_from_description
+    process_raw_data,
+    extract_skills_from_description,
+    _classify_seniority
 )
+from src.data_processing.location_index import LocationIndex
+from src.data_processing.skill_matcher import SkillMatcher
+import src.utils
+from src.utils import load_data_from_db, save_data_to_db
 
 def test_parse_salary():
     """Test that various salary formats are parsed correctly."""
@@ -26,6 +40,18 @@ def test_parse_salary():
     assert parse_salary("Competitive") == 0
     assert parse_salary("45000 per hour") == 45000
 
+def test_parse_salary_series():
+    """Test that column-level salary parsing matches parse_salary row by row."""
+    salary_strings = pd.Series([
+        "£50,000 - £60,000", "From £30,000 to £40,000 per annum", "70k - 80.5k", "50000.00",
+        "£75,000 per annum + Package", "£55k per annum", "£555.56 - 555.56 per year + None", "45000",
+        "£500 a day", "£450 - £550 per day", "£50 per hour", "£40 - 60 per hour", "Competitive",
+        "45000 per hour", None, "N/A", "£50,000 - £60,000",
+    ], index=range(10, 27))
+    result = parse_salary_series(salary_strings)
+    assert result.index.equals(salary_strings.index)
+    assert result.tolist() == [parse_salary(s) for s in salary_strings]
+
 def test_classify_location_by_city():
     """Test that locations are standardized correctly by city or otherwise"""
     assert classify_location_by_city("City Centre, Manchester (M1), M1") == "Manchester"
@@ -41,6 +67,19 @@ def test_classify_location_by_region():
     assert classify_location_by_region("Cheltenham, Gloucestershire", REGION_TO_CITIES_MAP) == "South West"
     assert classify_location_by_region("Unspecified", REGION_TO_CITIES_MAP) == "Other"
 
+def test_location_index_matches_city_and_region_classifiers():
+    """Test that the compiled location index keeps the first-match priority of both classifiers."""
+    index = LocationIndex(REGION_TO_CITIES_MAP, TARGET_CITIES)
+    locations = pd.Series([
+        "City Centre, Manchester (M1), M1", "Greater London (Hybrid)", "Reading", "Unspecified",
+        "Oxford", "Cheltenham, Gloucestershire", "Warwickshire", "Remote, London or Leeds",
+        "Bristol, Manchester", "Newbury, Berkshire", "Greater London (Hybrid)",
+    ])
+    result = index.classify_series(locations)
+    assert result['city'].tolist() == [classify_location_by_city(x) for x in locations]
+    assert result['region'].tolist() == [classify_location_by_region(x, REGION_TO_CITIES_MAP) for x in locations]
+    assert index.classify(None) == ("N/A", "Other")
+
 def test_parse_date():
     """Test that relative dates are converted correctly using a fixed 'now' date."""
     fixed_now = datetime(2025, 9, 1)
@@ -74,4 +113,113 @@ def test_extract_skills_from_description():
     assert extract_skills_from_description(full_descriptions[1], SKILL_KEYWORDS) == expected_skills[1]
     assert extract_skills_from_description(full_descriptions[2], SKILL_KEYWORDS) == expected_skills[2]
     assert extract_skills_from_description(full_descriptions[3], SKILL_KEYWORDS) == expected_skills[3]
-    assert extract_skills_from_description(full_descriptions[4], SKILL_KEYWORDS) == expected_skills[4]
\ No newline at end of file
+    assert extract_skills_from_description(full_descriptions[4], SKILL_KEYWORDS) == expected_skills[4]
+
+def test_skill_matcher_matches_extract_skills_from_description():
+    """Test that the compiled matcher returns exactly what the per-keyword loop returns."""
+    matcher = SkillMatcher(SKILL_KEYWORDS)
+    full_descriptions = [
+        "We are looking for a developer with experience in Python and SQL.",
+        "Seeking a Senior Data Analyst with strong Excel skills.",
+        "Experience with Docker, Kubernetes, and CI/CD is required.",
+        # 'C#' and 'C++' only satisfy the trailing word boundary before a word character
+        "C# developer, C++ engineer, c#net and c++11 experience.",
+        # Single-letter 'R' must match on its own but not inside words
+        "Statistics in R, SQL Server, Azure Functions and JavaScript.",
+        "GitHub Actions, GitLab, PySpark on Azure, Java/Scala, Go-lang",
+        None,
+    ]
+    for description in full_descriptions:
+        assert matcher.extract(description) == extract_skills_from_description(description, SKILL_KEYWORDS)
+    series = pd.Series(full_descriptions + full_descriptions[:2])
+    expected = [extract_skills_from_description(d, SKILL_KEYWORDS) for d in series]
+    assert matcher.extract_series(series).tolist() == expected
+
+def test_classify_seniority_series_matches_classify_seniority():
+    """Test that column-level seniority follows the same rule priority as the scalar classifier."""
+    titles = ['Senior DevOps Engineer', 'Junior Engineer', 'DevOps Engineer', 'Platform Engineer', None,
+              'Head of Platform', 'Intern', 'SRE Lead', 'Engineer']
+    descriptions = ['Needs 1 year of Go', '10+ years required', '3 years and strong experience', None,
+                    'Deep understanding of Linux', '5 yrs', 'two years', '2 Years of AWS', '４ years']
+    salaries = [0, 35000, 70000, 40000, 55000, 90000, 1]
+    rows = [(t, d, s) for t in titles for d in descriptions for s in salaries]
+    df = pd.DataFrame(rows, columns=['job_title', 'full_description', 'salary_numeric'], index=[0] * len(rows))
+    expected = [_classify_seniority(t, d, s) for t, d, s in rows]
+    result = classify_seniority_series(df['job_title'], df['full_description'], df['salary_numeric'])
+    assert result.tolist() == expected
+    assert set(expected) == {'Senior', 'Mid-Level', 'Junior'}
+
+def _raw_job(job_title, salary_raw):
+    return {
+        'job_title': job_title,
+        'company_name': 'Acme',
+        'location': 'Greater London (Hybrid)',
+        'employment_type': 'Permanent',
+        'date_posted_raw': 'Posted 3 days ago',
+        'salary_raw': salary_raw,
+        'full_description': f'{job_title} working with Python and AWS.',
+    }
+
+def test_process_raw_data_only_processes_new_rows(tmp_path):
+    """Test that repeated runs process each raw row exactly once."""
+    db_path = tmp_path / 'jobs.db'
+    save_data_to_db([_raw_job('DevOps Engineer', '£50,000 - £60,000')], RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+    process_raw_data(db_path)
+    process_raw_data(db_path)
+    save_data_to_db([_raw_job('Senior DevOps Engineer', '£80k')], RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+    process_raw_data(db_path)
+    processed = load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME)
+    assert processed['raw_id'].tolist() == [1, 2]
+    assert processed['salary_numeric'].tolist() == [55000, 80000]
+    assert processed['seniority'].tolist() == ['Mid-Level', 'Senior']
+    assert processed['skills'].tolist() == ['Python,AWS', 'Python,AWS']
+    process_raw_data(db_path, full=True)
+    assert load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME)['raw_id'].tolist() == [1, 2]
+
+def test_process_raw_data_stops_at_a_failed_chunk(tmp_path, monkeypatch):
+    """Test that a chunk that cannot be written stops the run, so its rows are processed by the next one."""
+    db_path = tmp_path / 'jobs.db'
+    save_data_to_db([_raw_job(f'DevOps Engineer {i}', '£50,000') for i in range(6)], RAW_DATA_TABLE_NAME, db_path)
+    upsert_on = src.utils._upsert_on
+
+    def locked_once(key_column):
+        monkeypatch.setattr(src.utils, '_upsert_on', upsert_on)
+        def upsert(*args):
+            raise sqlite3.OperationalError('database is locked')
+        return upsert
+
+    monkeypatch.setattr(src.utils, '_upsert_on', locked_once)
+    with pytest.raises(RuntimeError):
+        process_raw_data(db_path, chunksize=3)
+    process_raw_data(db_path, chunksize=3)
+    processed = load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME)
+    assert sorted(processed['raw_id']) == [1, 2, 3, 4, 5, 6]
+
+def test_clean_dataframe_matches_row_by_row_cleaning():
+    """Test that the fused cleaning pass, in one process or several, matches the scalar functions."""
+    jobs = [
+        _raw_job('Senior DevOps Engineer', '£80k'),
+        _raw_job('DevOps Engineer', '£400 - £450 per day'),
+        _raw_job('Graduate Cloud Engineer', 'Competitive'),
+        {**_raw_job('Platform Engineer', None), 'location': None, 'employment_type': 'Temporary',
+         'date_posted_raw': None, 'full_description': 'Strong experience with Kubernetes, Terraform and C#.'},
+        {**_raw_job(None, '£35,000'), 'employment_type': None, 'full_description': None},
+    ] * 3
+    df = pd.DataFrame(jobs)
+    df.insert(0, 'raw_id', range(1, len(df) + 1))
+    expected_salary = df['salary_raw'].apply(parse_salary)
+    expected = pd.DataFrame({
+        'raw_id': df['raw_id'],
+        'job_title': df['job_title'],
+        'company_name': df['company_name'],
+        'seniority': [_classify_seniority(t, d, s) for t, d, s in zip(df['job_title'], df['full_description'], expected_salary)],
+        'salary_numeric': expected_salary,
+        'employment_type_clean': df['employment_type'].apply(categorize_employment_type),
+        'city': df['location'].apply(classify_location_by_city),
+        'region': df['location'].apply(
+            lambda x: classify_location_by_region(x, REGION_TO_CITIES_MAP) if isinstance(x, str) else 'Other'),
+        'date_posted': df['date_posted_raw'].apply(parse_date),
+        'skills': df['full_description'].apply(lambda x: ','.join(extract_skills_from_description(x, SKILL_KEYWORDS))),
+    })
+    pd.testing.assert_frame_equal(clean_dataframe(df), expected)
+    pd.testing.assert_frame_equal(clean_dataframe(df, workers=2), expected)
@@ -0,0 +1,102 @@
+import random
+
+import numpy as np
+
+from src.config import PROCESSED_DATA_TABLE_NAME, RAW_DATA_TABLE_NAME
+from src.data_processing.data_cleaning import process_raw_data
+from src.data_processing.near_duplicates import (
+    MinHasher, band_hashes, cluster_signatures, find_near_duplicates, has_words, lsh_parameters
+)
+from src.utils import load_data_from_db, save_data_to_db
+
+WORDS = ('we are hiring an engineer to build and run cloud platforms with python aws docker terraform '
+         'kubernetes go linux monitoring pipelines across teams in london leeds remote hybrid').split()
+
+
+def _descriptions(count, seed, words=60):
+    rng = random.Random(seed)
+    return [' '.join(rng.choices(WORDS, k=words)) for _ in range(count)]
+
+def _repost(description, seed):
+    """Reword a couple of words and add a sign-off, as a re-posted ad does."""
+    rng = random.Random(seed)
+    words = description.split()
+    for _ in range(2):
+        words[rng.randrange(len(words))] = rng.choice(['urgently', 'exciting', 'new'])
+    return ' '.join(words) + ' Apply today!'
+
+def test_signatures_estimate_jaccard_and_reposts_are_grouped():
+    """Test that signature agreement tracks shingle Jaccard, and reposts join the group of their original."""
+    minhasher = MinHasher(shingle_size=3)
+    originals = _descriptions(300, seed=0)
+    reposts = [_repost(description, seed) for seed, description in enumerate(originals[:50])]
+    signatures = minhasher.signatures([originals[0], reposts[0], originals[1], None, ''])
+    assert has_words(signatures).tolist() == [True, True, True, False, False]
+
+    def shingles(description):
+        words = description.lower().replace('!', '').split()
+        return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    for first, second in [(0, 1), (0, 2)]:
+        descriptions = [originals[0], reposts[0], originals[1]]
+        a, b = shingles(descriptions[first]), shingles(descriptions[second])
+        jaccard = len(a & b) / len(a | b)
+        assert abs((signatures[first] == signatures[second]).mean() - jaccard) < 0.15
+
+    groups = find_near_duplicates(originals + reposts, threshold=0.7, minhasher=minhasher)
+    assert groups[:300].tolist() == list(range(300))
+    assert groups[300:].tolist() == list(range(50))
+
+def test_bucket_members_are_compared_with_each_other_not_only_the_first():
+    """Test that two similar signatures join up through a bucket whose first member is unlike both."""
+    bands, rows = lsh_parameters(0.7, 128)
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 2 ** 32 - 1, (3, 128), dtype=np.uint32)
+    # Band b holds positions b * rows to (b + 1) * rows - 1, so all three share band 0 only
+    signatures[1:, :rows] = signatures[0, :rows]
+    # The second and third differ in one position of every other band, so they share no other bucket
+    signatures[2] = signatures[1]
+    signatures[2, rows:bands * rows:rows] += np.uint32(1)
+    assert (signatures[1] == signatures[2]).mean() >= 0.7
+    assert (signatures[0] == signatures[1]).mean() < 0.7
+    assert cluster_signatures(signatures, 0.7).tolist() == [0, 1, 1]
+
+def test_clustering_matches_brute_force_on_lsh_candidates():
+    """Test that groups equal the components of all similar pairs sharing a bucket, and recall against all pairs."""
+    descriptions = _descriptions(100, seed=0)
+    # Reposts of reposts, so buckets hold several members of varying similarity
+    for seed in range(200):
+        descriptions.append(_repost(descriptions[random.Random(seed).randrange(len(descriptions))], seed))
+    signatures = MinHasher(shingle_size=3).signatures(descriptions)
+    groups = cluster_signatures(signatures, 0.7)
+
+    first, second = np.triu_indices(len(descriptions), 1)
+    similar = (signatures[first] == signatures[second]).mean(axis=1) >= 0.7
+    buckets = band_hashes(signatures, *lsh_parameters(0.7, 128))
+    candidates = (buckets[first] == buckets[second]).any(axis=1)
+    expected = np.arange(len(descriptions))
+    for a, b in zip(first[similar & candidates], second[similar & candidates]):
+        expected[expected == max(expected[a], expected[b])] = min(expected[a], expected[b])
+    assert groups.tolist() == expected.tolist()
+    recall = (groups[first[similar]] == groups[second[similar]]).mean()
+    assert recall >= 0.95
+
+def test_processing_assigns_duplicate_groups_across_runs(tmp_path):
+    """Test that postings are grouped with near duplicates processed in earlier runs and chunks."""
+    db_path = tmp_path / 'jobs.db'
+    originals = _descriptions(40, seed=1)
+    batches = [originals[:30], originals[30:] + [_repost(originals[5], 0), _repost(originals[35], 1)],
+               [_repost(originals[5], 2), None]]
+    for batch in batches:
+        save_data_to_db([{'job_title': 'DevOps Engineer', 'company_name': 'Acme', 'location': 'London',
+                          'employment_type': 'Permanent', 'date_posted_raw': '1 day ago', 'salary_raw': '£50,000',
+                          'full_description': description} for description in batch],
+                        RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+        process_raw_data(db_path, chunksize=7)
+    processed = load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME).set_index('raw_id')
+    expected = np.arange(1, 45)
+    expected[[40, 41, 42]] = [6, 36, 6]
+    assert processed['duplicate_group_id'].sort_index().tolist() == expected.tolist()
+    process_raw_data(db_path, full=True)
+    rebuilt = load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME).set_index('raw_id')
+    assert rebuilt['duplicate_group_id'].sort_index().tolist() == expected.tolist()
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from src.config import JOB_SKILLS_TABLE_NAME, RAW_DATA_TABLE_NAME, SKILLS_TABLE_NAME
+from src.data_processing.data_cleaning import process_raw_data
+from src.data_processing.skill_matrix import SkillMatrix
+from src.utils import get_engine, save_data_to_db
+
+
+def _random_matrix(jobs_count, seed=0):
+    rng = np.random.default_rng(seed)
+    skills = ['Python', 'AWS', 'Docker', 'Kubernetes', 'Go']
+    dense = rng.random((jobs_count, len(skills))) < [0.6, 0.5, 0.3, 0.1, 0.0]
+    jobs = pd.DataFrame({
+        'salary_numeric': rng.choice([0, 35000, 52500, 52500, 90000], jobs_count),
+        'city': rng.choice(['London', 'Leeds'], jobs_count),
+    })
+    skill_lists = [[skill for skill, has in zip(skills, row) if has] for row in dense]
+    return SkillMatrix.from_skill_lists(skill_lists, skills, jobs), dense, jobs
+
+def test_skill_matrix_matches_dense_computation():
+    """Test counts, co-occurrence and salary stats against plain boolean arrays, with and without a filter."""
+    matrix, dense, jobs = _random_matrix(1000)
+    london = (jobs['city'] == 'London').to_numpy()
+    for where, selected in [(None, np.ones(len(jobs), dtype=bool)), (london, london),
+                            (matrix.job_mask(london), london)]:
+        subset = dense[selected]
+        assert matrix.counts(where).tolist() == subset.sum(axis=0).tolist()
+        expected_pairs = subset.T.astype(int) @ subset.astype(int)
+        assert (matrix.cooccurrence(where).to_numpy() == expected_pairs).all()
+        stats = matrix.salary_stats(where)
+        salaries = jobs['salary_numeric'].to_numpy()[selected]
+        for position, skill in enumerate(matrix.skills):
+            paid = salaries[subset[:, position] & (salaries > 0)]
+            assert stats.loc[skill, 'jobs'] == len(paid)
+            if len(paid):
+                assert np.isclose(stats.loc[skill, 'mean'], paid.mean())
+                assert stats.loc[skill, 'median'] == np.median(paid)
+                assert (stats.loc[skill, 'min'], stats.loc[skill, 'max']) == (paid.min(), paid.max())
+            else:
+                assert np.isnan(stats.loc[skill, 'mean'])
+
+def test_process_raw_data_writes_skill_bridge(tmp_path):
+    """Test that processing fills the skill tables, that SQL can aggregate them, and that they load into a matrix."""
+    db_path = tmp_path / 'jobs.db'
+    descriptions = ['Python and AWS', 'Python, Docker and Kubernetes', 'No skills here']
+    save_data_to_db([
+        {'job_title': title, 'company_name': 'Acme', 'location': 'London', 'employment_type': 'Permanent',
+         'date_posted_raw': '1 day ago', 'salary_raw': salary, 'full_description': description}
+        for title, salary, description in zip(['Senior DevOps', 'DevOps', 'Junior DevOps'],
+                                              ['£90k', '£50k', '£30k'], descriptions)
+    ], RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+    process_raw_data(db_path)
+    process_raw_data(db_path, full=True)
+    with get_engine(db_path).connect() as conn:
+        top_skills = conn.execute(text(
+            f'SELECT s.skill, COUNT(*) FROM "{JOB_SKILLS_TABLE_NAME}" AS js '
+            f'JOIN "{SKILLS_TABLE_NAME}" AS s USING (skill_id) GROUP BY s.skill ORDER BY COUNT(*) DESC, s.skill'
+        )).fetchall()
+    assert top_skills == [('Python', 2), ('AWS', 1), ('Docker', 1), ('Kubernetes', 1)]
+    matrix = SkillMatrix.from_db(db_path)
+    assert matrix.jobs['raw_id'].tolist() == [1, 2, 3]
+    counts = matrix.counts(matrix.jobs['seniority'] == 'Senior')
+    assert counts[counts > 0].to_dict() == {'Python': 1, 'AWS': 1}
+    assert matrix.salary_stats().loc['Python', 'median'] == 70000
@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from src.config import PROCESSED_DATA_TABLE_NAME, RAW_DATA_TABLE_NAME, SALARY_SKETCH_ACCURACY
+from src.data_processing.data_cleaning import process_raw_data
+from src.data_processing.quantile_sketch import QuantileSketch
+from src.data_processing.summaries import salary_summary
+from src.utils import load_data_from_db, save_data_to_db
+
+
+def _raw_jobs(count, seed):
+    rng = random.Random(seed)
+    return [{
+        'job_title': rng.choice(['Senior DevOps Engineer', 'DevOps Engineer', 'Junior DevOps Engineer']),
+        'company_name': 'Acme',
+        'location': rng.choice(['London', 'Manchester', 'Leeds', 'Remote']),
+        'employment_type': 'Permanent',
+        'date_posted_raw': rng.choice(['1 day ago', '5 days ago', '2 weeks ago', '1 month ago', 'Recently']),
+        'salary_raw': rng.choice(['Competitive', f'£{rng.randint(25, 120)},{rng.randint(0, 999):03d}']),
+        'full_description': f'Posting {seed}-{i} with ' + ' and '.join(rng.sample(['Python', 'AWS', 'Docker', 'Go'], 2)),
+    } for i in range(count)]
+
+def test_quantile_sketch_is_accurate_and_mergeable():
+    """Test that quantiles are within the relative accuracy and merging equals adding everything."""
+    values = np.random.default_rng(0).lognormal(11, 0.5, 5000)
+    left, right, whole = (QuantileSketch(SALARY_SKETCH_ACCURACY) for _ in range(3))
+    left.add(values[:2000])
+    right.add(values[2000:])
+    whole.add(values)
+    left.merge(right)
+    assert left.counts == whole.counts
+    restored = QuantileSketch.from_json(left.to_json(), SALARY_SKETCH_ACCURACY)
+    for q in [0, 0.25, 0.5, 0.9, 1]:
+        expected = np.quantile(values, q, method='lower')
+        assert abs(restored.quantile(q) - expected) <= SALARY_SKETCH_ACCURACY * expected
+
+def test_summaries_match_processed_table_after_incremental_runs(tmp_path):
+    """Test that summaries folded in run by run match aggregating the processed table directly."""
+    db_path = tmp_path / 'jobs.db'
+    for seed in range(3):
+        save_data_to_db(_raw_jobs(40, seed), RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+        process_raw_data(db_path, chunksize=25)
+        summary = salary_summary(db_path, by=('region', 'seniority'))
+    processed = load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME)
+    assert summary['jobs'].sum() == len(processed) == 120
+    paid = processed[processed['salary_numeric'] > 0]
+    expected = paid.groupby(['region', 'seniority'])['salary_numeric'].agg(['size', 'mean', 'min', 'max', 'median'])
+    actual = summary.set_index(['region', 'seniority']).loc[expected.index]
+    assert actual['salary_count'].tolist() == expected['size'].tolist()
+    assert np.allclose(actual['salary_mean'], expected['mean'])
+    assert actual['salary_min'].tolist() == expected['min'].tolist()
+    assert actual['salary_max'].tolist() == expected['max'].tolist()
+    skills = processed.assign(skill=processed['skills'].str.split(',')).explode('skill')
+    by_skill = salary_summary(db_path, by=('skill',), region='London').set_index('skill')['jobs']
+    assert by_skill.to_dict() == skills[skills['region'] == 'London'].groupby('skill').size().to_dict()
+    total = salary_summary(db_path, by=())
+    assert total['jobs'].tolist() == [120]
+    median = paid['salary_numeric'].quantile(0.5, interpolation='lower')
+    assert abs(total['salary_median'].iloc[0] - median) <= SALARY_SKETCH_ACCURACY * median
+    process_raw_data(db_path, full=True)
+    pd.testing.assert_frame_equal(salary_summary(db_path, by=('region', 'seniority')), summary)
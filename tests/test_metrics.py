@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from src.config import RAW_DATA_TABLE_NAME
+from src.data_processing.data_cleaning import process_raw_data
+from src.metrics import Metrics, metrics
+from src.utils import save_data_to_db
+
+
+def test_metrics_add_up_and_are_written_as_json_and_prometheus(tmp_path):
+    """Test that counters and timers accumulate by labels and are reported in both formats."""
+    registry = Metrics(enabled=True)
+    registry.count('pages_total', category='DevOps')
+    registry.count('pages_total', 2, category='DevOps')
+    registry.count('errors_total', error='TimeoutError')
+    with registry.timer('stage_seconds', rows=10, stage='salary'):
+        pass
+    registry.observe('stage_seconds', 0.5, rows=30, stage='salary')
+
+    @registry.timed('step_seconds', step='sync')
+    def step():
+        return 1
+
+    @registry.timed('step_seconds', step='async')
+    async def async_step():
+        return 2
+
+    assert step() == 1 and asyncio.run(async_step()) == 2
+    snapshot = registry.snapshot()
+    assert {(c['name'], tuple(c['labels'].items()), c['value']) for c in snapshot['counters']} == {
+        ('pages_total', (('category', 'DevOps'),), 3), ('errors_total', (('error', 'TimeoutError'),), 1)
+    }
+    salary = next(t for t in snapshot['timers'] if t['labels'] == {'stage': 'salary'})
+    assert salary['count'] == 2 and salary['rows'] == 40 and salary['seconds'] >= 0.5
+    assert {t['labels']['step'] for t in snapshot['timers'] if t['name'] == 'step_seconds'} == {'sync', 'async'}
+
+    json_path, prometheus_path = registry.write_report('run', tmp_path)
+    assert json.loads(json_path.read_text())['counters'] == snapshot['counters']
+    prometheus = prometheus_path.read_text().splitlines()
+    assert 'pages_total{category="DevOps"} 3' in prometheus
+    assert '# TYPE stage_seconds summary' in prometheus
+    assert 'stage_seconds_count{stage="salary"} 2' in prometheus
+    assert 'stage_rows_total{stage="salary"} 40' in prometheus
+
+def test_disabled_metrics_record_nothing(tmp_path):
+    """Test that a disabled registry hands out a shared no-op timer and writes no report."""
+    registry = Metrics(enabled=False)
+    registry.count('pages_total')
+    with registry.timer('stage_seconds', rows=10) as timer:
+        assert timer is None
+    assert registry.timer('a_seconds') is registry.timer('b_seconds')
+    assert registry.snapshot() == {'counters': [], 'timers': []}
+    assert registry.write_report('run', tmp_path) is None
+    assert list(tmp_path.iterdir()) == []
+
+def test_process_raw_data_reports_stage_metrics(tmp_path, monkeypatch):
+    """Test that a processing run times each cleaning stage and DB write and writes its report."""
+    monkeypatch.setattr('src.metrics.METRICS_DIR', tmp_path / 'metrics')
+    monkeypatch.setattr(metrics, 'enabled', True)
+    monkeypatch.setattr(metrics, '_counters', {})
+    monkeypatch.setattr(metrics, '_timers', {})
+    db_path = tmp_path / 'jobs.db'
+    jobs = [{'job_title': 'DevOps Engineer', 'company_name': 'Acme', 'location': 'London',
+             'employment_type': 'Permanent', 'date_posted_raw': '3 days ago', 'salary_raw': '£50k',
+             'full_description': f'Posting {i} with Python'} for i in range(5)]
+    save_data_to_db(jobs, RAW_DATA_TABLE_NAME, db_path, 'DevOps')
+    process_raw_data(db_path)
+    report = json.loads((tmp_path / 'metrics' / 'processing.json').read_text())
+    stages = {t['labels']['stage']: t for t in report['timers'] if t['name'] == 'cleaning_stage_seconds'}
+    assert set(stages) >= {'salary', 'location', 'date', 'seniority', 'skills'}
+    assert stages['skills']['rows'] == 5 and stages['skills']['rows_per_second'] > 0
+    operations = {t['labels']['operation'] for t in report['timers'] if t['name'] == 'db_operation_seconds'}
+    assert operations >= {'save', 'load_chunk', 'upsert', 'save_job_skills', 'update_summaries'}
+    assert (tmp_path / 'metrics' / 'processing.prom').exists()
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from src.config import BASE_URL, JOB_POST_BASE_URL, PROCESSED_DATA_TABLE_NAME, RAW_DATA_TABLE_NAME, URL_TAIL
+from src.data_collection.frontier import UrlFrontier
+from src.data_collection.scraper import JobScraper
+from src.pipeline import _flush_stale_batches, _StreamingSink, run_pipeline_async, store_batch
+from src.utils import load_data_from_db
+from tests.data_collection.test_scraper import _CategoryBrowser
+
+
+def test_pipeline_cleans_postings_as_they_are_scraped(tmp_path):
+    """Test that every scraped posting ends up in both the raw and processed tables in one run."""
+    def listing(*jobs):
+        return ''.join(f'<a data-testid="job-item-title" href="/{job}">{title}</a>' for job, title in jobs)
+
+    def first_page(job_title):
+        return JobScraper(BASE_URL, URL_TAIL)._generate_page_urls(job_title, 2)[0]
+
+    browser = _CategoryBrowser({
+        first_page('DevOps Engineer'): listing(('job_1', 'Senior DevOps Engineer'), ('job_2', 'DevOps Engineer')),
+        first_page('Data Engineer'): listing(('job_3', 'Data Engineer')),
+    })
+    db_path = tmp_path / 'jobs.db'
+    processed, errors = asyncio.run(run_pipeline_async(
+        {'DevOps Engineer': 2, 'Data Engineer': 2}, db_path, queue_size=1, batch_size=1,
+        browser=browser, requests_per_second=1000, concurrency=2,
+    ))
+    assert errors == {} and processed == 3
+    raw = load_data_from_db(db_path, RAW_DATA_TABLE_NAME)
+    jobs = load_data_from_db(db_path, PROCESSED_DATA_TABLE_NAME)
+    assert sorted(raw['url']) == [JOB_POST_BASE_URL + f'/job_{i}' for i in (1, 2, 3)]
+    assert sorted(jobs['raw_id']) == [1, 2, 3]
+    assert set(jobs['search_category']) == {'DevOps Engineer', 'Data Engineer'}
+    assert UrlFrontier(db_path).counts() == {'done': 3}
+
+def test_streaming_sink_waits_while_the_queue_is_full(tmp_path):
+    """Test that a full queue holds back the scraper until the writer takes a batch."""
+    async def scrape():
+        queue = asyncio.Queue(maxsize=1)
+        sink = _StreamingSink(queue, UrlFrontier(tmp_path / 'jobs.db'), 'DevOps Engineer', batch_size=2)
+        for i in range(4):
+            sink.add(f'job_{i}', {'job_title': f'Job {i}'})
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.shield(drained := asyncio.ensure_future(sink.drain())), 0.05)
+        first = queue.get_nowait()
+        await drained
+        second = queue.get_nowait()
+        return first.urls, second.urls
+
+    assert asyncio.run(scrape()) == (['job_0', 'job_1'], ['job_2', 'job_3'])
+
+def test_failed_urls_are_recorded_by_the_writer(tmp_path):
+    """Test that the sink queues failed urls for the writer instead of writing them on the event loop."""
+    frontier = UrlFrontier(tmp_path / 'jobs.db')
+    frontier.add(['job_1', 'job_2'], 'DevOps Engineer')
+    queue = asyncio.Queue()
+    sink = _StreamingSink(queue, frontier, 'DevOps Engineer', batch_size=2)
+    sink.failed('job_1', TimeoutError('job_1'))
+    assert frontier.counts() == {'pending': 2}
+    sink.flush()
+    asyncio.run(sink.drain())
+    batch = queue.get_nowait()
+    assert batch.records == [] and batch.failures == [('job_1', "TimeoutError('job_1')")]
+    assert store_batch(tmp_path / 'jobs.db', frontier, batch) == 0
+    assert frontier.counts() == {'failed': 1, 'pending': 1}
+
+def test_stale_batches_are_queued_while_the_scraper_is_stalled(tmp_path):
+    """Test that a partial batch is queued once it is flush_seconds old, without another posting arriving."""
+    async def scrape():
+        queue = asyncio.Queue()
+        sink = _StreamingSink(queue, UrlFrontier(tmp_path / 'jobs.db'), 'DevOps Engineer', batch_size=5,
+                              flush_seconds=0.05)
+        scraped = asyncio.Event()
+        flusher = asyncio.create_task(_flush_stale_batches([sink], sink.flush_seconds, scraped))
+        sink.add('job_1', {'job_title': 'Job 1'})
+        assert queue.empty()
+        batch = await asyncio.wait_for(queue.get(), 1)
+        scraped.set()
+        await flusher
+        return batch.urls, sink.records
+
+    assert asyncio.run(scrape()) == (['job_1'], [])
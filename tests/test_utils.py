@@ -0,0 +1,62 @@
+import sqlite3
+
+import pandas as pd
+from sqlalchemy import text
+
+from src.config import SQLITE_BUSY_TIMEOUT_MS
+from src.data_processing.data_cleaning import process_raw_data
+from src.utils import content_hash, deduplicate_table, get_engine, load_data_from_db, save_data_to_db
+
+
+def _job(description):
+    return {'job_title': 'DevOps Engineer', 'company_name': 'Acme', 'full_description': description}
+
+def test_save_data_to_db_skips_duplicate_descriptions(tmp_path):
+    """Test that rows whose description is already stored are not inserted again."""
+    db_path = tmp_path / 'jobs.db'
+    save_data_to_db([_job('Build pipelines with Python.'), _job('Run Kubernetes.')], 'jobs_raw', db_path, 'DevOps')
+    save_data_to_db([_job('build  pipelines with python. '), _job('Write Terraform.')], 'jobs_raw', db_path, 'DevOps')
+    df = load_data_from_db(db_path, 'jobs_raw')
+    assert df['full_description'].tolist() == ['Build pipelines with Python.', 'Run Kubernetes.', 'Write Terraform.']
+    assert df['content_hash'].tolist() == [content_hash(d) for d in df['full_description']]
+
+def test_deduplicate_table_removes_existing_duplicates_in_sql(tmp_path):
+    """Test that a table written before content hashing is de-duplicated in place."""
+    db_path = tmp_path / 'jobs.db'
+    with sqlite3.connect(db_path) as conn:
+        pd.DataFrame([_job('A'), _job('B'), _job('A'), _job('C'), _job('B')]).to_sql('jobs_raw', conn, index=False)
+    deduplicate_table('jobs_raw', db_path)
+    save_data_to_db([_job('C'), _job('D')], 'jobs_raw', db_path)
+    df = load_data_from_db(db_path, 'jobs_raw')
+    assert df['full_description'].tolist() == ['A', 'B', 'C', 'D']
+
+def test_deleted_raw_ids_are_not_reused_below_the_watermark(tmp_path):
+    """Test that a posting saved after de-duplicating processed rows gets a new raw_id and is processed."""
+    db_path = tmp_path / 'jobs.db'
+    details = {'location': 'London', 'employment_type': 'Permanent', 'date_posted_raw': '1 day ago',
+               'salary_raw': '£50,000', 'search_category': 'DevOps'}
+    with sqlite3.connect(db_path) as conn:
+        pd.DataFrame([{**_job(d), **details} for d in 'ABA']).to_sql('jobs_raw', conn, index=False)
+    process_raw_data(db_path)
+    deduplicate_table('jobs_raw', db_path)
+    save_data_to_db([{**_job('C'), **details}], 'jobs_raw', db_path)
+    process_raw_data(db_path)
+    raw = load_data_from_db(db_path, 'jobs_raw')
+    assert raw[['raw_id', 'full_description']].values.tolist() == [[1, 'A'], [2, 'B'], [4, 'C']]
+    processed = load_data_from_db(db_path, 'jobs_processed').sort_values('raw_id')
+    assert processed['raw_id'].tolist() == [1, 2, 3, 4]
+
+def test_missing_descriptions_are_not_duplicates(tmp_path):
+    """Test that postings without a description are all saved, and survive de-duplication."""
+    db_path = tmp_path / 'jobs.db'
+    save_data_to_db([_job('N/A'), _job(' n/a '), _job(None), _job(''), _job('A')], 'jobs_raw', db_path)
+    assert save_data_to_db([_job('N/A'), _job('a')], 'jobs_raw', db_path) == 1
+    deduplicate_table('jobs_raw', db_path)
+    df = load_data_from_db(db_path, 'jobs_raw')
+    assert len(df) == 6
+    assert df['content_hash'].isna().sum() == 5
+
+def test_connections_wait_for_locks_held_by_long_transactions(tmp_path):
+    """Test that connections wait for a busy database longer than the sqlite3 default of 5 seconds."""
+    with get_engine(tmp_path / 'jobs.db').connect() as conn:
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() == SQLITE_BUSY_TIMEOUT_MS > 5000